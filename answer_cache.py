@@ -0,0 +1,162 @@
+"""
+Semantic answer cache for RAG responses.
+Serves a previous answer when a new query's embedding is close enough to a
+cached one and was asked with the same response style and advice/information mode.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import (
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ANSWER_CACHE_TTL
+)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SemanticAnswerCache:
+    """
+    Thread-safe in-memory cache of generated answers keyed by query embedding.
+    
+    A lookup is a hit when the cosine similarity to a cached query is at least
+    ``threshold`` and the response style and advice mode match. Entries are
+    evicted least-recently-used beyond ``max_size``, expire after ``ttl``
+    seconds, and the whole cache is dropped whenever the index version changes.
+    """
+    
+    def __init__(self, max_size: int = ANSWER_CACHE_SIZE,
+                 threshold: float = ANSWER_CACHE_SIMILARITY_THRESHOLD,
+                 ttl: Optional[float] = ANSWER_CACHE_TTL):
+        """
+        Args:
+            max_size: Maximum number of cached answers
+            threshold: Minimum cosine similarity for a hit
+            ttl: Seconds before an entry expires, or None to never expire
+        """
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._index_version: Optional[str] = None
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+    
+    def _check_version(self, index_version: str):
+        """Drop every entry if the collection was re-ingested. Caller holds the lock."""
+        if self._index_version != index_version:
+            if self._entries:
+                self.invalidations += 1
+                logger.info(f"Index version changed ({self._index_version} -> {index_version}), "
+                            f"dropping {len(self._entries)} cached answers")
+            self._entries.clear()
+            self._index_version = index_version
+    
+    def get(self, query_embedding: List[float], response_style: str, is_advice: bool,
+            index_version: str = '') -> Optional[Dict]:
+        """
+        Find a cached answer for a semantically equivalent query.
+        
+        Args:
+            query_embedding: Embedding of the incoming query
+            response_style: "Concise" or "Detailed"
+            is_advice: Whether the query is an advice request
+            index_version: Current index version (see vector_store.read_index_version)
+        
+        Returns:
+            Cached result dictionary (response, sources, ...) plus 'similarity', or None
+        """
+        query_vector = self._normalize(query_embedding)
+        style = response_style.lower()
+        now = time.monotonic()
+        
+        with self._lock:
+            self._check_version(index_version)
+            
+            best_id = None
+            best_similarity = -1.0
+            expired = []
+            for entry_id, entry in self._entries.items():
+                if self.ttl is not None and now - entry['created'] > self.ttl:
+                    expired.append(entry_id)
+                    continue
+                if entry['style'] != style or entry['is_advice'] != is_advice:
+                    continue
+                if entry['vector'].shape != query_vector.shape:
+                    continue
+                similarity = float(np.dot(entry['vector'], query_vector))
+                if similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+            
+            for entry_id in expired:
+                del self._entries[entry_id]
+            
+            if best_id is None or best_similarity < self.threshold:
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            result = dict(self._entries[best_id]['result'])
+        
+        result['similarity'] = best_similarity
+        return result
+    
+    def put(self, query_embedding: List[float], response_style: str, is_advice: bool,
+            result: Dict, index_version: str = ''):
+        """
+        Cache a generated answer.
+        
+        Args:
+            query_embedding: Embedding of the query that produced the answer
+            response_style: "Concise" or "Detailed"
+            is_advice: Whether the query was an advice request
+            result: query_rag result dictionary to replay on a hit
+            index_version: Index version the answer was generated against
+        """
+        with self._lock:
+            self._check_version(index_version)
+            self._entries[self._next_id] = {
+                'vector': self._normalize(query_embedding),
+                'style': response_style.lower(),
+                'is_advice': is_advice,
+                'result': dict(result),
+                'created': time.monotonic()
+            }
+            self._next_id += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def stats(self) -> Dict:
+        """Return hit/miss/eviction counters and current size."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'size': len(self._entries)
+            }
+    
+    def clear(self):
+        """Drop every cached answer."""
+        with self._lock:
+            self._entries.clear()
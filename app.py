@@ -4,19 +4,41 @@ Provides chat interface and strategy graph visualization.
 """
 import streamlit as st
 import logging
-from typing import Optional, Dict
+from typing import Optional, Dict, Callable
 import inspect
+import atexit
+from html import escape
+import re
 
 from config import (
     load_config,
     CHROMA_COLLECTION_NAME,
     CHROMA_PERSIST_DIRECTORY,
-    DOCUMENT_PATH
+    DOCUMENT_PATH,
+    HIERARCHICAL_RETRIEVAL,
+    ROLE_GUIDANCE_LOOKUP,
+    TABLE_LOOKUP,
+    CHAT_HISTORY_PAGE_SIZE,
+    QUERY_HEARTBEAT_SECONDS
 )
-from vector_store import initialize_chroma_db, collection_exists
+from vector_store import collection_exists
+import clients
+from embedding_cache import QueryEmbeddingCache
+from answer_cache import SemanticAnswerCache
+from lexical_index import LexicalIndex
+from section_tree import SectionTree
+from role_guidance import RoleGuidanceIndex
+from faq_catalogue import FAQCatalogue
+from table_store import TableStore
 import rag_handler
+from graph_extractor import read_strategy_artifact
+from interactive_graph import (
+    build_strategy_map_html,
+    graph_page_key,
+    strategy_map_hash,
+    strategy_mindmap
+)
 from document_processor import parse_markdown_file
-import google.generativeai as genai
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -71,9 +93,6 @@ def initialize_resources():
     try:
         config = load_config()
         
-        # Initialize GenAI
-        genai.configure(api_key=config['google_api_key'])
-        
         # Initialize ChromaDB
         if not collection_exists(CHROMA_COLLECTION_NAME, CHROMA_PERSIST_DIRECTORY):
             st.error(
@@ -82,11 +101,26 @@ def initialize_resources():
             )
             st.stop()
         
-        client, collection = initialize_chroma_db(CHROMA_COLLECTION_NAME, CHROMA_PERSIST_DIRECTORY)
+        # Create the long-lived GenAI and ChromaDB handles up front
+        collection = clients.warm_up(CHROMA_COLLECTION_NAME, CHROMA_PERSIST_DIRECTORY)
+        atexit.register(clients.shutdown)
         
         return {
             'collection': collection,
             'config': config,
+            # Shared across sessions so repeated questions skip the embedding call
+            'query_cache': QueryEmbeddingCache(),
+            'answer_cache': SemanticAnswerCache(),
+            # Memory-mapped BM25 index written by ingest.py (None if not built yet)
+            'lexical_index': LexicalIndex.load(),
+            # Section tree written by ingest.py enables leaf-first hierarchical retrieval
+            'section_tree': SectionTree.load() if HIERARCHICAL_RETRIEVAL else None,
+            # Precomputed Section 8.3 guidance per role, looked up instead of searched
+            'role_guidance': RoleGuidanceIndex.load() if ROLE_GUIDANCE_LOOKUP else None,
+            # Answers to canonical questions written by build_faq.py (None if not built)
+            'faq_catalogue': FAQCatalogue.load(),
+            # Parsed tables written by ingest.py for row-level lookups
+            'table_store': TableStore.load() if TABLE_LOOKUP else None,
             'initialized': True
         }
     except Exception as e:
@@ -94,6 +128,29 @@ def initialize_resources():
         st.stop()
 
 
+@st.cache_data(show_spinner=False, max_entries=8)
+def graph_page(key: str, _build: Callable[[], str]) -> str:
+    """
+    Build a graph view's HTML once per content hash (shared across sessions and reruns).
+    
+    Args:
+        key: interactive_graph.graph_page_key of the view's source
+        _build: Function building the HTML (not hashed)
+    
+    Returns:
+        HTML for components.html
+    """
+    return _build()
+
+
+# Inline citation markers such as:
+# [Section 3.1], [Link: Q1 2025 Financial Update], [Reference: ...]
+_CITATION_PATTERN = re.compile(r'\[(?:Section |Link: |Reference: )[^\]]+\]')
+_BOLD_PATTERN = re.compile(r'\*\*(.+?)\*\*')
+_NUMBERED_ITEM_PATTERN = re.compile(r'\s(\d+\.)\s')
+_SPACES_PATTERN = re.compile(r'\s{2,}')
+
+
 def format_message_with_citations(text: str) -> str:
     """Format message text, optionally handling citations.
 
@@ -101,16 +158,10 @@ def format_message_with_citations(text: str) -> str:
     from the rendered chat, since the detailed citations are already
     available in the separate "View Sources" expander.
     """
-    import re
-
-    # Remove inline citation markers such as:
-    # [Section 3.1], [Link: Q1 2025 Financial Update], [Reference: ...]
-    text = re.sub(r'\[Section [^\]]+\]', '', text)
-    text = re.sub(r'\[Link: [^\]]+\]', '', text)
-    text = re.sub(r'\[Reference: [^\]]+\]', '', text)
+    text = _CITATION_PATTERN.sub('', text)
 
     # Convert simple markdown bold (**text**) to <strong>text</strong>
-    text = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', text)
+    text = _BOLD_PATTERN.sub(r'<strong>\1</strong>', text)
 
     # Respect any newlines from the model
     text = text.replace('\r\n', '\n')
@@ -120,14 +171,81 @@ def format_message_with_citations(text: str) -> str:
 
     # Add line breaks before numbered items like "1." "2." when they appear
     # in the middle of a paragraph, to avoid one huge block of text.
-    text = re.sub(r'\s(\d+\.)\s', r'<br/><br/>\1 ', text)
+    text = _NUMBERED_ITEM_PATTERN.sub(r'<br/><br/>\1 ', text)
 
     # Clean up any excessive spaces
-    text = re.sub(r'\s{2,}', ' ', text)
+    text = _SPACES_PATTERN.sub(' ', text)
 
     return text
 
 
+def build_message(role: str, content: str, **fields) -> Dict:
+    """
+    Create a chat history entry with its HTML rendered once.
+    
+    Args:
+        role: 'user' or 'assistant'
+        content: Message text
+        **fields: Extra fields kept with the message (sources, token_usage, ...)
+    
+    Returns:
+        Message dictionary; 'html' is what the chat history displays
+    """
+    if role == 'user':
+        html = f'<div class="user-message"><strong>You:</strong> {content}</div>'
+    else:
+        html = (f'<div class="assistant-message"><strong>Assistant:</strong> '
+                f'{format_message_with_citations(content)}</div>')
+    return {'role': role, 'content': content, 'html': html, **fields}
+
+
+def render_message(message: Dict):
+    """Display one chat history entry with its captions and sources."""
+    if 'html' not in message:
+        # Messages from sessions started before HTML was stored with them
+        message['html'] = build_message(message['role'], message['content'])['html']
+    st.markdown(message['html'], unsafe_allow_html=True)
+    if message['role'] == 'user':
+        return
+    
+    if message.get('catalogue'):
+        st.caption("Served from the FAQ catalogue (precomputed answer)")
+    elif message.get('table_lookup') == 'direct':
+        st.caption("Answered directly from a document table")
+    
+    # Show token usage if available
+    token_usage = message.get('token_usage')
+    if token_usage and token_usage.get('prompt_tokens'):
+        approx = "~" if token_usage.get('estimated') else ""
+        st.caption(
+            f"Tokens: {approx}{token_usage['prompt_tokens']} prompt "
+            f"({token_usage['context_tokens']} context) · "
+            f"{approx}{token_usage['output_tokens']} output"
+        )
+    
+    # Show re-ranking stats if available
+    rerank = message.get('rerank')
+    if rerank:
+        st.caption(
+            f"Re-ranked {rerank['candidates']} → {rerank['selected']} chunks "
+            f"({rerank['dropped']} dropped) in {rerank['latency_ms']:.1f}ms"
+        )
+    
+    # Show sources if available
+    if message.get('sources'):
+        with st.expander("View Sources"):
+            for source in message['sources']:
+                if source['type'] == 'section':
+                    st.write(
+                        f"📄 Section {source.get('section', 'N/A')}: {source.get('path', '')}"
+                    )
+                elif source['type'] == 'link':
+                    pages = f" (p. {source['pages']})" if source.get('pages') else ""
+                    st.write(
+                        f"🔗 {source.get('text', '')}{pages}: {source.get('url', '')}"
+                    )
+
+
 def main():
     """Main Streamlit application."""
     st.title("🏥 Kaiser Permanente Strategy Assistant")
@@ -136,10 +254,25 @@ def main():
     # Initialize resources
     resources = initialize_resources()
     collection = resources['collection']
+    query_cache = resources.get('query_cache')
+    answer_cache = resources.get('answer_cache')
+    lexical_index = resources.get('lexical_index')
+    section_tree = resources.get('section_tree')
+    role_guidance = resources.get('role_guidance')
+    faq_catalogue = resources.get('faq_catalogue')
+    table_store = resources.get('table_store')
     
     # Initialize session state
     if 'messages' not in st.session_state:
         st.session_state.messages = []
+    # Number of CHAT_HISTORY_PAGE_SIZE pages of history on screen
+    if 'history_pages' not in st.session_state:
+        st.session_state.history_pages = 1
+    
+    # Handle on the query being answered (StreamingQuery or Future), so a new
+    # message can cancel it
+    if 'active_query' not in st.session_state:
+        st.session_state.active_query = None
     
     # Sidebar
     with st.sidebar:
@@ -161,6 +294,7 @@ def main():
         # Clear chat button
         if st.button("🗑️ Clear Chat"):
             st.session_state.messages = []
+            st.session_state.history_pages = 1
             st.rerun()
         
         # Info
@@ -173,106 +307,173 @@ def main():
         )
     
     # Main area with separate tabs for Chat and Strategy Graph
-    chat_tab, graph_tab = st.tabs(["💬 Chat", "📊 Strategy Graph"])
+    tab_labels = ["💬 Chat", "📊 Strategy Graph"]
+    try:
+        # Track the open tab so the graph is only built while its tab is shown
+        chat_tab, graph_tab = st.tabs(tab_labels, key="main_tabs", on_change="rerun")
+    except TypeError:
+        # Older Streamlit versions run every tab's content on each rerun
+        chat_tab, graph_tab = st.tabs(tab_labels)
 
     with chat_tab:
         # Chat interface
         st.header("💬 Chat")
         
-        # Display chat history
+        # Display the most recent page(s) of chat history; older messages stay
+        # in session state but are not re-rendered unless requested
         chat_container = st.container()
         with chat_container:
-            for message in st.session_state.messages:
-                role = message['role']
-                content = message['content']
-                
-                if role == 'user':
-                    st.markdown(
-                        f'<div class="user-message"><strong>You:</strong> {content}</div>',
-                        unsafe_allow_html=True
-                    )
-                else:
-                    formatted_content = format_message_with_citations(content)
-                    st.markdown(
-                        f'<div class="assistant-message"><strong>Assistant:</strong> {formatted_content}</div>',
-                        unsafe_allow_html=True
-                    )
-                    
-                    # Show sources if available
-                    if 'sources' in message and message['sources']:
-                        with st.expander("View Sources"):
-                            for source in message['sources']:
-                                if source['type'] == 'section':
-                                    st.write(
-                                        f"📄 Section {source.get('section', 'N/A')}: {source.get('path', '')}"
-                                    )
-                                elif source['type'] == 'link':
-                                    st.write(
-                                        f"🔗 {source.get('text', '')}: {source.get('url', '')}"
-                                    )
+            messages = st.session_state.messages
+            hidden = max(len(messages) - CHAT_HISTORY_PAGE_SIZE * st.session_state.history_pages, 0)
+            if hidden and st.button(f"Show earlier messages ({hidden} hidden)", key="show_earlier"):
+                st.session_state.history_pages += 1
+                st.rerun()
+            for message in messages[hidden:]:
+                render_message(message)
         
         # Chat input
         user_input = st.chat_input("Ask a question about the strategy...")
         
         if user_input:
+            # A new message supersedes any query still running from an earlier run
+            previous_query = st.session_state.active_query
+            if previous_query is not None and previous_query.cancel():
+                logger.info("Cancelled the in-flight query for a new message")
+            st.session_state.active_query = None
+            
             # Add user message to history
-            st.session_state.messages.append({'role': 'user', 'content': user_input})
+            user_message = build_message('user', user_input)
+            st.session_state.messages.append(user_message)
             
             # Get assistant response
-            with st.spinner("Thinking..."):
-                try:
-                    # Backwards-compatible call to query_rag:
-                    # Only pass response_style if the deployed function supports it.
-                    query_fn = rag_handler.query_rag
-                    sig = inspect.signature(query_fn)
-                    extra_kwargs = {}
-                    if "response_style" in sig.parameters:
-                        extra_kwargs["response_style"] = response_style
+            try:
+                # Backwards-compatible call to the streaming / plain query API:
+                # Only pass optional arguments the deployed function supports.
+                submit_stream = getattr(rag_handler, 'submit_query_rag_stream', None)
+                sig = inspect.signature(rag_handler.aquery_rag_stream if submit_stream else rag_handler.aquery_rag)
+                extra_kwargs = {}
+                if "response_style" in sig.parameters:
+                    extra_kwargs["response_style"] = response_style
+                if "query_cache" in sig.parameters:
+                    extra_kwargs["query_cache"] = query_cache
+                if "answer_cache" in sig.parameters:
+                    extra_kwargs["answer_cache"] = answer_cache
+                if "lexical_index" in sig.parameters:
+                    extra_kwargs["lexical_index"] = lexical_index
+                if "section_tree" in sig.parameters:
+                    extra_kwargs["section_tree"] = section_tree
+                if "role_guidance" in sig.parameters:
+                    extra_kwargs["role_guidance"] = role_guidance
+                if "faq_catalogue" in sig.parameters:
+                    extra_kwargs["faq_catalogue"] = faq_catalogue
+                if "table_store" in sig.parameters:
+                    extra_kwargs["table_store"] = table_store
 
-                    result = query_fn(
-                        user_query=user_input,
-                        collection=collection,
+                if submit_stream is None:
+                    with st.spinner("Thinking..."):
+                        active_query = rag_handler.submit_query_rag(
+                            user_input,
+                            collection,
+                            user_role=None,
+                            top_k=5,
+                            **extra_kwargs
+                        )
+                        st.session_state.active_query = active_query
+                        result = active_query.result()
+                else:
+                    # Show the question right away and render the answer as it streams in
+                    with chat_container:
+                        st.markdown(user_message['html'], unsafe_allow_html=True)
+                        answer_placeholder = st.empty()
+                    
+                    active_query = submit_stream(
+                        user_input,
+                        collection,
                         user_role=None,
                         top_k=5,
                         **extra_kwargs
                     )
+                    st.session_state.active_query = active_query
                     
-                    response = result['response']
-                    
-                    # Add assistant message to history
-                    st.session_state.messages.append({
-                        'role': 'assistant',
-                        'content': response,
-                        'sources': result.get('sources', [])
-                    })
-                    
-                    st.rerun()
-                    
-                except Exception as e:
-                    error_message = f"Error processing query: {str(e)}"
-                    st.error(error_message)
-                    logger.error(f"Query error: {e}", exc_info=True)
-                    st.session_state.messages.append({
-                        'role': 'assistant',
-                        'content': error_message
-                    })
-                    st.rerun()
+                    result = {}
+                    # Plain escaped text while streaming, built a chunk at a time;
+                    # citations and formatting are applied once by build_message
+                    streamed_html = ""
+                    thinking_html = '<div class="assistant-message"><strong>Assistant:</strong> <em>Thinking...</em></div>'
+                    answer_placeholder.markdown(thinking_html, unsafe_allow_html=True)
+                    try:
+                        # Heartbeats re-render the placeholder while waiting, which lets
+                        # Streamlit stop this run as soon as a new message arrives
+                        for event in active_query.events(heartbeat=QUERY_HEARTBEAT_SECONDS):
+                            if event['type'] == 'waiting' and not streamed_html:
+                                answer_placeholder.markdown(thinking_html, unsafe_allow_html=True)
+                            elif event['type'] == 'text':
+                                streamed_html += escape(event['text']).replace('\n', '<br/>')
+                                answer_placeholder.markdown(
+                                    f'<div class="assistant-message"><strong>Assistant:</strong> '
+                                    f'{streamed_html}</div>',
+                                    unsafe_allow_html=True
+                                )
+                            elif event['type'] == 'final':
+                                result = {k: v for k, v in event.items() if k != 'type'}
+                    finally:
+                        # Stopped mid-answer (e.g. by a new message): abort the query
+                        active_query.cancel()
+                
+                st.session_state.active_query = None
+                
+                response = result.get('response', '')
+                
+                # Add assistant message to history
+                st.session_state.messages.append(build_message(
+                    'assistant',
+                    response,
+                    sources=result.get('sources', []),
+                    token_usage=result.get('token_usage'),
+                    rerank=result.get('rerank'),
+                    catalogue=result.get('catalogue', False),
+                    table_lookup=result.get('table_lookup')
+                ))
+                
+                st.rerun()
+                
+            except Exception as e:
+                error_message = f"Error processing query: {str(e)}"
+                st.error(error_message)
+                logger.error(f"Query error: {e}", exc_info=True)
+                st.session_state.messages.append(build_message('assistant', error_message))
+                st.rerun()
 
     with graph_tab:
+        # open is False while another tab is shown (None/missing when tabs do not track state)
+        if getattr(graph_tab, 'open', None) is False:
+            return
+        
         # Strategy graph display
         st.header("📊 Strategy Graph")
         
-        # Display React Flow interactive graph
+        graph_view = st.radio(
+            "View",
+            ["Strategy map", "Pillars, initiatives & KPIs"],
+            horizontal=True,
+            label_visibility="collapsed"
+        )
+        
         try:
             import streamlit.components.v1 as components
-            import os
-            
-            # Read the React Flow HTML file
-            html_file_path = os.path.join(os.path.dirname(__file__), 'reactflow_graph.html')
-            with open(html_file_path, 'r', encoding='utf-8') as f:
-                reactflow_html = f.read()
             
-            components.html(reactflow_html, height=800, scrolling=False)
+            if graph_view == "Strategy map":
+                # Document overview from static/strategy_map.json
+                html = graph_page(graph_page_key(strategy_map_hash()), build_strategy_map_html)
+                components.html(html, height=800, scrolling=False)
+            else:
+                # Structure extracted from Sections 7.2, 7.3 and 8.2 by ingest.py
+                artifact = read_strategy_artifact()
+                if artifact is None:
+                    st.info("No strategy structure stored yet. Run `python ingest.py` to extract it.")
+                else:
+                    # Stays mounted; after the first render only structure changes are sent
+                    strategy_mindmap(artifact, height=650)
             
         except Exception as e:
             st.error(f"Error rendering interactive graph: {str(e)}")
@@ -0,0 +1,92 @@
+"""
+Background event loop for running the async query pipeline from sync code.
+
+All coroutines share one long-lived loop on a daemon thread, so async clients
+(e.g. Gemini's gRPC aio channels) stay bound to a single loop, and sync callers
+such as Streamlit's script thread never need a loop of their own.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Coroutine, Optional
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared background event loop, starting it on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="rag-event-loop", daemon=True)
+            thread.start()
+            logger.info("Started background event loop for async queries")
+        return _loop
+
+
+def submit(coro: Coroutine) -> concurrent.futures.Future:
+    """
+    Schedule a coroutine on the background loop.
+    
+    Args:
+        coro: Coroutine to run
+    
+    Returns:
+        Future for the result; calling cancel() on it cancels the running task
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+
+def run_sync(coro: Coroutine, timeout: Optional[float] = None) -> Any:
+    """
+    Run a coroutine on the background loop and block until it finishes.
+    
+    Args:
+        coro: Coroutine to run
+        timeout: Optional timeout in seconds
+    
+    Returns:
+        The coroutine's result
+    """
+    loop = get_event_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync() called from the background loop; await the coroutine instead")
+    
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise
+
+
+def shutdown():
+    """Stop the background loop (pending tasks are cancelled)."""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            return
+        loop = _loop
+        _loop = None
+    
+    async def _cancel_pending():
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    asyncio.run_coroutine_threadsafe(_cancel_pending(), loop).result(timeout=5)
+    loop.call_soon_threadsafe(loop.stop)
+    logger.info("Stopped background event loop")
@@ -0,0 +1,398 @@
+"""
+Offline benchmarks for the Kaiser Strategy Chatbot pipeline.
+Uses local stand-ins for Gemini so results are reproducible without an API key.
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import (
+    DOCUMENT_PATH,
+    TOP_K_CHUNKS,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MAX_CONCURRENCY,
+    HYPERLINK_MAX_WORKERS,
+    HYPERLINK_PER_HOST_LIMIT
+)
+
+
+def benchmark_embeddings(num_texts: int, latency: float, batch_size: int, max_concurrency: int):
+    """
+    Compare sequential single-item embedding with the batched, concurrent pipeline.
+    
+    Args:
+        num_texts: Number of synthetic chunks to embed
+        latency: Simulated round-trip latency per request (seconds)
+        batch_size: Texts per request for the batched run
+        max_concurrency: Batches in flight for the batched run
+    """
+    from vector_store import generate_embeddings, make_fake_embedder
+    
+    texts = [f"Synthetic chunk {i} about strategic pillar {i % 5}" for i in range(num_texts)]
+    embed_fn = make_fake_embedder(latency=latency)
+    
+    start = time.perf_counter()
+    sequential = generate_embeddings(texts, batch_size=1, max_concurrency=1, embed_fn=embed_fn)
+    sequential_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    batched = generate_embeddings(texts, batch_size=batch_size, max_concurrency=max_concurrency, embed_fn=embed_fn)
+    batched_time = time.perf_counter() - start
+    
+    assert sequential == batched, "Batched output does not match sequential output"
+    
+    print(f"Embedding {num_texts} texts (simulated latency {latency * 1000:.0f}ms/request)")
+    print(f"  Sequential (batch=1, concurrency=1): {sequential_time:.3f}s "
+          f"({num_texts / sequential_time:.1f} texts/s)")
+    print(f"  Batched (batch={batch_size}, concurrency={max_concurrency}): {batched_time:.3f}s "
+          f"({num_texts / batched_time:.1f} texts/s)")
+
+
+def start_local_http_server(latency: float, slow_latency: float = 0.0):
+    """
+    Start a local HTTP server standing in for linked pages.
+    
+    Every path returns a small HTML page after ``latency`` seconds; paths
+    starting with /slow wait ``slow_latency`` seconds instead.
+    
+    Returns:
+        Tuple of (server, base_url); call server.shutdown() when done
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(slow_latency if self.path.startswith('/slow') else latency)
+            body = (f"<html><body><h1>Page {self.path}</h1>"
+                    f"<p>{'Strategic content for benchmarking. ' * 20}</p></body></html>").encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def benchmark_hyperlinks(num_urls: int, latency: float, max_workers: int, per_host_limit: int,
+                         deadline: float):
+    """
+    Compare serial fetching with the pooled concurrent fetcher against a local server.
+    
+    Args:
+        num_urls: Number of URLs to fetch
+        latency: Simulated server latency per request (seconds)
+        max_workers: Concurrent requests overall
+        per_host_limit: Concurrent requests per host
+        deadline: Global deadline for the concurrent run (seconds)
+    """
+    from hyperlink_handler import fetch_url_content, fetch_urls_concurrently
+    
+    server, base_url = start_local_http_server(latency, slow_latency=deadline * 2)
+    try:
+        urls = [f"{base_url}/page/{i}" for i in range(num_urls)]
+        
+        start = time.perf_counter()
+        serial = [fetch_url_content(url) for url in urls]
+        serial_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        concurrent = fetch_urls_concurrently(urls, max_workers=max_workers, per_host_limit=per_host_limit,
+                                             deadline=deadline)
+        concurrent_time = time.perf_counter() - start
+        
+        assert [r['url'] for r in concurrent] == urls, "Results are not in input order"
+        assert [r['content'] for r in concurrent] == [r['content'] for r in serial]
+        
+        # One stalled host must not hold up the batch beyond the deadline
+        start = time.perf_counter()
+        with_slow = fetch_urls_concurrently(urls + [f"{base_url}/slow"], max_workers=max_workers,
+                                            per_host_limit=per_host_limit, deadline=deadline)
+        deadline_time = time.perf_counter() - start
+    finally:
+        server.shutdown()
+    
+    print(f"Fetching {num_urls} URLs from one local host (simulated latency {latency * 1000:.0f}ms)")
+    print(f"  Serial: {serial_time:.3f}s")
+    print(f"  Concurrent (workers={max_workers}, per-host={per_host_limit}): {concurrent_time:.3f}s")
+    print(f"  With one stalled URL (deadline={deadline}s): {deadline_time:.3f}s, "
+          f"stalled URL error: {with_slow[-1]['error']}")
+
+
+# Run in a fresh interpreter: import the backend, open the collection, answer one query
+_COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+backend, directory, name, query = sys.argv[1], sys.argv[2], sys.argv[3], json.loads(sys.argv[4])
+if backend == "numpy":
+    from numpy_store import NumpyCollection
+    collection = NumpyCollection.open(name, directory, create=False)
+else:
+    import chromadb
+    collection = chromadb.PersistentClient(path=directory).get_collection(name=name)
+collection.query(query_embeddings=[query], n_results=5)
+print(time.perf_counter() - start)
+"""
+
+
+def benchmark_vector_store(num_chunks: int, dimension: int, num_queries: int, top_k: int, runs: int):
+    """
+    Compare the NumPy memory-mapped backend with ChromaDB.
+    
+    Measures cold start (fresh interpreter: import, open, first query), warm
+    p50/p99 query latency through _search_collection with and without the
+    role filter, and how many of Chroma's (approximate) hits match the exact top-k.
+    
+    Args:
+        num_chunks: Number of chunks to index (document chunks repeated as needed)
+        dimension: Embedding dimension
+        num_queries: Queries per latency measurement
+        top_k: Results per query
+        runs: Cold-start runs per backend (median reported)
+    """
+    import numpy as np
+    from document_processor import parse_markdown_file, chunk_by_headers
+    from clients import get_collection
+    from vector_store import make_fake_embedder, store_chunks, _search_collection
+    
+    base_chunks = chunk_by_headers(parse_markdown_file(DOCUMENT_PATH))
+    chunks = []
+    for i in range(num_chunks):
+        chunk = dict(base_chunks[i % len(base_chunks)])
+        chunk['content'] = f"{chunk['content']}\n(copy {i // len(base_chunks)})"
+        chunk['content_type'] = 'main_doc'
+        chunks.append(chunk)
+    
+    embed_fn = make_fake_embedder(dimension=dimension)
+    embeddings = embed_fn([chunk['content'] for chunk in chunks], task_type="RETRIEVAL_DOCUMENT")
+    queries = embed_fn([f"benchmark query {i}" for i in range(num_queries)], task_type="RETRIEVAL_QUERY")
+    
+    name = "benchmark_chunks"
+    directory = tempfile.mkdtemp(prefix="vector_store_benchmark_")
+    collections = {}
+    for backend in ("chroma", "numpy"):
+        collections[backend] = get_collection(name, directory, create=True, backend=backend)
+        store_chunks(collections[backend], chunks, embeddings)
+    
+    print(f"Vector store: {num_chunks} chunks x {dimension} dims, {num_queries} queries, top_k={top_k}")
+    results = {}
+    for backend, collection in collections.items():
+        cold_starts = []
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, "-c", _COLD_START_SCRIPT, backend, directory, name, json.dumps(queries[0])],
+                capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+            )
+            cold_starts.append(float(output.stdout.strip().splitlines()[-1]))
+        
+        line = f"  {backend:<7} cold start {np.median(cold_starts) * 1000:8.1f}ms"
+        for role_filter in (None, "board"):
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                hits = _search_collection(collection, query, top_k, role_filter)
+                latencies.append(time.perf_counter() - start)
+                if role_filter is None:
+                    results.setdefault(backend, []).append([hit['id'] for hit in hits])
+            label = "filtered" if role_filter else "unfiltered"
+            line += (f" | {label} p50 {np.percentile(latencies, 50) * 1000:6.2f}ms"
+                     f" p99 {np.percentile(latencies, 99) * 1000:6.2f}ms")
+        print(line)
+    
+    overlap = np.mean([
+        len(set(approx) & set(exact)) / max(len(exact), 1)
+        for approx, exact in zip(results["chroma"], results["numpy"])
+    ])
+    print(f"  Chroma top-{top_k} agreement with exact search: {overlap:.1%}")
+
+
+ROLE_BENCHMARK_QUERIES = [
+    "What should the board of directors prioritize in 2026?",
+    "As a frontline nurse, what should I focus on?",
+    "What actions should the CEO take on Risant Health?",
+    "What should operational leaders do about automation?",
+    "What questions should the board track?",
+    "How should a director support workforce engagement?",
+    "What should frontline staff and the board do together?",
+    "What does the strategy say about Medicaid?"
+]
+
+
+def benchmark_role_guidance(latency: float, num_queries: int, top_k: int):
+    """
+    Compare the precomputed role-guidance lookup with a role-filtered vector search.
+    
+    The search path embeds the query (simulated latency) and runs
+    _search_collection with the role filter, as role-specific retrieval did
+    before. The lookup path runs role detection, role_lookup_mode and the
+    index lookup. Queries without a confident role fall back to the search.
+    
+    Args:
+        latency: Simulated query-embedding latency (seconds)
+        num_queries: Queries per latency measurement (cycling through ROLE_BENCHMARK_QUERIES)
+        top_k: Results per search
+    """
+    import numpy as np
+    from config import ROLE_GUIDANCE_MIN_CONFIDENCE
+    from document_processor import parse_markdown_file, chunk_by_headers
+    from clients import get_collection
+    from vector_store import make_fake_embedder, store_chunks, _search_collection
+    from rag_handler import detect_role_from_query, is_advice_request
+    from role_guidance import RoleGuidanceIndex, role_lookup_mode
+    
+    markdown_text = parse_markdown_file(DOCUMENT_PATH)
+    start = time.perf_counter()
+    index = RoleGuidanceIndex.build(markdown_text)
+    build_time = time.perf_counter() - start
+    
+    # Split and tagged as at ingestion, so the filtered search sees every role's chunk
+    chunks = index.split_chunks(chunk_by_headers(markdown_text))
+    for chunk in chunks:
+        chunk['content_type'] = 'main_doc'
+    embed_fn = make_fake_embedder(latency=latency)
+    collection = get_collection("benchmark_roles", tempfile.mkdtemp(prefix="role_benchmark_"), create=True)
+    store_chunks(collection, chunks, make_fake_embedder()([c['content'] for c in chunks], task_type="RETRIEVAL_DOCUMENT"))
+    
+    queries = [ROLE_BENCHMARK_QUERIES[i % len(ROLE_BENCHMARK_QUERIES)] for i in range(num_queries)]
+    search_latencies, lookup_latencies = [], []
+    modes = {}
+    for query in queries:
+        role = detect_role_from_query(query)
+        
+        start = time.perf_counter()
+        embedding = embed_fn([query], task_type="RETRIEVAL_QUERY")[0]
+        _search_collection(collection, embedding, top_k, role)
+        search_latencies.append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        mode = role_lookup_mode(query, role, None, is_advice_request(query), ROLE_GUIDANCE_MIN_CONFIDENCE)
+        if mode is not None:
+            index.lookup(role)
+        lookup_time = time.perf_counter() - start
+        if mode != 'direct':
+            # Narrowed or unmatched queries still pay for the embedding and search
+            start = time.perf_counter()
+            embedding = embed_fn([query], task_type="RETRIEVAL_QUERY")[0]
+            _search_collection(collection, embedding, top_k if mode is None else max(top_k - 1, 1), None)
+            lookup_time += time.perf_counter() - start
+        lookup_latencies.append(lookup_time)
+        modes[mode] = modes.get(mode, 0) + 1
+    
+    print(f"Role guidance: {len(index.roles)} roles indexed in {build_time * 1000:.2f}ms, "
+          f"{num_queries} queries (simulated embedding latency {latency * 1000:.0f}ms)")
+    for label, latencies in (("Role-filtered search", search_latencies), ("Lookup path", lookup_latencies)):
+        print(f"  {label:<21} p50 {np.percentile(latencies, 50) * 1000:7.2f}ms "
+              f"p99 {np.percentile(latencies, 99) * 1000:7.2f}ms")
+    print("  Lookup modes: " + ", ".join(f"{mode or 'search'} {count}" for mode, count in modes.items()))
+
+
+def benchmark_section_index(scale: int, runs: int):
+    """
+    Time the single-pass section index and the consumers that share it.
+    
+    The synthetic document is output.md repeated ``scale`` times. Each
+    consumer (chunking, URL extraction, strategy sections, role guidance)
+    runs once with the shared index and once building its own, which is
+    what each did when it scanned the document separately.
+    
+    Args:
+        scale: Number of copies of output.md in the synthetic document
+        runs: Repetitions per measurement (best time is reported)
+    """
+    from document_processor import parse_markdown_file, chunk_by_headers, extract_urls_from_markdown, SectionIndex
+    from graph_extractor import extract_strategy_sections
+    from role_guidance import extract_role_guidance
+    
+    markdown_text = '\n'.join([parse_markdown_file(DOCUMENT_PATH)] * scale)
+    
+    def best(fn):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - start)
+        return min(times), result
+    
+    build_time, index = best(lambda: SectionIndex(markdown_text))
+    chunks = chunk_by_headers(markdown_text, index)
+    consumers = [
+        ("chunk_by_headers", lambda i: chunk_by_headers(markdown_text, i)),
+        ("extract_urls_from_markdown", lambda i: extract_urls_from_markdown(markdown_text, chunks, i)),
+        ("extract_strategy_sections", lambda i: extract_strategy_sections(markdown_text, i)),
+        ("extract_role_guidance", lambda i: extract_role_guidance(markdown_text, i))
+    ]
+    
+    size_mb = len(markdown_text.encode('utf-8')) / 1e6
+    print(f"Section index: {size_mb:.1f} MB ({scale}x {DOCUMENT_PATH}, {index.num_lines} lines), "
+          f"{len(index.headers)} headers")
+    print(f"  Index build (one pass): {build_time * 1000:8.2f}ms ({size_mb / build_time:.0f} MB/s)")
+    shared_total, separate_total = build_time, 0.0
+    for name, consumer in consumers:
+        shared_time, _ = best(lambda: consumer(index))
+        separate_time, _ = best(lambda: consumer(None))
+        shared_total += shared_time
+        separate_total += separate_time
+        print(f"  {name:<27} shared index {shared_time * 1000:8.2f}ms, own scan {separate_time * 1000:8.2f}ms")
+    print(f"  Total: shared {shared_total * 1000:.2f}ms (including the build), "
+          f"separate scans {separate_total * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run offline performance benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    
+    embeddings_parser = subparsers.add_parser("embeddings", help="Batched embedding throughput")
+    embeddings_parser.add_argument("--num-texts", type=int, default=500)
+    embeddings_parser.add_argument("--latency", type=float, default=0.05)
+    embeddings_parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE)
+    embeddings_parser.add_argument("--max-concurrency", type=int, default=EMBEDDING_MAX_CONCURRENCY)
+    
+    hyperlinks_parser = subparsers.add_parser("hyperlinks", help="Concurrent hyperlink fetching")
+    hyperlinks_parser.add_argument("--num-urls", type=int, default=20)
+    hyperlinks_parser.add_argument("--latency", type=float, default=0.1)
+    hyperlinks_parser.add_argument("--max-workers", type=int, default=HYPERLINK_MAX_WORKERS)
+    hyperlinks_parser.add_argument("--per-host-limit", type=int, default=HYPERLINK_PER_HOST_LIMIT)
+    hyperlinks_parser.add_argument("--deadline", type=float, default=2.0)
+    
+    vector_store_parser = subparsers.add_parser("vector-store", help="NumPy backend vs ChromaDB")
+    vector_store_parser.add_argument("--num-chunks", type=int, default=500)
+    vector_store_parser.add_argument("--dimension", type=int, default=768)
+    vector_store_parser.add_argument("--num-queries", type=int, default=200)
+    vector_store_parser.add_argument("--top-k", type=int, default=TOP_K_CHUNKS)
+    vector_store_parser.add_argument("--runs", type=int, default=3)
+    
+    role_guidance_parser = subparsers.add_parser("role-guidance", help="Role-guidance lookup vs filtered search")
+    role_guidance_parser.add_argument("--latency", type=float, default=0.05)
+    role_guidance_parser.add_argument("--num-queries", type=int, default=200)
+    role_guidance_parser.add_argument("--top-k", type=int, default=TOP_K_CHUNKS)
+    
+    sections_parser = subparsers.add_parser("sections", help="Single-pass section index on a scaled-up document")
+    sections_parser.add_argument("--scale", type=int, default=100)
+    sections_parser.add_argument("--runs", type=int, default=3)
+    
+    args = parser.parse_args()
+    
+    # Keep per-batch progress logs out of the benchmark output
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    
+    if args.benchmark == "embeddings":
+        benchmark_embeddings(args.num_texts, args.latency, args.batch_size, args.max_concurrency)
+    elif args.benchmark == "hyperlinks":
+        benchmark_hyperlinks(args.num_urls, args.latency, args.max_workers, args.per_host_limit, args.deadline)
+    elif args.benchmark == "vector-store":
+        benchmark_vector_store(args.num_chunks, args.dimension, args.num_queries, args.top_k, args.runs)
+    elif args.benchmark == "role-guidance":
+        benchmark_role_guidance(args.latency, args.num_queries, args.top_k)
+    elif args.benchmark == "sections":
+        benchmark_section_index(args.scale, args.runs)
@@ -0,0 +1,102 @@
+"""
+Build the FAQ answer catalogue.
+Run after ingest.py to answer the canonical questions in FAQ_QUESTIONS once;
+the app then serves close matches from chroma_db/faq_catalogue/ without a
+Gemini call. Re-run after re-ingesting (answers from an older index version
+are not served).
+"""
+import argparse
+import logging
+import os
+from typing import List
+
+from config import (
+    load_config,
+    CHROMA_COLLECTION_NAME,
+    CHROMA_PERSIST_DIRECTORY,
+    FAQ_CATALOGUE_DIRECTORY,
+    FAQ_QUESTIONS,
+    FAQ_STYLES,
+    HIERARCHICAL_RETRIEVAL,
+    ROLE_GUIDANCE_LOOKUP,
+    TABLE_LOOKUP
+)
+from faq_catalogue import FAQCatalogue
+from lexical_index import LexicalIndex
+from section_tree import SectionTree
+from role_guidance import RoleGuidanceIndex
+from table_store import TableStore
+from rag_handler import query_rag, is_advice_request
+from vector_store import initialize_chroma_db, collection_exists, embed_query, read_index_version
+
+# Set up logging
+LOG_DIR = "logs"
+os.makedirs(LOG_DIR, exist_ok=True)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(),
+        logging.FileHandler(os.path.join(LOG_DIR, "ingestion.log"), mode='a', encoding='utf-8')
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def main(styles: List[str] = FAQ_STYLES, directory: str = FAQ_CATALOGUE_DIRECTORY):
+    """
+    Answer every catalogue question and save the catalogue.
+    
+    Args:
+        styles: Response styles to store answers for
+        directory: Directory to save the catalogue to
+    """
+    load_config()
+    if not collection_exists(CHROMA_COLLECTION_NAME, CHROMA_PERSIST_DIRECTORY):
+        raise SystemExit(f"Collection '{CHROMA_COLLECTION_NAME}' not found. Run `python ingest.py` first.")
+    
+    _, collection = initialize_chroma_db(CHROMA_COLLECTION_NAME, CHROMA_PERSIST_DIRECTORY)
+    lexical_index = LexicalIndex.load()
+    section_tree = SectionTree.load() if HIERARCHICAL_RETRIEVAL else None
+    # Same lookups as the app, so catalogue answers match live ones
+    role_guidance = RoleGuidanceIndex.load() if ROLE_GUIDANCE_LOOKUP else None
+    table_store = TableStore.load() if TABLE_LOOKUP else None
+    index_version = read_index_version()
+    
+    def answer(question: str, style: str):
+        logger.info(f"Answering ({style}): {question}")
+        return query_rag(question, collection, response_style=style,
+                         lexical_index=lexical_index, section_tree=section_tree,
+                         role_guidance=role_guidance, table_store=table_store)
+    
+    embeddings = [embed_query(question) for question in FAQ_QUESTIONS]
+    catalogue = FAQCatalogue.build(FAQ_QUESTIONS, embeddings, answer, styles, is_advice_request, index_version)
+    catalogue.save(directory)
+    
+    summary = f"""
+{'=' * 80}
+FAQ CATALOGUE BUILT
+{'=' * 80}
+Questions answered: {len(catalogue.entries)} of {len(FAQ_QUESTIONS)}
+Styles: {', '.join(styles)}
+Index version: {index_version}
+Catalogue location: {directory}
+{'=' * 80}
+"""
+    print(summary)
+    logger.info(summary.strip())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the precomputed FAQ answer catalogue")
+    parser.add_argument(
+        "--styles",
+        nargs="+",
+        default=FAQ_STYLES,
+        help="Response styles to store answers for"
+    )
+    
+    args = parser.parse_args()
+    
+    main(styles=args.styles)
@@ -0,0 +1,204 @@
+"""
+Client registry for long-lived service handles.
+Owns the Gemini configuration and model handles and the ChromaDB clients and
+collections, so they are created lazily once per process and shared across
+Streamlit sessions instead of being rebuilt on every request.
+"""
+import chromadb
+import google.generativeai as genai
+import logging
+import os
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from config import (
+    CHROMA_COLLECTION_NAME,
+    CHROMA_PERSIST_DIRECTORY,
+    GEMINI_MODEL,
+    GOOGLE_API_KEY,
+    VECTOR_STORE_BACKEND
+)
+from numpy_store import NumpyCollection, delete_numpy_collection
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_genai_configured = False
+_models: Dict[str, genai.GenerativeModel] = {}
+_chroma_clients: Dict[str, chromadb.Client] = {}
+_collections: Dict[Tuple[str, str, str], chromadb.Collection] = {}
+
+
+def configure_genai(api_key: Optional[str] = GOOGLE_API_KEY):
+    """
+    Configure the Google GenAI SDK once per process.
+    Used for both generation and embedding calls.
+    
+    Args:
+        api_key: Google API key
+    
+    Raises:
+        ValueError: If no API key is available
+    """
+    global _genai_configured
+    if _genai_configured:
+        return
+    with _lock:
+        if _genai_configured:
+            return
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not set in config")
+        genai.configure(api_key=api_key)
+        _genai_configured = True
+        logger.info("Configured Google GenAI client")
+
+
+def get_generative_model(model_name: str = GEMINI_MODEL) -> genai.GenerativeModel:
+    """
+    Return the shared GenerativeModel handle for a model name.
+    
+    Args:
+        model_name: Gemini model name
+    
+    Returns:
+        GenerativeModel instance (created on first use)
+    """
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+    with _lock:
+        if model_name not in _models:
+            configure_genai()
+            _models[model_name] = genai.GenerativeModel(model_name)
+            logger.info(f"Created GenerativeModel handle: {model_name}")
+        return _models[model_name]
+
+
+def get_chroma_client(persist_directory: str = CHROMA_PERSIST_DIRECTORY) -> chromadb.Client:
+    """
+    Return the shared persistent ChromaDB client for a directory.
+    
+    Args:
+        persist_directory: Directory to persist ChromaDB data
+    
+    Returns:
+        ChromaDB client (created on first use)
+    """
+    key = os.path.abspath(persist_directory)
+    client = _chroma_clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        if key not in _chroma_clients:
+            os.makedirs(persist_directory, exist_ok=True)
+            _chroma_clients[key] = chromadb.PersistentClient(path=persist_directory)
+            logger.info(f"Opened ChromaDB client: {persist_directory}")
+        return _chroma_clients[key]
+
+
+def get_collection(collection_name: str = CHROMA_COLLECTION_NAME,
+                   persist_directory: str = CHROMA_PERSIST_DIRECTORY,
+                   create: bool = True,
+                   backend: str = VECTOR_STORE_BACKEND) -> chromadb.Collection:
+    """
+    Return the shared handle for a vector store collection.
+    
+    Args:
+        collection_name: Name of the collection
+        persist_directory: Directory to persist ChromaDB data
+        create: Create the collection (cosine space) if it does not exist
+        backend: "chroma" or "numpy" (a NumpyCollection with the same API)
+    
+    Returns:
+        ChromaDB collection (or NumpyCollection)
+    
+    Raises:
+        Exception: If the collection does not exist and create is False
+    """
+    key = (backend, os.path.abspath(persist_directory), collection_name)
+    collection = _collections.get(key)
+    if collection is not None:
+        return collection
+    with _lock:
+        if key in _collections:
+            return _collections[key]
+        if backend == "numpy":
+            collection = NumpyCollection.open(collection_name, persist_directory, create=create)
+            _collections[key] = collection
+            return collection
+        client = get_chroma_client(persist_directory)
+        try:
+            collection = client.get_collection(name=collection_name)
+            logger.info(f"Loaded existing collection: {collection_name}")
+        except Exception:
+            if not create:
+                raise
+            collection = client.create_collection(
+                name=collection_name,
+                metadata={"hnsw:space": "cosine"}
+            )
+            logger.info(f"Created new collection: {collection_name}")
+        _collections[key] = collection
+        return collection
+
+
+def drop_collection(collection_name: str = CHROMA_COLLECTION_NAME,
+                    persist_directory: str = CHROMA_PERSIST_DIRECTORY,
+                    backend: str = VECTOR_STORE_BACKEND):
+    """
+    Delete a collection and forget its cached handle.
+    
+    Args:
+        collection_name: Name of the collection
+        persist_directory: Directory to persist ChromaDB data
+        backend: "chroma" or "numpy"
+    """
+    with _lock:
+        _collections.pop((backend, os.path.abspath(persist_directory), collection_name), None)
+        if backend == "numpy":
+            delete_numpy_collection(collection_name, persist_directory)
+        else:
+            get_chroma_client(persist_directory).delete_collection(name=collection_name)
+        logger.info(f"Deleted existing collection: {collection_name}")
+
+
+def warm_up(collection_name: str = CHROMA_COLLECTION_NAME,
+            persist_directory: str = CHROMA_PERSIST_DIRECTORY,
+            model_names: Iterable[str] = (GEMINI_MODEL,),
+            backend: str = VECTOR_STORE_BACKEND) -> chromadb.Collection:
+    """
+    Eagerly create every handle needed to serve queries.
+    Call once at startup so the first request pays no construction cost.
+    
+    Args:
+        collection_name: Name of the collection to open
+        persist_directory: Directory to persist ChromaDB data
+        model_names: Gemini models to create handles for
+        backend: "chroma" or "numpy"
+    
+    Returns:
+        The opened collection
+    
+    Raises:
+        Exception: If the collection does not exist
+    """
+    configure_genai()
+    for model_name in model_names:
+        get_generative_model(model_name)
+    return get_collection(collection_name, persist_directory, create=False, backend=backend)
+
+
+def shutdown():
+    """Release every cached handle and stop the background event loop."""
+    global _genai_configured
+    from async_runner import shutdown as shutdown_event_loop
+    
+    with _lock:
+        _models.clear()
+        _collections.clear()
+        _chroma_clients.clear()
+        _genai_configured = False
+    shutdown_event_loop()
+    logger.info("Client registry shut down")
@@ -28,6 +28,8 @@ EMBEDDING_MODEL = "gemini-embedding-001"  # Google embedding model
 # ChromaDB Configuration
 CHROMA_COLLECTION_NAME = "kaiser_strategy"
 CHROMA_PERSIST_DIRECTORY = "./chroma_db"
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")  # "chroma" or "numpy" (see numpy_store.py)
+INDEX_VERSION_FILE = os.path.join(CHROMA_PERSIST_DIRECTORY, "index_version.json")  # Written by ingest.py
 
 # Document Configuration
 DOCUMENT_PATH = "output.md"
@@ -87,14 +89,100 @@ PILLARS_SECTION = "7.2"
 INITIATIVES_SECTION = "7.3"
 KPIS_SECTION = "8.2"
 ROLE_GUIDANCE_SECTION = "8.3"
+STRATEGY_STRUCTURE_PATH = os.path.join(CHROMA_PERSIST_DIRECTORY, "strategy_structure.json")  # Written by ingest.py
+STRATEGY_LLM_VALIDATION = False  # Also run the Gemini extraction to cross-check the rule-based strategy structure
+GRAPH_ASSETS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")  # Graph renderer JS and strategy map data (no CDN)
 
 # RAG Configuration
 TOP_K_CHUNKS = 7
+CONTEXT_TOKEN_BUDGETS = {  # Max retrieved-context tokens in the prompt, per response style
+    "concise": 2500,
+    "detailed": 8000
+}
+MIN_CHUNK_CONTEXT_TOKENS = 64  # Lower-ranked chunks are dropped rather than trimmed below this
 EMBEDDING_BATCH_SIZE = 100
+EMBEDDING_MAX_CONCURRENCY = 4  # Batches in flight at once
+EMBEDDING_MAX_RETRIES = 3  # Attempts per batch before falling back to single-item calls
+EMBEDDING_RETRY_BACKOFF = 1.0  # Base backoff in seconds (doubled on each retry)
+
+# Lexical (BM25) Index Configuration
+LEXICAL_INDEX_DIRECTORY = os.path.join(CHROMA_PERSIST_DIRECTORY, "lexical_index")
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60  # Reciprocal-rank fusion damping constant
+LEXICAL_STRONG_MATCH_MARGIN = 1.5  # Best BM25 score must beat the runner-up by this factor to skip dense search
+
+# Hierarchical Retrieval Configuration
+HIERARCHICAL_RETRIEVAL = True  # Search leaf sections first, then expand to parents/siblings within the budget
+SECTION_TREE_PATH = os.path.join(CHROMA_PERSIST_DIRECTORY, "section_tree.json")
+
+# Table Store Configuration
+TABLE_LOOKUP = True  # Answer value lookups from parsed tables and send matching rows instead of whole tables
+TABLE_STORE_PATH = os.path.join(CHROMA_PERSIST_DIRECTORY, "tables.json")
+TABLE_LOOKUP_MAX_ROWS = 8  # Matching rows sent to the prompt
+TABLE_DIRECT_MIN_MARGIN = 1.5  # Required score ratio between the best and second-best row for a direct answer
+TABLE_DIRECT_MIN_QUERY_COVERAGE = 0.75  # Share of the query's content terms the row label, column headers and caption must cover for a direct answer
+TABLE_ROWS_MIN_LABEL_COVERAGE = 1.0  # Share of a row label the query must name before its table is replaced by matching rows
+TABLE_ROWS_MIN_SCORE_RATIO = 0.9  # ...and the row must score within this ratio of the best-matching row
+
+# Re-ranking Configuration
+RERANK_ENABLED = True  # MMR re-ranking over stored embeddings after retrieval
+RERANK_CANDIDATE_MULTIPLIER = 3  # Candidates retrieved per kept chunk
+MMR_LAMBDA = 0.7  # Relevance vs diversity trade-off (1.0 = relevance only)
+RERANK_MAX_PER_SECTION = 3  # Chunks kept from one section (or one linked page)
+RERANK_SECTION_DEPTH = 2  # Leading section_path components that identify a section
+
+# Role Guidance Configuration
+ROLE_GUIDANCE_LOOKUP = True  # Serve Section 8.3 role guidance by direct lookup when the role is clear
+ROLE_GUIDANCE_PATH = os.path.join(CHROMA_PERSIST_DIRECTORY, "role_guidance.json")
+ROLE_GUIDANCE_MIN_CONFIDENCE = 0.75  # Share of explicit role phrases in the query ("as a board member") that must name the same role
+
+# Cache Configuration
+CACHE_DIRECTORY = "./cache"
+EMBEDDING_CACHE_PATH = os.path.join(CACHE_DIRECTORY, "embeddings.sqlite3")
+EMBEDDING_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Least recently used entries are evicted beyond this size
+FETCH_CACHE_PATH = os.path.join(CACHE_DIRECTORY, "fetch.sqlite3")  # Conditional-GET cache for hyperlinks
+QUERY_EMBEDDING_CACHE_SIZE = 1024  # Max query embeddings kept in memory (LRU)
+QUERY_EMBEDDING_CACHE_TTL = 3600  # Seconds before a cached query embedding expires (None = never)
+
+# Answer Cache Configuration
+ANSWER_CACHE_SIZE = 256  # Max cached answers (LRU)
+ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.95  # Min cosine similarity between query embeddings for a hit
+ANSWER_CACHE_TTL = 24 * 3600  # Seconds before a cached answer expires (None = never)
+
+# FAQ Catalogue Configuration (built by build_faq.py)
+FAQ_CATALOGUE_DIRECTORY = os.path.join(CHROMA_PERSIST_DIRECTORY, "faq_catalogue")
+FAQ_SIMILARITY_THRESHOLD = 0.92  # Min cosine similarity between a query and a catalogue question
+FAQ_TTL = 7 * 24 * 3600  # Seconds before a catalogue answer expires (None = never)
+FAQ_STYLES = ["Concise", "Detailed"]
+FAQ_QUESTIONS = [
+    "Where is Kaiser Permanente headquartered?",
+    "How many members does Kaiser Permanente serve?",
+    "What are the five strategic pillars for 2026?",
+    "What are the strategic initiatives for 2026?",
+    "What are the key performance indicators for 2026?",
+    "What were the key findings of 2025?",
+    "What is the vision for 2026?",
+    "What is Risant Health?",
+    "What are the 2026 quarterly roadmap milestones?",
+    "What are the biggest risks facing Kaiser Permanente?"
+]
 
 # Hyperlink Configuration
 HYPERLINK_TIMEOUT = 30
+HYPERLINK_MAX_WORKERS = 8  # Concurrent fetches across all hosts
+HYPERLINK_PER_HOST_LIMIT = 2  # Concurrent fetches against a single host
+HYPERLINK_DEADLINE = 120  # Seconds for the whole fetch phase; unfinished URLs are reported as failed
 MAX_CONTENT_LENGTH = 50000  # Max characters for scraped content
+HYPERLINK_CHUNK_TOKENS = 512  # Target size of each hyperlink sub-chunk
+HYPERLINK_CHUNK_OVERLAP_TOKENS = 64  # Tokens shared between consecutive sub-chunks
+
+# Chat UI Configuration
+CHAT_HISTORY_PAGE_SIZE = 20  # Messages rendered per rerun; older ones load a page at a time on request
+QUERY_HEARTBEAT_SECONDS = 0.25  # How often the app checks for a new message while waiting on an answer
+
+# Token Estimation
+CHARS_PER_TOKEN = 4  # Rough characters-per-token ratio for Gemini models
 
 
 def load_config():
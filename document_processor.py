@@ -2,8 +2,15 @@
 Document processor for header-based markdown chunking.
 Splits markdown documents by headers while preserving hierarchy.
 """
+import bisect
 import re
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+
+from config import (
+    CHARS_PER_TOKEN,
+    HYPERLINK_CHUNK_TOKENS,
+    HYPERLINK_CHUNK_OVERLAP_TOKENS
+)
 
 
 def parse_markdown_file(file_path: str) -> str:
@@ -29,13 +36,149 @@ def parse_markdown_file(file_path: str) -> str:
         raise IOError(f"Error reading document file: {e}")
 
 
-def chunk_by_headers(markdown_text: str) -> List[Dict]:
+# Header line: 1-6 hashes followed by whitespace and text, or nothing (a blank
+# header such as "## "). Matched after a newline so the scan can use a fast
+# literal search; the text is prefixed with "\n" for the first line.
+_HEADER_LINE = re.compile(r'\n[^\S\n]*(#{1,6})(?:[^\S\n]+([^\n]*?))?[^\S\n]*(?=\n|\Z)')
+# Numbered title on its own line under a blank header ("7.2 Five Strategic Pillars ...")
+_TITLE_LINE = re.compile(r'(?:[^\S\n]*\n)+[^\S\n]*(\d+(?:\.\d+)+|\d+\\?\.)[^\S\n]+[^\n]*')
+
+
+def split_section_number(header_text: str) -> Tuple[Optional[str], str]:
+    """
+    Split a header into its section number and title.
+    
+    Args:
+        header_text: Header text without the leading hashes (e.g., "7.2 Five Strategic Pillars")
+        
+    Returns:
+        Tuple of (section number or None, title)
+    """
+    section_match = re.search(r'^(\d+\.?\d*\.?\d*)\s*[\.\-]?\s*(.+)$', header_text)
+    if section_match:
+        return section_match.group(1), section_match.group(2).strip()
+    # Try to find section number in header
+    section_match = re.search(r'^(\d+\.?\d*\.?\d*)', header_text)
+    if section_match:
+        section_num = section_match.group(1)
+        return section_num, header_text.replace(section_num, '').strip()
+    return None, header_text
+
+
+class SectionIndex:
+    """
+    Header index of a markdown document, built in one pass over the text.
+    
+    Every header (levels 1-6, including blank "##" headers) is recorded with
+    its level, text, section number and title, and the line and character
+    span of its section: up to the next header at the same or a higher level.
+    A blank header followed by a numbered title line (output.md has "## "
+    then "7.2 Five Strategic Pillars ...") takes its number and title from
+    that line, and its section starts there. Blank headers without a title
+    do not end sections. Consumers slice sections out of the text by these
+    spans instead of rescanning it.
+    """
+    
+    def __init__(self, markdown_text: str):
+        """
+        Args:
+            markdown_text: Full markdown content
+        """
+        self.text = markdown_text
+        self.num_lines = markdown_text.count('\n') + 1
+        self.headers: List[Dict] = []
+        self._by_number: Dict[str, Dict] = {}
+        self._lines: Optional[List[str]] = None
+        
+        padded = '\n' + markdown_text
+        line, position = 1, 0
+        open_sections: List[Dict] = []
+        for match in _HEADER_LINE.finditer(padded):
+            # match.start() is the preceding newline in the padded text, i.e.
+            # the start of the header line in the original text
+            header_char = match.start()
+            line += markdown_text.count('\n', position, header_char)
+            position = header_char
+            
+            text = (match.group(2) or '').strip()
+            header = {
+                'level': len(match.group(1)),
+                'text': text,
+                'section_number': None,
+                'title': text,
+                'header_line': line,
+                'header_char': header_char,
+                'line_start': line,
+                'char_start': header_char
+            }
+            if text:
+                header['section_number'], header['title'] = split_section_number(text)
+            else:
+                title = _TITLE_LINE.match(padded, match.end())
+                if title is None:
+                    # Blank header without a title: kept for chunking, not a section
+                    self.headers.append(header)
+                    continue
+                title_char = title.end() - len(title.group(0).lstrip())
+                header['section_number'], header['title'] = split_section_number(padded[title_char:title.end()].strip())
+                header['line_start'] = line + padded.count('\n', match.end(), title_char)
+                header['char_start'] = title_char - 1
+            
+            while open_sections and open_sections[-1]['level'] >= header['level']:
+                self._close(open_sections.pop(), header['header_line'] - 1, header_char)
+            open_sections.append(header)
+            self.headers.append(header)
+            if header['section_number']:
+                self._by_number.setdefault(header['section_number'].rstrip('.'), header)
+        
+        for header in open_sections:
+            self._close(header, self.num_lines, len(markdown_text))
+    
+    @staticmethod
+    def _close(header: Dict, line_end: int, char_end: int):
+        header['line_end'] = line_end
+        header['char_end'] = char_end
+    
+    @property
+    def lines(self) -> List[str]:
+        """Document lines (split once, on first use)."""
+        if self._lines is None:
+            self._lines = self.text.split('\n')
+        return self._lines
+    
+    def section(self, section_number: str) -> Optional[Dict]:
+        """
+        Look up a section header by number (e.g., "7.2").
+        
+        Returns:
+            Header dictionary (level, text, section_number, title,
+            header_line/header_char, line_start/line_end and
+            char_start/char_end spans), or None if there is no such section
+        """
+        return self._by_number.get(section_number.rstrip('.'))
+    
+    def section_text(self, section_number: str) -> Optional[str]:
+        """
+        Slice a section's text (its title line up to the next header at the
+        same or a higher level) out of the document.
+        
+        Returns:
+            Section text, or None if there is no such section
+        """
+        header = self.section(section_number)
+        if header is None:
+            return None
+        return self.text[header['char_start']:header['char_end']].rstrip()
+
+
+def chunk_by_headers(markdown_text: str, section_index: Optional[SectionIndex] = None) -> List[Dict]:
     """
     Split markdown by headers, preserving hierarchy.
     Each chunk includes complete section content until next same-level header.
     
     Args:
         markdown_text: Full markdown content
+        section_index: SectionIndex of the text (built if not given)
         
     Returns:
         List of chunk dictionaries with:
@@ -46,96 +189,232 @@ def chunk_by_headers(markdown_text: str) -> List[Dict]:
         - line_start, line_end: Line number range
         - header_text: Header title
     """
-    lines = markdown_text.split('\n')
+    index = section_index or SectionIndex(markdown_text)
+    # Chunks split at headers (#, ##, ###) with text; blank headers stay in the content
+    headers = [header for header in index.headers if header['text'] and header['level'] <= 3]
     chunks = []
-    current_chunk = None
     current_path = []
     current_levels = []  # Track level hierarchy
     
-    for line_num, line in enumerate(lines, start=1):
-        # Match markdown headers (#, ##, ###)
-        header_match = re.match(r'^(#{1,3})\s+(.+)$', line.strip())
+    # Content before first header - create a chunk for it
+    first_char = headers[0]['header_char'] if headers else len(markdown_text)
+    preamble = markdown_text[:first_char]
+    if preamble.strip():
+        chunks.append({
+            'content': preamble.strip(),
+            'section_path': 'Introduction',
+            'section_number': None,
+            'level': 0,
+            'line_start': preamble.count('\n', 0, len(preamble) - len(preamble.lstrip())) + 1,
+            'line_end': headers[0]['header_line'] - 1 if headers else index.num_lines,
+            'header_text': 'Introduction'
+        })
+        current_levels.append(0)
+        current_path = ['Introduction']
+    
+    for position, header in enumerate(headers):
+        level = header['level']
+        following = headers[position + 1] if position + 1 < len(headers) else None
         
-        if header_match:
-            level = len(header_match.group(1))
-            header_text = header_match.group(2).strip()
-            
-            # Save previous chunk if exists
-            if current_chunk:
-                current_chunk['line_end'] = line_num - 1
-                current_chunk['content'] = '\n'.join(current_chunk['content_lines']).strip()
-                if current_chunk['content']:  # Only add non-empty chunks
-                    chunks.append(current_chunk)
-            
-            # Update hierarchy
-            # Remove deeper levels when we encounter a same or higher level header
-            while current_levels and current_levels[-1] >= level:
-                current_levels.pop()
-                if current_path:
-                    current_path.pop()
-            
-            # Extract section number if present
-            section_match = re.search(r'^(\d+\.?\d*\.?\d*)\s*[\.\-]?\s*(.+)$', header_text)
-            if section_match:
-                section_num = section_match.group(1)
-                header_title = section_match.group(2).strip()
-            else:
-                # Try to find section number in header
-                section_match = re.search(r'^(\d+\.?\d*\.?\d*)', header_text)
-                if section_match:
-                    section_num = section_match.group(1)
-                    header_title = header_text.replace(section_num, '').strip()
-                else:
-                    section_num = None
-                    header_title = header_text
-            
-            # Build section path
-            current_path.append(header_title)
-            section_path = " > ".join(current_path)
-            
-            # Start new chunk
-            current_chunk = {
-                'content': [],
-                'content_lines': [line],  # Include header in content
-                'section_path': section_path,
-                'section_number': section_num,
-                'level': level,
-                'line_start': line_num,
-                'line_end': line_num,
-                'header_text': header_title
-            }
-            current_levels.append(level)
-            
-        else:
-            # Add line to current chunk
-            if current_chunk:
-                current_chunk['content_lines'].append(line)
-            else:
-                # Content before first header - create a chunk for it
-                if line.strip():
-                    current_chunk = {
-                        'content': [],
-                        'content_lines': [line],
-                        'section_path': 'Introduction',
-                        'section_number': None,
-                        'level': 0,
-                        'line_start': line_num,
-                        'line_end': line_num,
-                        'header_text': 'Introduction'
-                    }
-                    current_levels.append(0)
-                    current_path = ['Introduction']
-    
-    # Save last chunk
-    if current_chunk:
-        current_chunk['line_end'] = len(lines)
-        current_chunk['content'] = '\n'.join(current_chunk['content_lines']).strip()
-        if current_chunk['content']:
-            chunks.append(current_chunk)
+        # Update hierarchy
+        # Remove deeper levels when we encounter a same or higher level header
+        while current_levels and current_levels[-1] >= level:
+            current_levels.pop()
+            if current_path:
+                current_path.pop()
+        
+        # Build section path
+        current_path.append(header['title'])
+        current_levels.append(level)
+        
+        chunks.append({
+            'content': markdown_text[header['header_char']:following['header_char'] if following else len(markdown_text)].strip(),
+            'section_path': " > ".join(current_path),
+            'section_number': header['section_number'],
+            'level': level,
+            'line_start': header['header_line'],
+            'line_end': following['header_line'] - 1 if following else index.num_lines,
+            'header_text': header['title']
+        })
     
     return chunks
 
 
+_TABLE_SEPARATOR_CELL = re.compile(r'^:?-{3,}:?$')
+
+
+def _split_table_row(line: str) -> List[str]:
+    """Split a pipe-table row into cleaned cell texts (bold markers and escapes removed)."""
+    cells = line.strip().strip('|').split('|')
+    return [re.sub(r'\\(.)', r'\1', cell.replace('**', '')).strip() for cell in cells]
+
+
+def parse_markdown_tables(markdown_text: str) -> List[Dict]:
+    """
+    Parse the pipe tables in a markdown text.
+    Separator rows (| --- |) are skipped wherever they appear, and a single
+    blank line inside a table does not end it.
+    
+    Args:
+        markdown_text: Markdown content
+        
+    Returns:
+        List of table dictionaries with:
+        - caption: Bold line just above the table (e.g., "Financial KPIs"), or ''
+        - columns: Header cell texts
+        - rows: Data rows (lists of cell texts, padded/truncated to the columns)
+        - line_start, line_end: Line number range within the text (1-based)
+    """
+    lines = markdown_text.split('\n')
+    tables = []
+    index = 0
+    while index < len(lines):
+        if not lines[index].strip().startswith('|'):
+            index += 1
+            continue
+        
+        start = index
+        rows = []
+        while index < len(lines):
+            line = lines[index].strip()
+            if line.startswith('|'):
+                cells = _split_table_row(line)
+                if not all(_TABLE_SEPARATOR_CELL.match(cell) or not cell for cell in cells):
+                    rows.append(cells)
+                end = index
+                index += 1
+            elif not line and index + 1 < len(lines) and lines[index + 1].strip().startswith('|'):
+                index += 1
+            else:
+                break
+        if not rows:
+            continue
+        
+        caption = ''
+        for previous in reversed(lines[max(start - 3, 0):start]):
+            if previous.strip():
+                bold = re.fullmatch(r'\*\*(.+?)\*\*:?', previous.strip())
+                caption = bold.group(1).strip() if bold else ''
+                break
+        
+        columns = rows[0]
+        tables.append({
+            'caption': caption,
+            'columns': columns,
+            'rows': [(row + [''] * len(columns))[:len(columns)] for row in rows[1:]],
+            'line_start': start + 1,
+            'line_end': end + 1
+        })
+    return tables
+
+
+def extract_tables(chunks: List[Dict]) -> List[Dict]:
+    """
+    Parse the tables in each chunk and link them to the chunk's section.
+    
+    Args:
+        chunks: Chunks from chunk_by_headers
+        
+    Returns:
+        Table dictionaries from parse_markdown_tables plus section_number,
+        section_path and table_index (position within the chunk); line
+        numbers refer to the source document
+    """
+    tables = []
+    for chunk in chunks:
+        for table_index, table in enumerate(parse_markdown_tables(chunk.get('content', ''))):
+            offset = chunk.get('line_start', 1) - 1
+            table.update({
+                'section_number': chunk.get('section_number'),
+                'section_path': chunk.get('section_path', ''),
+                'table_index': table_index,
+                'line_start': table['line_start'] + offset,
+                'line_end': table['line_end'] + offset
+            })
+            tables.append(table)
+    return tables
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of model tokens in a text.
+    Uses a characters-per-token ratio, which is close enough for sizing
+    chunks and prompts without calling a tokenizer.
+    
+    Args:
+        text: Text to measure
+        
+    Returns:
+        Estimated token count
+    """
+    if not text:
+        return 0
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _find_window_break(text: str, start: int, end: int) -> int:
+    """Move a window end back to the nearest paragraph, sentence or word boundary."""
+    floor = start + (end - start) // 2
+    for separator in ('\n\n', '\f', '. ', '\n', ' '):
+        position = text.rfind(separator, floor, end)
+        if position != -1:
+            return position + len(separator)
+    return end
+
+
+def split_text_into_windows(text: str, max_tokens: int = HYPERLINK_CHUNK_TOKENS,
+                            overlap_tokens: int = HYPERLINK_CHUNK_OVERLAP_TOKENS) -> List[Dict]:
+    """
+    Split long text into overlapping, token-bounded windows.
+    Window ends snap back to paragraph, sentence or word boundaries, and each
+    window repeats the last ``overlap_tokens`` of the previous one so passages
+    that straddle a boundary stay retrievable.
+    
+    Args:
+        text: Text to split
+        max_tokens: Maximum estimated tokens per window
+        overlap_tokens: Estimated tokens shared by consecutive windows
+        
+    Returns:
+        List of window dictionaries:
+        - content: Window text
+        - char_start: Offset of the window in ``text``
+        - char_end: End offset (exclusive) of the window in ``text``
+    """
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+    overlap_chars = min(max(0, overlap_tokens * CHARS_PER_TOKEN), max_chars // 2)
+    
+    windows = []
+    start = 0
+    length = len(text)
+    while start < length:
+        # Skip leading whitespace so offsets point at real content
+        while start < length and text[start].isspace():
+            start += 1
+        if start >= length:
+            break
+        
+        end = min(start + max_chars, length)
+        if end < length:
+            end = _find_window_break(text, start, end)
+        
+        content = text[start:end].replace('\f', '').strip()
+        if content:
+            windows.append({'content': content, 'char_start': start, 'char_end': end})
+        if end >= length:
+            break
+        
+        # Step back by the overlap, then forward to the next word boundary
+        next_start = end - overlap_chars
+        if overlap_chars:
+            boundary = re.compile(r'\s').search(text, next_start, end)
+            if boundary:
+                next_start = boundary.end()
+        start = max(next_start, start + 1)
+    
+    return windows
+
+
 def clean_url(url: str) -> str:
     """
     Clean URL by removing trailing punctuation and validating it.
@@ -176,7 +455,16 @@ def clean_url(url: str) -> str:
     return url
 
 
-def extract_urls_from_markdown(markdown_text: str, chunks: List[Dict]) -> List[Dict]:
+# Pattern for markdown links: [text](url)
+_MARKDOWN_LINK_PATTERN = re.compile(r'\[([^\]]+)\]\(([^\)]+)\)')
+# Pattern for plain URLs (improved to better handle URLs)
+_URL_PATTERN = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')
+# URLs in angle brackets <url>
+_ANGLE_BRACKET_PATTERN = re.compile(r'<([^>]+)>')
+
+
+def extract_urls_from_markdown(markdown_text: str, chunks: List[Dict],
+                               section_index: Optional[SectionIndex] = None) -> List[Dict]:
     """
     Extract all URLs from markdown and associate them with their parent sections.
     Filters out anchor links and cleans URLs.
@@ -184,6 +472,7 @@ def extract_urls_from_markdown(markdown_text: str, chunks: List[Dict]) -> List[D
     Args:
         markdown_text: Full markdown content
         chunks: List of chunks from chunk_by_headers
+        section_index: SectionIndex of the text (its lines are reused if given)
         
     Returns:
         List of URL dictionaries with:
@@ -195,105 +484,54 @@ def extract_urls_from_markdown(markdown_text: str, chunks: List[Dict]) -> List[D
     urls = []
     seen_urls = set()  # Track to avoid duplicates
     
-    # Pattern for markdown links: [text](url)
-    markdown_link_pattern = r'\[([^\]]+)\]\(([^\)]+)\)'
+    lines = section_index.lines if section_index is not None else markdown_text.split('\n')
     
-    # Pattern for plain URLs (improved to better handle URLs)
-    url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
+    # Chunks cover increasing line ranges; find a line's chunk by binary search
+    chunk_starts = [chunk['line_start'] for chunk in chunks]
     
-    lines = markdown_text.split('\n')
+    def parent_chunk(line_num: int) -> Optional[Dict]:
+        position = bisect.bisect_right(chunk_starts, line_num) - 1
+        if position >= 0 and line_num <= chunks[position]['line_end']:
+            return chunks[position]
+        return None
     
-    # Create a mapping of line number to chunk
-    line_to_chunk = {}
-    for chunk in chunks:
-        for line_num in range(chunk['line_start'], chunk['line_end'] + 1):
-            line_to_chunk[line_num] = chunk
+    def add_url(url: str, link_text: str, line_num: int):
+        seen_urls.add(url)
+        chunk = parent_chunk(line_num)
+        urls.append({
+            'url': url,
+            'parent_section': chunk['section_path'] if chunk else 'Unknown',
+            'link_text': link_text,
+            'section_number': chunk['section_number'] if chunk else None,
+            'line_number': line_num
+        })
     
-    # Find all markdown links
+    # One pass over the lines; angle-bracket URLs are added after all
+    # markdown links and plain URLs, so they only fill in what those missed
+    angle_bracket_urls = []
     for line_num, line in enumerate(lines, start=1):
+        # Every pattern needs an http(s) URL
+        if 'http' not in line:
+            continue
+        
         # Find markdown links
-        for match in re.finditer(markdown_link_pattern, line):
-            link_text = match.group(1)
-            raw_url = match.group(2)
-            
-            # Clean and validate URL
-            url = clean_url(raw_url)
-            if not url:
-                continue  # Skip invalid URLs (anchor links, etc.)
-            
-            # Skip duplicates
-            if url in seen_urls:
-                continue
-            seen_urls.add(url)
-            
-            # Get parent chunk
-            parent_chunk = line_to_chunk.get(line_num, None)
-            
-            urls.append({
-                'url': url,
-                'parent_section': parent_chunk['section_path'] if parent_chunk else 'Unknown',
-                'link_text': link_text,
-                'section_number': parent_chunk['section_number'] if parent_chunk else None,
-                'line_number': line_num
-            })
+        for match in _MARKDOWN_LINK_PATTERN.finditer(line):
+            # Clean and validate URL (skips anchor links, etc.)
+            url = clean_url(match.group(2))
+            if url and url not in seen_urls:
+                add_url(url, match.group(1), line_num)
         
         # Find plain URLs (not in markdown link format)
-        for match in re.finditer(url_pattern, line):
-            raw_url = match.group(0)
-            
-            # Clean and validate URL
-            url = clean_url(raw_url)
-            if not url:
-                continue
-            
-            # Skip if already captured
-            if url in seen_urls:
-                continue
-            seen_urls.add(url)
-            
-            # Skip if already captured as markdown link on same line
-            if url in [u['url'] for u in urls if u.get('line_number') == line_num]:
-                continue
-            
-            parent_chunk = line_to_chunk.get(line_num, None)
-            
-            urls.append({
-                'url': url,
-                'parent_section': parent_chunk['section_path'] if parent_chunk else 'Unknown',
-                'link_text': url,  # Use URL as display text
-                'section_number': parent_chunk['section_number'] if parent_chunk else None,
-                'line_number': line_num
-            })
+        for match in _URL_PATTERN.finditer(line):
+            url = clean_url(match.group(0))
+            if url and url not in seen_urls:
+                add_url(url, url, line_num)  # Use URL as display text
+        
+        angle_bracket_urls.extend((line_num, match.group(1)) for match in _ANGLE_BRACKET_PATTERN.finditer(line))
     
-    # Also check for URLs in angle brackets <url>
-    angle_bracket_pattern = r'<([^>]+)>'
-    for line_num, line in enumerate(lines, start=1):
-        for match in re.finditer(angle_bracket_pattern, line):
-            raw_url = match.group(1)
-            
-            # Clean and validate URL
-            url = clean_url(raw_url)
-            if not url:
-                continue
-            
-            # Skip duplicates
-            if url in seen_urls:
-                continue
-            seen_urls.add(url)
-            
-            # Check if not already captured on same line
-            if url in [u['url'] for u in urls if u.get('line_number') == line_num]:
-                continue
-            
-            parent_chunk = line_to_chunk.get(line_num, None)
-            
-            urls.append({
-                'url': url,
-                'parent_section': parent_chunk['section_path'] if parent_chunk else 'Unknown',
-                'link_text': url,
-                'section_number': parent_chunk['section_number'] if parent_chunk else None,
-                'line_number': line_num
-            })
+    for line_num, raw_url in angle_bracket_urls:
+        url = clean_url(raw_url)
+        if url and url not in seen_urls:
+            add_url(url, url, line_num)
     
     return urls
-
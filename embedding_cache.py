@@ -0,0 +1,260 @@
+"""
+Embedding caches.
+Persistent, content-addressed cache for document embeddings (SQLite) and an
+in-process LRU/TTL cache for query embeddings.
+"""
+import array
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_BYTES,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_TTL
+)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache with least-recently-used, size-based eviction.
+    
+    Vectors are stored as packed float32 blobs. Hit and miss counters are kept
+    per instance so ingestion can report how many API calls were saved.
+    """
+    
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        """
+        Open (or create) the cache database.
+        
+        Args:
+            path: SQLite database file path
+            max_bytes: Maximum total size of stored vectors before eviction
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings (last_access)")
+        self._conn.commit()
+    
+    @staticmethod
+    def make_key(text: str, model: str, task_type: str) -> str:
+        """Build the cache key for a text under a given model and task type."""
+        return hashlib.sha256(f"{model}\x00{task_type}\x00{text}".encode('utf-8')).hexdigest()
+    
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """
+        Look up vectors for a list of keys.
+        
+        Args:
+            keys: Cache keys from make_key
+            
+        Returns:
+            Dictionary of key -> vector for the keys that were found
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            # SQLite limits bound parameters per statement, so look up in slices
+            for i in range(0, len(unique_keys), 500):
+                batch = unique_keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array.array('f', blob).tolist()
+            
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+            
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        
+        return found
+    
+    def put_many(self, items: Dict[str, List[float]]):
+        """
+        Store vectors and evict old entries if the cache grows past max_bytes.
+        
+        Args:
+            items: Dictionary of key -> vector
+        """
+        if not items:
+            return
+        
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            blob = array.array('f', vector).tobytes()
+            rows.append((key, blob, len(blob), now))
+        
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, size, last_access) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+            self._evict()
+    
+    def _evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        
+        excess = total - self.max_bytes
+        removed = 0
+        evicted_keys = []
+        cursor = self._conn.execute("SELECT key, size FROM embeddings ORDER BY last_access ASC")
+        for key, size in cursor:
+            evicted_keys.append((key,))
+            removed += size
+            if removed >= excess:
+                break
+        cursor.close()
+        
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", evicted_keys)
+        self._conn.commit()
+        logger.info(f"Evicted {len(evicted_keys)} embeddings from cache ({removed} bytes)")
+    
+    def stats(self) -> Dict:
+        """Return hit/miss counters and current cache size."""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings"
+            ).fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': entries,
+            'bytes': total
+        }
+    
+    def clear(self):
+        """Delete every cached embedding."""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+    
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize query text for cache lookups.
+    Case-folds and collapses whitespace so trivially different spellings share an entry.
+    """
+    return re.sub(r'\s+', ' ', query).strip().casefold()
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe in-memory cache for query embeddings.
+    
+    Bounded in size with least-recently-used eviction and an optional
+    time-to-live. Intended to be created once per process (e.g. inside a
+    Streamlit cached resource) and shared across sessions.
+    """
+    
+    def __init__(self, max_size: int = QUERY_EMBEDDING_CACHE_SIZE,
+                 ttl: Optional[float] = QUERY_EMBEDDING_CACHE_TTL):
+        """
+        Args:
+            max_size: Maximum number of cached queries
+            ttl: Seconds before an entry expires, or None to never expire
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, query: str, model: str) -> Optional[List[float]]:
+        """
+        Return the cached embedding for a query, or None on a miss.
+        
+        Args:
+            query: Raw query text (normalized internally)
+            model: Embedding model name
+        """
+        key = (model, normalize_query(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, query: str, model: str, embedding: List[float]):
+        """
+        Store a query embedding, evicting the least recently used entry if full.
+        
+        Args:
+            query: Raw query text (normalized internally)
+            model: Embedding model name
+            embedding: Query embedding vector
+        """
+        key = (model, normalize_query(query))
+        with self._lock:
+            self._entries[key] = (time.monotonic(), embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def stats(self) -> Dict:
+        """Return hit/miss/eviction counters and current size."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries)
+            }
+    
+    def clear(self):
+        """Drop every cached query embedding."""
+        with self._lock:
+            self._entries.clear()
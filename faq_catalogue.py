@@ -0,0 +1,182 @@
+"""
+Precomputed FAQ answer catalogue.
+build_faq.py answers a fixed list of canonical questions (FAQ_QUESTIONS)
+through the normal RAG pipeline and stores the answers, sources and question
+embeddings in chroma_db/faq_catalogue/. At query time a close enough match is
+served from the catalogue without retrieval or a Gemini call.
+"""
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import (
+    FAQ_CATALOGUE_DIRECTORY,
+    FAQ_SIMILARITY_THRESHOLD,
+    FAQ_TTL
+)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "questions.npy"
+ENTRIES_FILE = "entries.json"
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class FAQCatalogue:
+    """
+    Canonical questions with stored answers, matched by query embedding.
+    
+    Question embeddings are one row each of a normalized float32 matrix
+    (memory-mapped when loaded). Each question has an answer per response
+    style, stamped with the index version and build time. Answers built
+    against another index version, or older than ``ttl`` seconds, are not served.
+    """
+    
+    def __init__(self, entries: List[Dict], vectors: np.ndarray,
+                 threshold: float = FAQ_SIMILARITY_THRESHOLD, ttl: Optional[float] = FAQ_TTL):
+        """
+        Args:
+            entries: One dictionary per question: question, is_advice and
+                     answers (style -> result with index_version and built_at)
+            vectors: Question embeddings (same order as entries)
+            threshold: Minimum cosine similarity for a match
+            ttl: Seconds before an answer expires, or None to never expire
+        """
+        self.entries = entries
+        self.vectors = vectors
+        self.threshold = threshold
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+    
+    @classmethod
+    def build(cls, questions: List[str], embeddings: List[List[float]], answer_fn,
+              styles: List[str], is_advice_fn, index_version: str) -> "FAQCatalogue":
+        """
+        Answer every question in every style.
+        
+        Args:
+            questions: Canonical questions
+            embeddings: Their query embeddings
+            answer_fn: Function (question, style) -> query_rag result
+            styles: Response styles to answer in (e.g. ["Concise", "Detailed"])
+            is_advice_fn: Function telling advice requests apart (is_advice_request)
+            index_version: Index version the answers are generated against
+        
+        Returns:
+            FAQCatalogue (questions whose answers failed are left out)
+        """
+        entries, rows = [], []
+        for question, embedding in zip(questions, embeddings):
+            if embedding is None:
+                logger.warning(f"Skipping FAQ question without an embedding: {question}")
+                continue
+            answers = {}
+            for style in styles:
+                result = answer_fn(question, style)
+                if not result.get('sources'):
+                    logger.warning(f"No grounded {style} answer for FAQ question: {question}")
+                    continue
+                answers[style.lower()] = {
+                    'response': result['response'],
+                    'sources': result['sources'],
+                    'role_detected': result.get('role_detected'),
+                    'index_version': index_version,
+                    'built_at': time.time()
+                }
+            if answers:
+                entries.append({'question': question, 'is_advice': is_advice_fn(question), 'answers': answers})
+                rows.append(embedding)
+        
+        vectors = _normalize_rows(np.asarray(rows, dtype=np.float32)) if rows else np.zeros((0, 0), dtype=np.float32)
+        return cls(entries, vectors)
+    
+    def save(self, directory: str = FAQ_CATALOGUE_DIRECTORY):
+        """Persist question embeddings (.npy) and entries (JSON)."""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, VECTORS_FILE), np.ascontiguousarray(self.vectors, dtype=np.float32))
+        with open(os.path.join(directory, ENTRIES_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'entries': self.entries}, f)
+        logger.info(f"Saved FAQ catalogue ({len(self.entries)} questions) to {directory}")
+    
+    @classmethod
+    def load(cls, directory: str = FAQ_CATALOGUE_DIRECTORY) -> Optional["FAQCatalogue"]:
+        """
+        Load a saved catalogue, memory-mapping the question embeddings.
+        
+        Returns:
+            FAQCatalogue, or None if build_faq.py has not been run
+        """
+        entries_path = os.path.join(directory, ENTRIES_FILE)
+        if not os.path.exists(entries_path):
+            return None
+        with open(entries_path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)['entries']
+        vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode='r')
+        return cls(entries, vectors)
+    
+    def match(self, query_embedding: List[float], response_style: str, is_advice: bool,
+              index_version: str = '') -> Optional[Dict]:
+        """
+        Find the stored answer for a query.
+        
+        Args:
+            query_embedding: Embedding of the incoming query
+            response_style: "Concise" or "Detailed"
+            is_advice: Whether the query is an advice request
+            index_version: Current index version (see vector_store.read_index_version)
+        
+        Returns:
+            Result dictionary (response, sources, role_detected) plus
+            'similarity' and 'catalogue_question', or None
+        """
+        if not self.entries:
+            return None
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.shape[0] != self.vectors.shape[1]:
+            return None
+        
+        similarities = np.asarray(self.vectors) @ (query / max(float(np.linalg.norm(query)), 1e-9))
+        best = int(np.argmax(similarities))
+        entry = self.entries[best]
+        answer = entry['answers'].get(response_style.lower())
+        if similarities[best] < self.threshold or entry['is_advice'] != is_advice or answer is None:
+            self.misses += 1
+            return None
+        
+        expired = self.ttl is not None and time.time() - answer['built_at'] > self.ttl
+        if answer['index_version'] != index_version or expired:
+            self.stale += 1
+            logger.info(f"FAQ catalogue entry is stale ({'expired' if expired else 'index version changed'}): "
+                        f"{entry['question']}")
+            return None
+        
+        self.hits += 1
+        return {
+            'response': answer['response'],
+            'sources': answer['sources'],
+            'role_detected': answer.get('role_detected'),
+            'similarity': float(similarities[best]),
+            'catalogue_question': entry['question']
+        }
+    
+    def stats(self) -> Dict:
+        """Return hit/miss/stale counters and the number of questions."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'size': len(self.entries)
+        }
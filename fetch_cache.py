@@ -0,0 +1,140 @@
+"""
+Persistent HTTP fetch cache for hyperlinked content.
+Stores each URL's body, content type, validators (ETag / Last-Modified) and
+parsed text in SQLite so re-ingestion can issue conditional GETs and skip the
+HTML/PDF parsers for pages that have not changed.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from config import FETCH_CACHE_PATH
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class FetchCache:
+    """
+    On-disk cache of fetched URLs keyed by URL.
+    
+    Counters track how many lookups were revalidated with a 304, refetched in
+    full, or served straight from disk in offline mode.
+    """
+    
+    def __init__(self, path: str = FETCH_CACHE_PATH):
+        """
+        Open (or create) the cache database.
+        
+        Args:
+            path: SQLite database file path
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self.path = path
+        self.not_modified = 0
+        self.refreshed = 0
+        self.offline_hits = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS fetches (
+                url TEXT PRIMARY KEY,
+                content_type TEXT NOT NULL,
+                body BLOB,
+                etag TEXT,
+                last_modified TEXT,
+                parsed_text TEXT,
+                fetched_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+    
+    def get(self, url: str) -> Optional[Dict]:
+        """
+        Look up the cached entry for a URL.
+        
+        Args:
+            url: Fetched URL
+        
+        Returns:
+            Dictionary with content_type, body, etag, last_modified,
+            parsed_text and fetched_at, or None if the URL was never cached
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_type, body, etag, last_modified, parsed_text, fetched_at "
+                "FROM fetches WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        
+        content_type, body, etag, last_modified, parsed_text, fetched_at = row
+        if content_type == 'html' and body is not None:
+            body = bytes(body).decode('utf-8', errors='replace')
+        return {
+            'content_type': content_type,
+            'body': body,
+            'etag': etag,
+            'last_modified': last_modified,
+            'parsed_text': parsed_text,
+            'fetched_at': fetched_at
+        }
+    
+    def put(self, url: str, content_type: str, body, etag: Optional[str] = None,
+            last_modified: Optional[str] = None, parsed_text: Optional[str] = None):
+        """
+        Store (or replace) the cached entry for a URL.
+        
+        Args:
+            url: Fetched URL
+            content_type: 'html' or 'pdf'
+            body: Response body (str for HTML, bytes for PDF)
+            etag: ETag response header, if any
+            last_modified: Last-Modified response header, if any
+            parsed_text: Text extracted from the body
+        """
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fetches "
+                "(url, content_type, body, etag, last_modified, parsed_text, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, content_type, body, etag, last_modified, parsed_text, time.time())
+            )
+            self._conn.commit()
+    
+    def touch(self, url: str):
+        """Record that a cached entry was revalidated (e.g. by a 304 response)."""
+        with self._lock:
+            self._conn.execute("UPDATE fetches SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+    
+    def stats(self) -> Dict:
+        """Return revalidation counters and the number of cached URLs."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM fetches").fetchone()[0]
+        return {
+            'not_modified': self.not_modified,
+            'refreshed': self.refreshed,
+            'offline_hits': self.offline_hits,
+            'entries': entries
+        }
+    
+    def clear(self):
+        """Delete every cached fetch."""
+        with self._lock:
+            self._conn.execute("DELETE FROM fetches")
+            self._conn.commit()
+    
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
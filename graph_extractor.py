@@ -1,115 +1,81 @@
 """
 Strategy graph extractor.
 Extracts strategic pillars, initiatives, and KPIs, then generates Mermaid diagram.
+The extracted structure is stored as a versioned artifact (STRATEGY_STRUCTURE_PATH),
+keyed by a hash of the Section 7.2, 7.3 and 8.2 text, so Gemini is only called
+again when those sections change.
 """
-import google.generativeai as genai
 import re
+import os
 import json
+import math
+import time
+import hashlib
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
 from config import (
     GEMINI_MODEL,
-    GOOGLE_API_KEY,
     PILLARS_SECTION,
     INITIATIVES_SECTION,
-    KPIS_SECTION
+    KPIS_SECTION,
+    STRATEGY_STRUCTURE_PATH,
+    STRATEGY_LLM_VALIDATION
 )
+from clients import get_generative_model
+from document_processor import SectionIndex, parse_markdown_tables
+from lexical_index import tokenize
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize GenAI
-genai.configure(api_key=GOOGLE_API_KEY)
+# Bump when the extraction rules, prompt or structure format change so stored
+# artifacts are re-extracted even though the sections did not change
+STRUCTURE_FORMAT_VERSION = 2
 
+# "Strategic Pillar 1: ..." / "Initiative 1: ..." on a header line or on their own line
+_PILLAR_TITLE = re.compile(r'^[^\S\n]*(?:#+[^\S\n]*)?Strategic Pillar (\d+)[^\S\n]*[:\-][^\S\n]*(\S[^\n]*?)[^\S\n]*$', re.MULTILINE)
+_INITIATIVE_TITLE = re.compile(r'^[^\S\n]*(?:#+[^\S\n]*)?Initiative (\d+)[^\S\n]*[:\-][^\S\n]*(\S[^\n]*?)[^\S\n]*$', re.MULTILINE)
+# "**Objective:** text" / "**Strategic Objective:**" followed by the text on the next line
+_OBJECTIVE = re.compile(r'Objective:\**\s*(.+?)(?:\n\s*\n|$)', re.DOTALL)
+# Pillar-title terms count this many times more than terms elsewhere in the pillar
+_TITLE_TERM_WEIGHT = 3.0
 
-def extract_pillars_section(markdown_text: str) -> Optional[str]:
+_artifact_cache: Dict[str, Tuple[float, Optional[Dict]]] = {}
+
+
+def extract_pillars_section(markdown_text: str, section_index: Optional[SectionIndex] = None) -> Optional[str]:
     """
     Extract Section 7.2 (Five Strategic Pillars) content.
     
     Args:
         markdown_text: Full markdown content
+        section_index: SectionIndex of the text (built if not given)
         
     Returns:
         Section text or None if not found
     """
-    lines = markdown_text.split('\n')
-    in_section = False
-    section_lines = []
-    # More flexible pattern - handles various header formats
-    section_start_pattern = re.compile(r'7\.2.*[Ff]ive.*[Ss]trategic.*[Pp]illar', re.IGNORECASE)
-    section_end_pattern = re.compile(r'^#+\s*7\.3')
-    
-    for i, line in enumerate(lines):
-        # Check if this line matches the section start (header or content line)
-        if section_start_pattern.search(line):
-            in_section = True
-            # Include the previous line if it's a header marker
-            if i > 0 and lines[i-1].strip().startswith('#'):
-                section_lines.append(lines[i-1])
-            section_lines.append(line)
-        elif in_section:
-            # Stop at next major section (7.3)
-            if section_end_pattern.match(line.strip()):
-                break
-            section_lines.append(line)
-    
-    if section_lines:
-        return '\n'.join(section_lines)
-    return None
-
-
-def extract_related_sections(markdown_text: str) -> Dict[str, str]:
+    index = section_index or SectionIndex(markdown_text)
+    return index.section_text(PILLARS_SECTION)
+
+
+def extract_related_sections(markdown_text: str, section_index: Optional[SectionIndex] = None) -> Dict[str, str]:
     """
     Extract Section 7.3 (Initiatives) and 8.2 (KPIs) for mapping.
     
     Args:
         markdown_text: Full markdown content
+        section_index: SectionIndex of the text (built if not given)
         
     Returns:
         Dictionary with 'initiatives' and 'kpis' sections
     """
-    lines = markdown_text.split('\n')
-    sections = {'initiatives': None, 'kpis': None}
-    
-    # Extract Initiatives (7.3)
-    in_initiatives = False
-    initiatives_lines = []
-    initiatives_start = re.compile(r'#+\s*7\.3.*[Ii]nitiatives')
-    initiatives_end = re.compile(r'#+\s*8\.')
-    
-    for line in lines:
-        if initiatives_start.search(line):
-            in_initiatives = True
-            initiatives_lines.append(line)
-        elif in_initiatives:
-            if initiatives_end.search(line):
-                break
-            initiatives_lines.append(line)
-    
-    if initiatives_lines:
-        sections['initiatives'] = '\n'.join(initiatives_lines)
-    
-    # Extract KPIs (8.2)
-    in_kpis = False
-    kpis_lines = []
-    kpis_start = re.compile(r'#+\s*8\.2.*[Kk]ey.*[Pp]erformance.*[Ii]ndicators')
-    kpis_end = re.compile(r'#+\s*8\.3')
-    
-    for line in lines:
-        if kpis_start.search(line):
-            in_kpis = True
-            kpis_lines.append(line)
-        elif in_kpis:
-            if kpis_end.search(line):
-                break
-            kpis_lines.append(line)
-    
-    if kpis_lines:
-        sections['kpis'] = '\n'.join(kpis_lines)
-    
-    return sections
+    index = section_index or SectionIndex(markdown_text)
+    return {
+        'initiatives': index.section_text(INITIATIVES_SECTION),
+        'kpis': index.section_text(KPIS_SECTION)
+    }
 
 
 def parse_strategy_structure(sections_text: Dict[str, str], gemini_client=None) -> Dict:
@@ -167,7 +133,7 @@ Document sections:
 Return only valid JSON, no additional text."""
 
     try:
-        model = genai.GenerativeModel(GEMINI_MODEL)
+        model = get_generative_model(GEMINI_MODEL)
         
         generation_config = {
             'temperature': 0.1,  # Very low temperature for structured extraction
@@ -207,6 +173,207 @@ Return only valid JSON, no additional text."""
         raise
 
 
+def _numbered_blocks(text: str, title_pattern: re.Pattern) -> List[Tuple[int, str, str]]:
+    """Split text at numbered title lines into (number, title, body) blocks."""
+    matches = list(title_pattern.finditer(text))
+    blocks = []
+    for position, match in enumerate(matches):
+        end = matches[position + 1].start() if position + 1 < len(matches) else len(text)
+        blocks.append((int(match.group(1)), match.group(2).strip(), text[match.end():end]))
+    return blocks
+
+
+def _objective(body: str) -> str:
+    match = _OBJECTIVE.search(body)
+    return match.group(1).strip() if match else ''
+
+
+class _PillarMatcher:
+    """Score text against each pillar by IDF-weighted term overlap (title terms weigh more)."""
+    
+    def __init__(self, pillars: List[Tuple[int, str, str]]):
+        self.titles = [set(tokenize(title)) for _, title, _ in pillars]
+        self.texts = [set(tokenize(f"{title} {body}")) for _, title, body in pillars]
+        document_frequency: Dict[str, int] = {}
+        for terms in self.texts:
+            for term in terms:
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+        self.idf = {term: math.log(1 + len(self.texts) / count) for term, count in document_frequency.items()}
+    
+    def best(self, text: str) -> Optional[int]:
+        """Position of the best-matching pillar, or None if no term matches."""
+        terms = set(tokenize(text))
+        scores = [
+            sum(self.idf[term] * (_TITLE_TERM_WEIGHT if term in title else 1.0) for term in terms & text_terms)
+            for title, text_terms in zip(self.titles, self.texts)
+        ]
+        best = max(range(len(scores)), key=scores.__getitem__, default=None)
+        return best if best is not None and scores[best] > 0 else None
+
+
+def parse_strategy_structure_rules(sections_text: Dict[str, str]) -> Tuple[Dict, List[str]]:
+    """
+    Extract the strategy structure from the markdown itself, without Gemini.
+    
+    - Pillars: "Strategic Pillar N: Name" lines in Section 7.2
+    - Initiatives: "Initiative N: Name" lines in Section 7.3, mapped to the
+      pillar whose title and text best match the initiative's name and
+      strategic objective
+    - KPIs: row labels of the Section 8.2 tables, linked to the pillar that
+      best matches the label, strategic importance and table caption; rows
+      matching no pillar follow the rest of their table
+    
+    Args:
+        sections_text: Dictionary with 'pillars', 'initiatives', 'kpis' sections
+        
+    Returns:
+        Tuple of (structure in the parse_strategy_structure format, list of
+        problems that make it incomplete - empty when it is complete)
+    """
+    pillars = _numbered_blocks(sections_text.get('pillars') or '', _PILLAR_TITLE)
+    initiatives = _numbered_blocks(sections_text.get('initiatives') or '', _INITIATIVE_TITLE)
+    structure = {
+        'root': '2026 Strategy',
+        'pillars': [{'id': number, 'name': name, 'initiatives': [], 'kpis': []} for number, name, _ in pillars]
+    }
+    if not pillars:
+        return structure, ["no pillars found in Section 7.2"]
+    
+    problems = []
+    numbers = [number for number, _, _ in pillars]
+    if numbers != list(range(1, len(numbers) + 1)):
+        problems.append(f"pillar numbering is not consecutive: {numbers}")
+    
+    matcher = _PillarMatcher(pillars)
+    for _, name, body in initiatives:
+        best = matcher.best(f"{name} {_objective(body)}")
+        if best is None:
+            problems.append(f"initiative not mapped to a pillar: {name}")
+        else:
+            structure['pillars'][best]['initiatives'].append(name)
+    
+    kpi_count = 0
+    for table in parse_markdown_tables(sections_text.get('kpis') or ''):
+        caption = re.sub(r'\bKPIs?\b', '', table['caption'])
+        links = []
+        for row in table['rows']:
+            if not row or not row[0]:
+                continue
+            links.append((row[0], matcher.best(f"{row[0]} {row[-1]} {caption}")))
+        # Rows without a match follow the pillar most of their table links to
+        linked = [best for _, best in links if best is not None]
+        table_pillar = max(set(linked), key=linked.count) if linked else None
+        for kpi, best in links:
+            best = table_pillar if best is None else best
+            if best is None:
+                problems.append(f"KPI not linked to a pillar: {kpi}")
+            else:
+                structure['pillars'][best]['kpis'].append(kpi)
+                kpi_count += 1
+    
+    if not initiatives:
+        problems.append("no initiatives found in Section 7.3")
+    if not kpi_count:
+        problems.append("no KPIs found in Section 8.2")
+    return structure, problems
+
+
+def _normalize_name(name: str) -> str:
+    return ' '.join(tokenize(re.sub(r'^(Strategic Pillar|Initiative) \d+:\s*', '', str(name), flags=re.IGNORECASE)))
+
+
+def compare_strategy_structures(structure: Dict, reference: Dict) -> Dict:
+    """
+    Measure how far a structure agrees with a reference structure.
+    
+    Args:
+        structure: Structure to check (e.g., the rule-based one)
+        reference: Structure to check against (e.g., Gemini's)
+        
+    Returns:
+        Dictionary with pillar_agreement (share of pillar names found in the
+        reference), link_agreement (share of initiative/KPI -> pillar links
+        the reference also has) and disagreements (items linked differently)
+    """
+    reference_names = {_normalize_name(pillar.get('name', '')) for pillar in reference.get('pillars', [])}
+    reference_links = {
+        (_normalize_name(item), _normalize_name(pillar.get('name', '')))
+        for pillar in reference.get('pillars', [])
+        for key in ('initiatives', 'kpis')
+        for item in pillar.get(key, [])
+    }
+    pillars = structure.get('pillars', [])
+    links = [
+        (item, pillar.get('name', ''))
+        for pillar in pillars
+        for key in ('initiatives', 'kpis')
+        for item in pillar.get(key, [])
+    ]
+    disagreements = [item for item, pillar in links
+                     if (_normalize_name(item), _normalize_name(pillar)) not in reference_links]
+    return {
+        'pillar_agreement': (sum(_normalize_name(p.get('name', '')) in reference_names for p in pillars) / len(pillars)
+                             if pillars else 0.0),
+        'link_agreement': 1.0 - len(disagreements) / len(links) if links else 0.0,
+        'disagreements': disagreements
+    }
+
+
+def extract_strategy_structure(sections_text: Dict[str, str],
+                               gemini_client=None,
+                               validate: bool = STRATEGY_LLM_VALIDATION) -> Tuple[Dict, Dict]:
+    """
+    Extract the strategy structure, rule-based first.
+    
+    Gemini (parse_strategy_structure) only runs when the rule-based result is
+    incomplete, in which case its structure is used, or when ``validate`` is
+    set, in which case it is only compared against the rule-based one.
+    
+    Args:
+        sections_text: Dictionary with 'pillars', 'initiatives', 'kpis' sections
+        gemini_client: Optional Gemini client
+        validate: Also run Gemini to cross-check a complete rule-based result
+        
+    Returns:
+        Tuple of (structure, report with method ('rules' or 'llm'), rules_ms,
+        llm_ms (None if Gemini did not run), problems and, when validated,
+        validation from compare_strategy_structures)
+    """
+    start = time.perf_counter()
+    structure, problems = parse_strategy_structure_rules(sections_text)
+    report = {
+        'method': 'rules',
+        'rules_ms': (time.perf_counter() - start) * 1000,
+        'llm_ms': None,
+        'problems': problems
+    }
+    
+    if problems or validate:
+        if problems:
+            logger.warning(f"Rule-based strategy structure is incomplete ({'; '.join(problems)}); using Gemini")
+        start = time.perf_counter()
+        try:
+            llm_structure = parse_strategy_structure(sections_text, gemini_client)
+        except Exception as e:
+            if not structure['pillars']:
+                raise
+            logger.warning(f"Gemini strategy extraction failed, keeping the rule-based structure: {e}")
+            llm_structure = None
+        report['llm_ms'] = (time.perf_counter() - start) * 1000
+        
+        if llm_structure is not None and problems:
+            structure, report['method'] = llm_structure, 'llm'
+        elif llm_structure is not None:
+            report['validation'] = compare_strategy_structures(structure, llm_structure)
+            logger.info(f"Gemini validation: {report['validation']['pillar_agreement']:.0%} pillars, "
+                        f"{report['validation']['link_agreement']:.0%} links agree")
+    
+    llm_latency = f"{report['llm_ms']:.0f}ms" if report['llm_ms'] is not None else "not run"
+    logger.info(f"Strategy structure extracted by {report['method']} "
+                f"(rules {report['rules_ms']:.1f}ms, Gemini {llm_latency})")
+    return structure, report
+
+
 def clean_node_text(text: str, max_length: int = 40) -> str:
     """Clean and sanitize text for Mermaid nodes."""
     # Remove quotes, backticks, and other problematic chars
@@ -219,17 +386,23 @@ def clean_node_text(text: str, max_length: int = 40) -> str:
     return cleaned
 
 
-def generate_mermaid_diagram(strategy_structure: Dict) -> str:
+def generate_mermaid_diagram(strategy_structure: Optional[Dict] = None) -> str:
     """
     Convert strategy structure to Mermaid graph format with radial layout (mindmap-like).
     Using graph TD format for better compatibility.
     
     Args:
         strategy_structure: Structured dictionary from parse_strategy_structure
+                            (defaults to the stored artifact written by ingest.py)
         
     Returns:
         Mermaid diagram string
     """
+    if strategy_structure is None:
+        strategy_structure = load_strategy_structure()
+        if strategy_structure is None:
+            raise ValueError("No stored strategy structure found. Run `python ingest.py` first.")
+    
     root = strategy_structure.get('root', '2026 Strategy')
     pillars = strategy_structure.get('pillars', [])
     
@@ -274,32 +447,182 @@ def generate_mermaid_diagram(strategy_structure: Dict) -> str:
     return '\n'.join(mermaid_lines)
 
 
-def extract_strategy_structure_from_markdown(markdown_text: str, gemini_client=None) -> Dict:
+def extract_strategy_sections(markdown_text: str, section_index: Optional[SectionIndex] = None) -> Dict[str, str]:
+    """
+    Extract the text the strategy structure is built from.
+    
+    Args:
+        markdown_text: Full markdown content
+        section_index: SectionIndex of the text (built if not given)
+        
+    Returns:
+        Dictionary with 'pillars' (7.2), 'initiatives' (7.3) and 'kpis' (8.2) text
+    """
+    index = section_index or SectionIndex(markdown_text)
+    pillars_text = extract_pillars_section(markdown_text, index)
+    if not pillars_text:
+        raise ValueError("Could not find Section 7.2 (Strategic Pillars)")
+    
+    related_sections = extract_related_sections(markdown_text, index)
+    return {
+        'pillars': pillars_text,
+        'initiatives': related_sections.get('initiatives') or '',
+        'kpis': related_sections.get('kpis') or ''
+    }
+
+
+def strategy_sections_hash(sections_text: Dict[str, str]) -> str:
+    """
+    Version key of a strategy structure: a hash of the section text it is
+    extracted from (and of STRUCTURE_FORMAT_VERSION).
+    
+    Args:
+        sections_text: Result of extract_strategy_sections
+        
+    Returns:
+        16-character hex digest
+    """
+    digest = hashlib.sha256(f"format={STRUCTURE_FORMAT_VERSION}".encode('utf-8'))
+    for key in ('pillars', 'initiatives', 'kpis'):
+        digest.update(b'\0' + sections_text.get(key, '').encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def read_strategy_artifact(path: str = STRATEGY_STRUCTURE_PATH) -> Optional[Dict]:
+    """
+    Read the stored strategy structure artifact.
+    The file is only re-read when its modification time changes.
+    
+    Args:
+        path: Artifact path
+        
+    Returns:
+        Dictionary with version (sections hash), format_version, built_at and
+        structure, or None if no usable artifact exists
+    """
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    
+    cached = _artifact_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            artifact = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read strategy structure from {path}: {e}")
+        artifact = None
+    if artifact is not None and artifact.get('format_version') != STRUCTURE_FORMAT_VERSION:
+        logger.info(f"Ignoring strategy structure in an old format ({artifact.get('format_version')})")
+        artifact = None
+    
+    _artifact_cache[path] = (mtime, artifact)
+    return artifact
+
+
+def write_strategy_artifact(structure: Dict, version: str, path: str = STRATEGY_STRUCTURE_PATH,
+                            extraction: Optional[Dict] = None) -> Dict:
+    """
+    Store an extracted strategy structure.
+    
+    Args:
+        structure: Structure from extract_strategy_structure
+        version: strategy_sections_hash of the sections it was extracted from
+        path: Artifact path
+        extraction: Extraction report (method and per-path latency)
+        
+    Returns:
+        The artifact dictionary that was written
+    """
+    artifact = {
+        'version': version,
+        'format_version': STRUCTURE_FORMAT_VERSION,
+        'built_at': time.time(),
+        'extraction': extraction or {},
+        'structure': structure
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(artifact, f)
+    logger.info(f"Saved strategy structure version {version} to {path}")
+    return artifact
+
+
+def load_strategy_structure(path: str = STRATEGY_STRUCTURE_PATH) -> Optional[Dict]:
+    """
+    Load the stored strategy structure without calling Gemini.
+    
+    Args:
+        path: Artifact path
+        
+    Returns:
+        Structure dictionary (root, pillars), or None if ingest.py has not stored one
+    """
+    artifact = read_strategy_artifact(path)
+    return artifact['structure'] if artifact else None
+
+
+def build_strategy_structure(markdown_text: str,
+                             gemini_client=None,
+                             path: str = STRATEGY_STRUCTURE_PATH,
+                             force: bool = False,
+                             section_index: Optional[SectionIndex] = None) -> Tuple[Dict, bool]:
+    """
+    Make sure the stored strategy structure matches the document.
+    
+    The structure is only re-extracted (see extract_strategy_structure) when
+    Sections 7.2, 7.3 or 8.2 changed since the stored artifact was extracted
+    (or none exists).
+    
+    Args:
+        markdown_text: Full markdown content
+        gemini_client: Optional Gemini client (passed to extract_strategy_structure)
+        path: Artifact path
+        force: Re-extract even if the stored version is current
+        section_index: SectionIndex of the text (built if not given)
+        
+    Returns:
+        Tuple of (artifact dictionary, whether the structure was re-extracted)
+    """
+    sections_text = extract_strategy_sections(markdown_text, section_index)
+    version = strategy_sections_hash(sections_text)
+    
+    artifact = read_strategy_artifact(path)
+    if artifact is not None and artifact.get('version') == version and not force:
+        logger.info(f"Strategy structure is up to date (version {version})")
+        return artifact, False
+    
+    structure, report = extract_strategy_structure(sections_text, gemini_client)
+    return write_strategy_artifact(structure, version, path, report), True
+
+
+def extract_strategy_structure_from_markdown(markdown_text: str, gemini_client=None,
+                                             use_artifact: bool = True) -> Dict:
     """
     Extract and parse the strategy structure (root, pillars, initiatives, KPIs)
     from the full strategy markdown.
 
     This helper is used both for Mermaid generation and for the interactive
     mind‑map style visualization in the Streamlit app.
+    
+    Args:
+        markdown_text: Full markdown content
+        gemini_client: Optional Gemini client
+        use_artifact: Reuse (and update) the stored artifact instead of always
+                      re-extracting
     """
     try:
-        # Extract pillars section
-        pillars_text = extract_pillars_section(markdown_text)
-        if not pillars_text:
-            raise ValueError("Could not find Section 7.2 (Strategic Pillars)")
-
-        # Extract related sections
-        related_sections = extract_related_sections(markdown_text)
-
-        # Combine sections
-        sections_text = {
-            'pillars': pillars_text,
-            'initiatives': related_sections.get('initiatives', ''),
-            'kpis': related_sections.get('kpis', '')
-        }
-
+        if use_artifact:
+            artifact, _ = build_strategy_structure(markdown_text, gemini_client)
+            return artifact['structure']
+        
         # Parse structure
-        structure = parse_strategy_structure(sections_text, gemini_client)
+        structure, _ = extract_strategy_structure(extract_strategy_sections(markdown_text), gemini_client)
         return structure
 
     except Exception as e:
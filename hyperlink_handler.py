@@ -3,15 +3,30 @@ Hyperlink handler for fetching and processing linked content.
 Extracts text from HTML pages and creates child knowledge units.
 """
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 import logging
 from typing import Dict, List, Optional
 from pypdf import PdfReader
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
 import io
 import os
+import threading
+import time
 from datetime import datetime
 
-from config import HYPERLINK_TIMEOUT, MAX_CONTENT_LENGTH
+from config import (
+    HYPERLINK_TIMEOUT,
+    HYPERLINK_MAX_WORKERS,
+    HYPERLINK_PER_HOST_LIMIT,
+    HYPERLINK_DEADLINE,
+    MAX_CONTENT_LENGTH,
+    HYPERLINK_CHUNK_TOKENS,
+    HYPERLINK_CHUNK_OVERLAP_TOKENS
+)
+from fetch_cache import FetchCache
+from document_processor import split_text_into_windows
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -29,13 +44,62 @@ file_handler.setFormatter(file_formatter)
 logger.addHandler(file_handler)
 
 
-def fetch_url_content(url: str, timeout: int = HYPERLINK_TIMEOUT) -> Dict:
+# Separator between PDF pages in extracted text, used to map sub-chunks to pages
+PDF_PAGE_BREAK = '\n\f\n'
+
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+
+def create_session(pool_size: int = HYPERLINK_MAX_WORKERS) -> requests.Session:
+    """
+    Create a requests session with a connection pool sized for concurrent fetching.
+    
+    Args:
+        pool_size: Maximum pooled connections per host
+        
+    Returns:
+        Configured requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(REQUEST_HEADERS)
+    return session
+
+
+def _cached_result(url: str, cached: Dict, cache_status: str) -> Dict:
+    """Build a successful fetch result from a FetchCache entry."""
+    return {
+        'url': url,
+        'status': 'success',
+        'content_type': cached['content_type'],
+        'content': cached['body'],
+        'error': None,
+        'parsed_text': cached['parsed_text'],
+        'cache_status': cache_status
+    }
+
+
+def fetch_url_content(url: str, timeout: int = HYPERLINK_TIMEOUT,
+                      session: Optional[requests.Session] = None,
+                      cached: Optional[Dict] = None,
+                      offline: bool = False) -> Dict:
     """
     Fetch content from URL.
     
+    When a cached entry is given, the request is made conditional on its
+    ETag / Last-Modified validators; a 304 response reuses the cached body and
+    parsed text instead of downloading the page again.
+    
     Args:
         url: URL to fetch
         timeout: Request timeout in seconds
+        session: Optional pooled session (see create_session)
+        cached: Optional FetchCache entry for this URL
+        offline: Serve only from ``cached`` and never touch the network
         
     Returns:
         Dictionary with:
@@ -44,43 +108,56 @@ def fetch_url_content(url: str, timeout: int = HYPERLINK_TIMEOUT) -> Dict:
         - content_type: 'html', 'pdf', or 'unknown'
         - content: Fetched content (if successful)
         - error: Error message (if failed)
+        - parsed_text: Cached extracted text ('not_modified' and 'offline' only)
+        - cache_status: 'not_modified', 'offline' or 'fetched'
+        - etag / last_modified: Validators to store with a fresh response
     """
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    if offline:
+        if cached is not None:
+            return _cached_result(url, cached, 'offline')
+        return {
+            'url': url,
+            'status': 'error',
+            'content_type': 'unknown',
+            'content': None,
+            'error': 'Not in fetch cache (offline mode)'
         }
+    
+    headers = {}
+    if cached is not None:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+    
+    try:
+        if session is not None:
+            response = session.get(url, timeout=timeout, headers=headers, allow_redirects=True)
+        else:
+            response = requests.get(url, timeout=timeout, headers={**REQUEST_HEADERS, **headers},
+                                    allow_redirects=True)
         
-        response = requests.get(url, timeout=timeout, headers=headers, allow_redirects=True)
+        if response.status_code == 304 and cached is not None:
+            return _cached_result(url, cached, 'not_modified')
         response.raise_for_status()
         
         # Determine content type
         content_type = response.headers.get('Content-Type', '').lower()
         
+        result = {
+            'url': url,
+            'status': 'success',
+            'error': None,
+            'cache_status': 'fetched',
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified')
+        }
         if 'pdf' in content_type:
-            return {
-                'url': url,
-                'status': 'success',
-                'content_type': 'pdf',
-                'content': response.content,
-                'error': None
-            }
-        elif 'html' in content_type or 'text' in content_type:
-            return {
-                'url': url,
-                'status': 'success',
-                'content_type': 'html',
-                'content': response.text,
-                'error': None
-            }
+            result.update(content_type='pdf', content=response.content)
         else:
-            # Try to parse as HTML anyway
-            return {
-                'url': url,
-                'status': 'success',
-                'content_type': 'html',
-                'content': response.text,
-                'error': None
-            }
+            # HTML and other text; unknown types are parsed as HTML anyway
+            result.update(content_type='html', content=response.text)
+        return result
             
     except requests.exceptions.Timeout:
         logger.warning(f"Timeout fetching URL: {url}")
@@ -166,7 +243,7 @@ def parse_pdf_content(pdf_content: bytes) -> str:
             if text:
                 text_parts.append(text)
         
-        full_text = '\n\n'.join(text_parts)
+        full_text = PDF_PAGE_BREAK.join(text_parts)
         
         # Limit content length
         if len(full_text) > MAX_CONTENT_LENGTH:
@@ -179,15 +256,176 @@ def parse_pdf_content(pdf_content: bytes) -> str:
         return ""
 
 
-def create_hyperlink_chunks(urls_with_context: List[Dict]) -> List[Dict]:
+def fetch_urls_concurrently(urls: List[str],
+                            max_workers: int = HYPERLINK_MAX_WORKERS,
+                            per_host_limit: int = HYPERLINK_PER_HOST_LIMIT,
+                            deadline: float = HYPERLINK_DEADLINE,
+                            timeout: int = HYPERLINK_TIMEOUT,
+                            session: Optional[requests.Session] = None,
+                            cache: Optional[FetchCache] = None,
+                            offline: bool = False) -> List[Dict]:
+    """
+    Fetch many URLs concurrently over a shared connection pool.
+    
+    At most ``per_host_limit`` requests hit the same host at once, and the whole
+    batch must finish within ``deadline`` seconds; each request's timeout is
+    capped by the time remaining. URLs that cannot be fetched in time are
+    returned as errors rather than stalling ingestion.
+    
+    Args:
+        urls: URLs to fetch
+        max_workers: Maximum concurrent requests overall
+        per_host_limit: Maximum concurrent requests per host
+        deadline: Seconds allowed for the whole batch
+        timeout: Per-request timeout in seconds
+        session: Optional session to reuse (a pooled one is created otherwise)
+        cache: Optional FetchCache used for conditional requests
+        offline: Serve only from ``cache`` and never touch the network
+        
+    Returns:
+        List of fetch_url_content result dictionaries, in input order
+    """
+    if not urls:
+        return []
+    
+    cached_entries = {url: cache.get(url) for url in urls} if cache is not None else {}
+    if offline:
+        return [fetch_url_content(url, cached=cached_entries.get(url), offline=True) for url in urls]
+    
+    own_session = session is None
+    if own_session:
+        session = create_session(max_workers)
+    
+    started = time.monotonic()
+    host_limits: Dict[str, threading.Semaphore] = {}
+    host_limits_lock = threading.Lock()
+    
+    def deadline_error(url: str) -> Dict:
+        return {
+            'url': url,
+            'status': 'error',
+            'content_type': 'unknown',
+            'content': None,
+            'error': f'Deadline exceeded ({deadline}s)'
+        }
+    
+    def fetch_one(url: str) -> Dict:
+        host = urlparse(url).netloc.lower()
+        with host_limits_lock:
+            limit = host_limits.setdefault(host, threading.Semaphore(per_host_limit))
+        
+        remaining = deadline - (time.monotonic() - started)
+        if remaining <= 0 or not limit.acquire(timeout=remaining):
+            return deadline_error(url)
+        try:
+            remaining = deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                return deadline_error(url)
+            return fetch_url_content(url, timeout=min(timeout, remaining), session=session,
+                                     cached=cached_entries.get(url))
+        finally:
+            limit.release()
+    
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls))))
+    try:
+        futures = [executor.submit(fetch_one, url) for url in urls]
+        wait(futures, timeout=deadline)
+        
+        results = []
+        for url, future in zip(urls, futures):
+            if future.done() and not future.cancelled():
+                results.append(future.result())
+            else:
+                future.cancel()
+                logger.warning(f"Deadline exceeded before fetch completed: {url}")
+                results.append(deadline_error(url))
+        return results
+    finally:
+        # Queued fetches are dropped; running ones end within their capped timeout,
+        # and must finish before the session they use is closed
+        executor.shutdown(wait=True, cancel_futures=True)
+        if own_session:
+            session.close()
+
+
+def build_hyperlink_sub_chunks(text_content: str, url_info: Dict,
+                               max_tokens: int = HYPERLINK_CHUNK_TOKENS,
+                               overlap_tokens: int = HYPERLINK_CHUNK_OVERLAP_TOKENS) -> List[Dict]:
+    """
+    Split one page's extracted text into overlapping hyperlink sub-chunks.
+    
+    Args:
+        text_content: Text extracted from the page or PDF
+        url_info: URL dictionary from extract_urls_from_markdown
+        max_tokens: Maximum estimated tokens per sub-chunk
+        overlap_tokens: Estimated tokens shared by consecutive sub-chunks
+        
+    Returns:
+        List of chunk dictionaries, each with the hyperlink fields plus:
+        - chunk_index / chunk_count: Position of the sub-chunk within the page
+        - char_start / char_end: Offset range in the extracted text
+        - page_start / page_end: PDF page range (None for HTML)
+    """
+    windows = split_text_into_windows(text_content, max_tokens, overlap_tokens)
+    has_pages = PDF_PAGE_BREAK in text_content
+    
+    chunks = []
+    for index, window in enumerate(windows):
+        if has_pages:
+            page_start = text_content.count(PDF_PAGE_BREAK, 0, window['char_start']) + 1
+            page_end = text_content.count(PDF_PAGE_BREAK, 0, window['char_end']) + 1
+        else:
+            page_start = page_end = None
+        
+        chunks.append({
+            'content': window['content'],
+            'content_type': 'hyperlink',
+            'parent_section': url_info['parent_section'],
+            'source_url': url_info['url'],
+            'link_text': url_info['link_text'],
+            'section_number': url_info.get('section_number'),
+            'section_path': f"Reference: {url_info['link_text']}",
+            'level': 0,
+            'line_start': url_info.get('line_number', 0),
+            'line_end': url_info.get('line_number', 0),
+            'header_text': url_info['link_text'],
+            'chunk_index': index,
+            'chunk_count': len(windows),
+            'char_start': window['char_start'],
+            'char_end': window['char_end'],
+            'page_start': page_start,
+            'page_end': page_end
+        })
+    return chunks
+
+
+def create_hyperlink_chunks(urls_with_context: List[Dict],
+                            max_workers: int = HYPERLINK_MAX_WORKERS,
+                            per_host_limit: int = HYPERLINK_PER_HOST_LIMIT,
+                            deadline: float = HYPERLINK_DEADLINE,
+                            cache: Optional[FetchCache] = None,
+                            offline: bool = False,
+                            max_tokens: int = HYPERLINK_CHUNK_TOKENS,
+                            overlap_tokens: int = HYPERLINK_CHUNK_OVERLAP_TOKENS) -> List[Dict]:
     """
     Create child knowledge units for hyperlinks.
+    URLs are fetched concurrently (see fetch_urls_concurrently); results are
+    processed and logged in input order. With a fetch cache, unchanged pages
+    (HTTP 304) reuse their previously parsed text and skip the parsers.
     
     Args:
         urls_with_context: List of URL dictionaries from extract_urls_from_markdown
+        max_workers: Maximum concurrent requests overall
+        per_host_limit: Maximum concurrent requests per host
+        deadline: Seconds allowed for the whole fetch phase
+        cache: Optional FetchCache for conditional requests and parsed text
+        offline: Build chunks only from ``cache`` without any network access
+        max_tokens: Maximum estimated tokens per sub-chunk
+        overlap_tokens: Estimated tokens shared by consecutive sub-chunks
         
     Returns:
-        List of chunk dictionaries for hyperlinks:
+        List of chunk dictionaries for hyperlinks (several per long page, see
+        build_hyperlink_sub_chunks):
         - content: Extracted text content
         - content_type: "hyperlink"
         - parent_section: Originating section
@@ -205,23 +443,35 @@ def create_hyperlink_chunks(urls_with_context: List[Dict]) -> List[Dict]:
     logger.info(f"Starting hyperlink processing - {len(urls_with_context)} URLs to process")
     logger.info("=" * 80)
     
+    # Skip duplicates
+    unique_url_infos = []
     for url_info in urls_with_context:
         url = url_info['url']
-        
-        # Skip duplicates
         if url in processed_urls:
             logger.info(f"Skipping duplicate URL: {url}")
             continue
-        
         processed_urls.add(url)
+        unique_url_infos.append(url_info)
+    
+    # Fetch content
+    fetch_started = time.monotonic()
+    fetched_results = fetch_urls_concurrently(
+        [url_info['url'] for url_info in unique_url_infos],
+        max_workers=max_workers,
+        per_host_limit=per_host_limit,
+        deadline=deadline,
+        cache=cache,
+        offline=offline
+    )
+    logger.info(f"Fetched {len(fetched_results)} URLs in {time.monotonic() - fetch_started:.1f}s")
+    
+    for url_info, fetched in zip(unique_url_infos, fetched_results):
+        url = url_info['url']
         
         logger.info(f"Processing: {url}")
         logger.info(f"  Link text: {url_info.get('link_text', 'N/A')}")
         logger.info(f"  Parent section: {url_info.get('parent_section', 'N/A')}")
         
-        # Fetch content
-        fetched = fetch_url_content(url)
-        
         if fetched['status'] != 'success':
             error_msg = fetched.get('error', 'Unknown error')
             logger.warning(f"FAILED - URL: {url} | Error: {error_msg}")
@@ -234,8 +484,16 @@ def create_hyperlink_chunks(urls_with_context: List[Dict]) -> List[Dict]:
             })
             continue
         
-        # Parse content based on type
-        if fetched['content_type'] == 'pdf':
+        # Parse content based on type (cached text is reused for unchanged pages)
+        if fetched.get('parsed_text') is not None:
+            text_content = fetched['parsed_text']
+            if fetched['cache_status'] == 'offline':
+                cache.offline_hits += 1
+            else:
+                cache.not_modified += 1
+                cache.touch(url)
+            logger.info(f"  Reused cached content ({fetched['cache_status']})")
+        elif fetched['content_type'] == 'pdf':
             text_content = parse_pdf_content(fetched['content'])
         elif fetched['content_type'] == 'html':
             text_content = parse_html_content(fetched['content'])
@@ -250,6 +508,12 @@ def create_hyperlink_chunks(urls_with_context: List[Dict]) -> List[Dict]:
             })
             continue
         
+        if cache is not None and fetched.get('cache_status') == 'fetched':
+            cache.put(url, fetched['content_type'], fetched['content'],
+                      etag=fetched.get('etag'), last_modified=fetched.get('last_modified'),
+                      parsed_text=text_content)
+            cache.refreshed += 1
+        
         if not text_content or len(text_content.strip()) < 50:
             logger.warning(f"FAILED - Insufficient content extracted from URL: {url} (length: {len(text_content) if text_content else 0})")
             failure_count += 1
@@ -261,28 +525,21 @@ def create_hyperlink_chunks(urls_with_context: List[Dict]) -> List[Dict]:
             })
             continue
         
-        # Create chunk
-        chunk = {
-            'content': text_content,
-            'content_type': 'hyperlink',
-            'parent_section': url_info['parent_section'],
-            'source_url': url,
-            'link_text': url_info['link_text'],
-            'section_number': url_info.get('section_number'),
-            'section_path': f"Reference: {url_info['link_text']}",
-            'level': 0,
-            'line_start': url_info.get('line_number', 0),
-            'line_end': url_info.get('line_number', 0),
-            'header_text': url_info['link_text']
-        }
+        # Split into overlapping token windows so retrieval returns passages, not whole pages
+        sub_chunks = build_hyperlink_sub_chunks(text_content, url_info, max_tokens, overlap_tokens)
+        hyperlink_chunks.extend(sub_chunks)
         
-        hyperlink_chunks.append(chunk)
         success_count += 1
-        logger.info(f"SUCCESS - Processed: {url_info['link_text']} | Content length: {len(text_content)} chars")
+        logger.info(f"SUCCESS - Processed: {url_info['link_text']} | Content length: {len(text_content)} chars "
+                    f"| Sub-chunks: {len(sub_chunks)}")
     
     # Log summary
     logger.info("=" * 80)
     logger.info(f"Hyperlink processing complete - Success: {success_count}, Failed: {failure_count}, Total: {len(processed_urls)}")
+    if cache is not None:
+        cache_stats = cache.stats()
+        logger.info(f"Fetch cache - Not modified: {cache_stats['not_modified']}, "
+                    f"Refreshed: {cache_stats['refreshed']}, Offline: {cache_stats['offline_hits']}")
     logger.info("=" * 80)
     
     if failed_urls:
@@ -295,4 +552,3 @@ def create_hyperlink_chunks(urls_with_context: List[Dict]) -> List[Dict]:
             logger.info("")
     
     return hyperlink_chunks
-
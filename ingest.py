@@ -13,12 +13,29 @@ from config import (
     CHROMA_COLLECTION_NAME,
     CHROMA_PERSIST_DIRECTORY
 )
-from document_processor import parse_markdown_file, chunk_by_headers, extract_urls_from_markdown
+from document_processor import (
+    parse_markdown_file,
+    chunk_by_headers,
+    extract_urls_from_markdown,
+    extract_tables,
+    SectionIndex
+)
 from hyperlink_handler import create_hyperlink_chunks
+from embedding_cache import EmbeddingCache
+from fetch_cache import FetchCache
+from clients import drop_collection
+from lexical_index import build_lexical_index
+from section_tree import SectionTree, annotate_leaves
+from role_guidance import RoleGuidanceIndex
+from table_store import TableStore
+from graph_extractor import build_strategy_structure
 from vector_store import (
     initialize_chroma_db,
     generate_embeddings,
     store_chunks,
+    sync_chunks,
+    build_chunk_ids,
+    write_index_version,
     collection_exists
 )
 
@@ -37,13 +54,17 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def main(force: bool = False, skip_hyperlinks: bool = False):
+def main(force: bool = False, skip_hyperlinks: bool = False, use_cache: bool = True,
+         incremental: bool = False, offline: bool = False):
     """
     Main ingestion workflow.
     
     Args:
         force: Force re-indexing even if collection exists
         skip_hyperlinks: Skip hyperlink fetching (for faster testing)
+        use_cache: Reuse embeddings from the on-disk embedding cache
+        incremental: Diff against the existing collection and only upsert/delete changed chunks
+        offline: Build hyperlink chunks only from the fetch cache, without network access
     """
     try:
         # Load configuration
@@ -51,8 +72,8 @@ def main(force: bool = False, skip_hyperlinks: bool = False):
         config = load_config()
         logger.info("Configuration loaded successfully")
         
-        # Check if collection exists
-        if collection_exists(CHROMA_COLLECTION_NAME, CHROMA_PERSIST_DIRECTORY):
+        # Check if collection exists (incremental runs update it in place)
+        if not incremental and collection_exists(CHROMA_COLLECTION_NAME, CHROMA_PERSIST_DIRECTORY):
             if not force:
                 logger.warning(
                     f"Collection '{CHROMA_COLLECTION_NAME}' already exists. "
@@ -70,25 +91,65 @@ def main(force: bool = False, skip_hyperlinks: bool = False):
         markdown_text = parse_markdown_file(DOCUMENT_PATH)
         logger.info(f"Document parsed successfully ({len(markdown_text)} characters)")
         
+        # Locate every section once; chunking, role guidance, the strategy
+        # structure and URL extraction all slice from this index
+        section_index = SectionIndex(markdown_text)
+        
         # Header-based chunking
         logger.info("Performing header-based chunking...")
-        main_chunks = chunk_by_headers(markdown_text)
+        main_chunks = chunk_by_headers(markdown_text, section_index)
         logger.info(f"Created {len(main_chunks)} chunks from main document")
         
         # Add content_type to main chunks
         for chunk in main_chunks:
             chunk['content_type'] = 'main_doc'
         
+        # Precompute each role's Section 8.3 guidance for direct lookup at query time,
+        # and split the chunks at its subsections so every role's chunk is tagged
+        role_guidance = RoleGuidanceIndex.build(markdown_text, section_index)
+        role_guidance.save()
+        main_chunks = role_guidance.split_chunks(main_chunks)
+        
+        # Build the section tree for hierarchical retrieval and tag leaf sections
+        main_chunk_ids = build_chunk_ids(main_chunks)
+        section_tree = SectionTree.build(main_chunks, main_chunk_ids)
+        annotate_leaves(main_chunks, section_tree, main_chunk_ids)
+        section_tree.save()
+        
+        # Parse pipe tables into the columnar table store (linked to their sections)
+        table_store = TableStore.build(extract_tables(main_chunks))
+        table_store.save()
+        
+        # Strategy graph structure (only re-extracted when Sections 7.2/7.3/8.2 changed)
+        try:
+            strategy_artifact, extracted = build_strategy_structure(markdown_text, section_index=section_index)
+            extraction = strategy_artifact.get('extraction', {})
+            llm_ms = extraction.get('llm_ms')
+            strategy_summary = (f"version {strategy_artifact['version']}, "
+                                f"{len(strategy_artifact['structure'].get('pillars', []))} pillars, "
+                                f"{'re-extracted' if extracted else 'unchanged'}, "
+                                f"by {extraction.get('method', 'unknown')} "
+                                f"(rules {extraction.get('rules_ms', 0):.1f}ms, "
+                                f"Gemini {f'{llm_ms:.0f}ms' if llm_ms is not None else 'not run'})")
+        except Exception as e:
+            logger.warning(f"Strategy structure extraction failed (the graph keeps its previous version): {e}")
+            strategy_summary = f"extraction failed ({e})"
+        
         # Extract URLs
         logger.info("Extracting URLs from document...")
-        urls_with_context = extract_urls_from_markdown(markdown_text, main_chunks)
+        urls_with_context = extract_urls_from_markdown(markdown_text, main_chunks, section_index)
         logger.info(f"Found {len(urls_with_context)} URLs")
         
         # Process hyperlinks
         hyperlink_chunks = []
         if not skip_hyperlinks and urls_with_context:
-            logger.info("Fetching and processing hyperlinks...")
-            hyperlink_chunks = create_hyperlink_chunks(urls_with_context)
+            fetch_cache = FetchCache()
+            if offline:
+                logger.info("Loading hyperlinks from fetch cache (offline mode)...")
+            else:
+                logger.info("Fetching and processing hyperlinks...")
+            hyperlink_chunks = create_hyperlink_chunks(urls_with_context, cache=fetch_cache, offline=offline)
+            fetch_cache.close()
             logger.info(f"Successfully processed {len(hyperlink_chunks)} hyperlinks")
         elif skip_hyperlinks:
             logger.info("Skipping hyperlink processing (--skip-hyperlinks flag)")
@@ -99,30 +160,56 @@ def main(force: bool = False, skip_hyperlinks: bool = False):
         all_chunks = main_chunks + hyperlink_chunks
         logger.info(f"Total chunks to index: {len(all_chunks)}")
         
-        # Generate embeddings
-        logger.info("Generating embeddings...")
-        chunk_texts = [chunk['content'] for chunk in all_chunks]
-        embeddings = generate_embeddings(chunk_texts)
-        logger.info(f"Generated {len(embeddings)} embeddings")
-        
-        # Initialize ChromaDB
-        logger.info("Initializing ChromaDB...")
-        if force and collection_exists(CHROMA_COLLECTION_NAME, CHROMA_PERSIST_DIRECTORY):
-            # Delete existing collection
-            import chromadb
-            client = chromadb.PersistentClient(path=CHROMA_PERSIST_DIRECTORY)
-            try:
-                client.delete_collection(name=CHROMA_COLLECTION_NAME)
-                logger.info(f"Deleted existing collection: {CHROMA_COLLECTION_NAME}")
-            except Exception as e:
-                logger.warning(f"Could not delete collection: {e}")
-        
-        client, collection = initialize_chroma_db(CHROMA_COLLECTION_NAME, CHROMA_PERSIST_DIRECTORY)
-        
-        # Store chunks
-        logger.info("Storing chunks in ChromaDB...")
-        store_chunks(collection, all_chunks, embeddings)
-        logger.info("Chunks stored successfully")
+        embedding_cache = EmbeddingCache() if use_cache else None
+        
+        if incremental:
+            # Diff against the existing collection by deterministic chunk ID
+            logger.info("Syncing chunks with existing collection (incremental mode)...")
+            client, collection = initialize_chroma_db(CHROMA_COLLECTION_NAME, CHROMA_PERSIST_DIRECTORY)
+            # Keep previously fetched hyperlink chunks when hyperlinks were skipped
+            content_types = ['main_doc'] if skip_hyperlinks else ['main_doc', 'hyperlink']
+            sync_stats = sync_chunks(collection, all_chunks, content_types=content_types, cache=embedding_cache)
+            index_summary = (f"{sync_stats['added']} upserted, {sync_stats['deleted']} deleted, "
+                             f"{sync_stats['updated']} metadata updates, {sync_stats['unchanged']} unchanged")
+            logger.info(f"Incremental sync complete: {index_summary}")
+        else:
+            # Generate embeddings
+            logger.info("Generating embeddings...")
+            chunk_texts = [chunk['content'] for chunk in all_chunks]
+            embeddings = generate_embeddings(chunk_texts, cache=embedding_cache)
+            logger.info(f"Generated {len(embeddings)} embeddings")
+            
+            # Initialize ChromaDB
+            logger.info("Initializing ChromaDB...")
+            if force and collection_exists(CHROMA_COLLECTION_NAME, CHROMA_PERSIST_DIRECTORY):
+                # Delete existing collection
+                try:
+                    drop_collection(CHROMA_COLLECTION_NAME, CHROMA_PERSIST_DIRECTORY)
+                except Exception as e:
+                    logger.warning(f"Could not delete collection: {e}")
+            
+            client, collection = initialize_chroma_db(CHROMA_COLLECTION_NAME, CHROMA_PERSIST_DIRECTORY)
+            
+            # Store chunks
+            logger.info("Storing chunks in ChromaDB...")
+            store_chunks(collection, all_chunks, embeddings)
+            logger.info("Chunks stored successfully")
+            index_summary = f"full rebuild ({len(all_chunks)} chunks stored)"
+        
+        # Record the new index version so answer caches invalidate themselves
+        index_version = write_index_version(collection)
+        
+        # Build the BM25 index over the same chunk IDs for hybrid retrieval
+        logger.info("Building lexical index...")
+        lexical_index = build_lexical_index(collection)
+        
+        if embedding_cache is not None:
+            cache_stats = embedding_cache.stats()
+            embedding_cache.close()
+            cache_summary = (f"{cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                             f"({cache_stats['hits']} API calls saved)")
+        else:
+            cache_summary = "disabled (--no-cache)"
         
         # Print and log summary
         summary = f"""
@@ -132,6 +219,13 @@ INGESTION COMPLETE
 Total chunks created: {len(all_chunks)}
   - Main document chunks: {len(main_chunks)}
   - Hyperlink chunks: {len(hyperlink_chunks)}
+Index update: {index_summary}
+Index version: {index_version}
+Lexical index: {len(lexical_index.chunk_ids)} chunks, {len(lexical_index.vocabulary)} terms
+Role guidance: {', '.join(role_guidance.roles) or 'none found'}
+Table store: {len(table_store.tables)} tables, {table_store.num_rows} rows
+Strategy structure: {strategy_summary}
+Embedding cache: {cache_summary}
 Collection name: {CHROMA_COLLECTION_NAME}
 Collection location: {CHROMA_PERSIST_DIRECTORY}
 {'=' * 80}
@@ -158,8 +252,24 @@ if __name__ == "__main__":
         action="store_true",
         help="Skip hyperlink fetching (for faster testing)"
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-embed every chunk instead of reusing cached embeddings"
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Serve hyperlinks only from the fetch cache (no network access)"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only upsert new/changed chunks and delete removed ones instead of rebuilding"
+    )
     
     args = parser.parse_args()
     
-    main(force=args.force, skip_hyperlinks=args.skip_hyperlinks)
+    main(force=args.force, skip_hyperlinks=args.skip_hyperlinks, use_cache=not args.no_cache,
+         incremental=args.incremental, offline=args.offline)
 
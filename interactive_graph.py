@@ -1,169 +1,378 @@
 """
-Interactive strategy mind‑map rendering using vis-network.
+Interactive strategy graph rendering with a local renderer.
 
 This module converts the structured strategy data (root, pillars,
-initiatives, KPIs) into an interactive, clickable graph rendered
-inside Streamlit via components.html.
+initiatives, KPIs) and the strategy map (static/strategy_map.json) into
+compact JSON payloads, drawn as interactive, clickable graphs by
+static/strategy_graph.js inside Streamlit via components.html. The
+renderer has no dependencies and is inlined, so nothing loads from a CDN.
+
+The mind-map is also available as a Streamlit component
+(strategy_mindmap) that stays mounted and only receives the nodes and
+edges that changed between strategy structure versions.
 """
 
-from typing import Dict, Any, List
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+import bisect
+import hashlib
 import json
+import os
+
+from config import GRAPH_ASSETS_DIRECTORY
+from graph_extractor import load_strategy_structure
+
+GRAPH_SCRIPT = "strategy_graph.js"
+STRATEGY_MAP = "strategy_map.json"
+
+# Dark theme matching the main app
+MINDMAP_THEME = {
+    "background": "#020617",
+    "panel": "#020617",
+    "border": "#1f2937",
+    "text": "#e5e7eb",
+    "muted": "#94a3b8",
+    "heading": "#93c5fd",
+    "edge": "#4b5563",
+}
+MINDMAP_LEVELS = ["Strategy", "Pillar", "Initiative", "KPI"]
+# Node colors and fonts per level, sent once per payload instead of with every node
+MINDMAP_STYLES = {
+    0: {"color": {"background": "#1f2937", "border": "#60a5fa"}, "font": {"color": "#e5e7eb", "size": 18}},
+    1: {"color": {"background": "#111827", "border": "#34d399"}, "font": {"color": "#e5e7eb", "size": 16}},
+    2: {"color": {"background": "#020617", "border": "#fbbf24"}, "font": {"color": "#e5e7eb", "size": 13}},
+    3: {"color": {"background": "#0b1120", "border": "#f97316"}, "font": {"color": "#e5e7eb", "size": 12}},
+}
+# Graph models of recent structure versions, kept to diff against
+MODEL_CACHE_SIZE = 8
+
+# Asset path -> (mtime, content, content hash)
+_asset_cache: Dict[str, Tuple[float, str, str]] = {}
+
+
+def minify_js(source: str) -> str:
+    """
+    Strip comments, indentation and blank lines from JavaScript.
+
+    Only whole-line comments are removed and line breaks are kept, so
+    statements never merge (safe for the renderer, which relies on neither).
+    """
+    lines = []
+    in_comment = False
+    for line in source.splitlines():
+        line = line.strip()
+        if in_comment or line.startswith('/*'):
+            in_comment = not line.endswith('*/')
+            continue
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def load_asset(filename: str) -> Tuple[str, str]:
+    """
+    Load a graph asset from GRAPH_ASSETS_DIRECTORY.
+
+    The file is only re-read when its modification time changes; JavaScript
+    is minified once per read.
+
+    Args:
+        filename: Asset file name (e.g. GRAPH_SCRIPT)
+
+    Returns:
+        Tuple of (content, content hash)
+    """
+    path = os.path.join(GRAPH_ASSETS_DIRECTORY, filename)
+    mtime = os.path.getmtime(path)
+    cached = _asset_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1], cached[2]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if filename.endswith('.js'):
+        content = minify_js(content)
+    content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+    _asset_cache[path] = (mtime, content, content_hash)
+    return content, content_hash
+
+
+def graph_page_key(source_hash: str) -> str:
+    """
+    Cache key of a rendered graph page.
 
+    Args:
+        source_hash: Content hash of the payload's source (e.g. the strategy
+                     artifact version or strategy_map_hash())
+
+    Returns:
+        The source hash combined with the renderer's content hash
+    """
+    return f"{source_hash}-{load_asset(GRAPH_SCRIPT)[1]}"
+
+
+def strategy_map_hash() -> str:
+    """Content hash of static/strategy_map.json."""
+    return load_asset(STRATEGY_MAP)[1]
+
+
+def _in_order(positions: List[int]) -> set:
+    """Indexes of a longest increasing subsequence of positions."""
+    tails: List[int] = []
+    tail_index: List[int] = []
+    previous: List[Optional[int]] = []
+    for index, position in enumerate(positions):
+        slot = bisect.bisect_left(tails, position)
+        previous.append(tail_index[slot - 1] if slot else None)
+        if slot == len(tails):
+            tails.append(position)
+            tail_index.append(index)
+        else:
+            tails[slot] = position
+            tail_index[slot] = index
+    keep = set()
+    index = tail_index[-1] if tail_index else None
+    while index is not None:
+        keep.add(index)
+        index = previous[index]
+    return keep
 
-def _build_nodes_and_edges(structure: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
-    """Convert strategy structure into vis-network node/edge lists."""
-    nodes: List[Dict[str, Any]] = []
-    edges: List[Dict[str, Any]] = []
 
-    root_label = structure.get("root", "2026 Strategy")
-    root_id = "root"
+def _unique_id(base: str, taken: set) -> str:
+    """Reserve a node ID, suffixing it if it is already taken."""
+    node_id, n = base, 1
+    while node_id in taken:
+        n += 1
+        node_id = f"{base}.{n}"
+    taken.add(node_id)
+    return node_id
+
+
+class GraphModel:
+    """
+    Strategy mind-map as compact records.
+
+    Nodes are [id, label, level] lists and edges [from, to] pairs; styles are
+    per level (MINDMAP_STYLES). Node IDs come from the pillar number and the
+    item label rather than list positions, so a diff between two versions
+    only names what actually changed.
+    """
 
-    # Root node
-    nodes.append(
-        {
-            "id": root_id,
-            "label": root_label,
-            "level": 0,
-            "shape": "box",
-            "color": {"background": "#1f2937", "border": "#60a5fa"},
-            "font": {"color": "#e5e7eb", "size": 18, "face": "Segoe UI"},
+    def __init__(self, nodes: List[List[Any]], edges: List[List[str]]):
+        """
+        Args:
+            nodes: [id, label, level] records
+            edges: [from, to] pairs
+        """
+        self.nodes = nodes
+        self.edges = edges
+
+    @classmethod
+    def from_structure(cls, structure: Dict[str, Any]) -> "GraphModel":
+        """
+        Build the model from a strategy structure (every initiative and KPI).
+
+        Args:
+            structure: Strategy structure (root, pillars with initiatives and KPIs)
+
+        Returns:
+            GraphModel
+        """
+        nodes = [["root", structure.get("root", "2026 Strategy"), 0]]
+        edges = []
+        taken = {"root"}
+        for position, pillar in enumerate(structure.get("pillars", []), start=1):
+            pillar_id = _unique_id(f"p{pillar.get('id', position)}", taken)
+            nodes.append([pillar_id, pillar.get("name", "Pillar"), 1])
+            edges.append(["root", pillar_id])
+            for key, level in (("initiatives", 2), ("kpis", 3)):
+                for item in pillar.get(key, []):
+                    # Derived from the label, so the ID survives reordering
+                    label_hash = hashlib.sha1(str(item).encode("utf-8")).hexdigest()[:8]
+                    item_id = _unique_id(f"{pillar_id}.{key[0]}{label_hash}", taken)
+                    nodes.append([item_id, str(item), level])
+                    edges.append([pillar_id, item_id])
+        return cls(nodes, edges)
+
+    def payload(self) -> Dict[str, Any]:
+        """Full renderer payload for static/strategy_graph.js (tree layout)."""
+        return {
+            "layout": "tree",
+            "theme": MINDMAP_THEME,
+            "node": {"width": 220},
+            "styles": MINDMAP_STYLES,
+            "levels": MINDMAP_LEVELS,
+            "nodes": self.nodes,
+            "edges": self.edges,
+        }
+
+    def diff(self, previous: "GraphModel") -> Dict[str, Any]:
+        """
+        Changes that turn ``previous`` into this model.
+
+        Args:
+            previous: Model of the version the front end holds
+
+        Returns:
+            Dictionary with nodes (upsert: [index, record] pairs for new,
+            changed or moved nodes, in index order; remove: IDs) and edges
+            (add/remove: [from, to] pairs)
+        """
+        old_nodes = {node[0]: node for node in previous.nodes}
+        new_index = {node[0]: index for index, node in enumerate(self.nodes)}
+        old_edges = {tuple(edge) for edge in previous.edges}
+        new_edges = {tuple(edge) for edge in self.edges}
+
+        # Unchanged nodes stay put unless their order relative to each other
+        # changed; those outside the longest in-order run are re-inserted
+        unchanged = [node[0] for node in previous.nodes
+                     if node[0] in new_index and self.nodes[new_index[node[0]]] == node]
+        in_order = _in_order([new_index[node_id] for node_id in unchanged])
+        staying = {node_id for position, node_id in enumerate(unchanged) if position in in_order}
+        return {
+            "nodes": {
+                "upsert": [[index, node] for index, node in enumerate(self.nodes) if node[0] not in staying],
+                "remove": [node_id for node_id in old_nodes if node_id not in new_index],
+            },
+            "edges": {
+                "add": [edge for edge in self.edges if tuple(edge) not in old_edges],
+                "remove": [edge for edge in previous.edges if tuple(edge) not in new_edges],
+            },
         }
+
+
+# Structure version -> GraphModel (most recent last)
+_models: "OrderedDict[str, GraphModel]" = OrderedDict()
+
+
+def graph_model(version: str, structure: Dict[str, Any]) -> GraphModel:
+    """
+    Get the model of a structure version, building it on first use.
+
+    Args:
+        version: Strategy artifact version (content hash of the sections)
+        structure: The structure stored under that version
+
+    Returns:
+        GraphModel
+    """
+    model = _models.get(version)
+    if model is None:
+        model = _models[version] = GraphModel.from_structure(structure)
+        while len(_models) > MODEL_CACHE_SIZE:
+            _models.popitem(last=False)
+    _models.move_to_end(version)
+    return model
+
+
+def mindmap_update(version: str, structure: Dict[str, Any], held_version: Optional[str]) -> Dict[str, Any]:
+    """
+    Decide what the mind-map front end needs to show a structure version.
+
+    Args:
+        version: Current strategy artifact version
+        structure: Current structure
+        held_version: Version the front end reported holding (None if none)
+
+    Returns:
+        Component arguments: version, base (the version a diff applies to)
+        and either diff (None when nothing changed) or the full payload
+    """
+    model = graph_model(version, structure)
+    if held_version == version:
+        return {"version": version, "base": version, "diff": None}
+    previous = _models.get(held_version) if held_version else None
+    if previous is None:
+        return {"version": version, "base": None, "payload": model.payload()}
+    return {"version": version, "base": held_version, "diff": model.diff(previous)}
+
+
+_mindmap_component = None
+
+
+def strategy_mindmap(artifact: Dict[str, Any], height: int = 650, key: str = "strategy_mindmap") -> Optional[str]:
+    """
+    Show the mind-map of a strategy artifact with the incremental component.
+
+    The component page (static/index.html) is served by Streamlit, keeps its
+    graph across reruns and reports the version it holds, so later calls only
+    send a diff (or nothing) instead of the whole graph.
+
+    Args:
+        artifact: Strategy artifact from graph_extractor.read_strategy_artifact
+        height: Component height in pixels
+        key: Widget key (the held version is read back from session state)
+
+    Returns:
+        Version the front end holds after the last render
+    """
+    import streamlit as st
+    import streamlit.components.v1 as components
+
+    global _mindmap_component
+    if _mindmap_component is None:
+        _mindmap_component = components.declare_component("strategy_mindmap", path=GRAPH_ASSETS_DIRECTORY)
+
+    args = mindmap_update(artifact["version"], artifact["structure"], st.session_state.get(key))
+    return _mindmap_component(height=height, key=key, default=None, **args)
+
+
+def build_mindmap_payload(structure: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the renderer payload for the pillars/initiatives/KPIs mind-map.
+
+    Args:
+        structure: Strategy structure (root, pillars with initiatives and KPIs)
+
+    Returns:
+        Payload dictionary for static/strategy_graph.js (tree layout)
+    """
+    return GraphModel.from_structure(structure).payload()
+
+
+def render_graph_html(payload: Dict[str, Any], height: int) -> str:
+    """
+    Build the HTML page drawing a payload with the inlined local renderer.
+
+    Args:
+        payload: Payload from build_mindmap_payload or the strategy map
+        height: Page height in pixels
+
+    Returns:
+        HTML for components.html
+    """
+    script, _ = load_asset(GRAPH_SCRIPT)
+    # Compact JSON; "</" is escaped so labels cannot close the script tag
+    payload_json = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).replace("</", "<\\/")
+    return (
+        f'<div id="strategy-graph" style="height:{height}px;"></div>'
+        f'<script>{script}</script>'
+        f'<script>StrategyGraph.render(document.getElementById("strategy-graph"),{payload_json});</script>'
     )
 
-    pillars = structure.get("pillars", [])
-    for idx, pillar in enumerate(pillars):
-        pillar_id = f"pillar_{idx}"
-        pillar_name = pillar.get("name", "Pillar")
-
-        nodes.append(
-            {
-                "id": pillar_id,
-                "label": pillar_name,
-                "level": 1,
-                "shape": "box",
-                "color": {"background": "#111827", "border": "#34d399"},
-                "font": {"color": "#e5e7eb", "size": 16},
-            }
-        )
-        edges.append({"from": root_id, "to": pillar_id})
-
-        # Initiatives
-        for jdx, initiative in enumerate(pillar.get("initiatives", [])[:4]):
-            init_id = f"init_{idx}_{jdx}"
-            init_label = str(initiative)
-            nodes.append(
-                {
-                    "id": init_id,
-                    "label": init_label,
-                    "level": 2,
-                    "shape": "box",
-                    "color": {"background": "#020617", "border": "#fbbf24"},
-                    "font": {"color": "#e5e7eb", "size": 13},
-                }
-            )
-            edges.append({"from": pillar_id, "to": init_id})
-
-        # KPIs
-        for kdx, kpi in enumerate(pillar.get("kpis", [])[:4]):
-            kpi_id = f"kpi_{idx}_{kdx}"
-            kpi_label = str(kpi)
-            nodes.append(
-                {
-                    "id": kpi_id,
-                    "label": kpi_label,
-                    "level": 3,
-                    "shape": "box",
-                    "color": {"background": "#0b1120", "border": "#f97316"},
-                    "font": {"color": "#e5e7eb", "size": 12},
-                }
-            )
-            edges.append({"from": pillar_id, "to": kpi_id})
-
-    return {"nodes": nodes, "edges": edges}
-
-
-def build_interactive_mindmap_html(structure: Dict[str, Any]) -> str:
+
+def build_interactive_mindmap_html(structure: Optional[Dict[str, Any]] = None, height: int = 650) -> str:
     """
     Build HTML/JS for an interactive mind‑map style strategy graph.
 
     - Click nodes to see their details in a side panel.
-    - Uses vis-network from CDN (no extra Python dependencies).
-    """
-    data = _build_nodes_and_edges(structure)
-    data_json = json.dumps(data)
-
-    # HTML with dark theme to match the main app
-    html = f"""
-    <div style="display:flex; flex-direction:row; gap:16px; height:650px;">
-      <div id="mindmap" style="flex:2; height:100%; background-color:#020617; border-radius:12px; border:1px solid #1f2937;"></div>
-      <div id="node-info" style="flex:1; height:100%; background-color:#020617; border-radius:12px; border:1px solid #1f2937; padding:16px; color:#e5e7eb; font-family: 'Segoe UI', system-ui, -apple-system, BlinkMacSystemFont, sans-serif; font-size:14px; overflow-y:auto;">
-        <h3 style="margin-top:0; font-size:16px; color:#93c5fd;">Details</h3>
-        <p>Click any pillar, initiative, or KPI to see more details here.</p>
-      </div>
-    </div>
-
-    <script type="text/javascript" src="https://unpkg.com/vis-network/standalone/umd/vis-network.min.js"></script>
-    <script type="text/javascript">
-      const rawData = {data_json};
-      const container = document.getElementById('mindmap');
-      const nodes = new vis.DataSet(rawData.nodes);
-      const edges = new vis.DataSet(rawData.edges);
-
-      const options = {{
-        layout: {{
-          hierarchical: {{
-            enabled: true,
-            direction: 'LR',
-            levelSeparation: 180,
-            nodeSpacing: 140,
-            sortMethod: 'hubsize'
-          }}
-        }},
-        physics: false,
-        interaction: {{
-          hover: true,
-          tooltipDelay: 200
-        }},
-        edges: {{
-          color: '#4b5563',
-          width: 1.5,
-          smooth: true
-        }},
-        nodes: {{
-          borderWidth: 1.5,
-          shape: 'box',
-          margin: 8
-        }}
-      }};
-
-      const network = new vis.Network(container, {{ nodes, edges }}, options);
-
-      const infoEl = document.getElementById('node-info');
-
-      function renderInfo(nodeId) {{
-        const node = nodes.get(nodeId);
-        if (!node) return;
-
-        let levelLabel = 'Element';
-        if (node.level === 0) levelLabel = 'Strategy';
-        else if (node.level === 1) levelLabel = 'Pillar';
-        else if (node.level === 2) levelLabel = 'Initiative';
-        else if (node.level === 3) levelLabel = 'KPI';
-
-        infoEl.innerHTML = `
-          <h3 style="margin-top:0; font-size:16px; color:#93c5fd;">${{levelLabel}}</h3>
-          <p style="white-space:pre-wrap;">${{node.label}}</p>
-        `;
-      }}
-
-      network.on('selectNode', function(params) {{
-        if (params.nodes && params.nodes.length > 0) {{
-          renderInfo(params.nodes[0]);
-        }}
-      }});
-    </script>
-    """
-
-    return html
+    - Drawn by the local renderer (no CDN, no extra Python dependencies).
+    - Without a structure, the one stored by ingest.py is used.
+    """
+    if structure is None:
+        structure = load_strategy_structure()
+        if structure is None:
+            raise ValueError("No stored strategy structure found. Run `python ingest.py` first.")
+
+    return render_graph_html(build_mindmap_payload(structure), height)
 
 
+def build_strategy_map_html(height: int = 780) -> str:
+    """
+    Build HTML/JS for the strategy map (document overview hub).
+
+    - Click a numbered area to expand its topics; click a topic for its summary.
+    - Content and layout come from static/strategy_map.json.
+    """
+    content, _ = load_asset(STRATEGY_MAP)
+    return render_graph_html(json.loads(content), height)
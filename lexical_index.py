@@ -0,0 +1,270 @@
+"""
+Lexical (BM25) index over the indexed chunks.
+Complements dense retrieval for exact figures, KPI names and section numbers
+("8.2", "Q2 2025"). Built at ingestion time and persisted next to chroma_db as
+flat postings arrays in .npy files, which are memory-mapped at startup.
+"""
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import (
+    LEXICAL_INDEX_DIRECTORY,
+    BM25_K1,
+    BM25_B,
+    RRF_K,
+    LEXICAL_STRONG_MATCH_MARGIN
+)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Numbers keep their decimal points so "8.2" and "3.3" stay single tokens
+_TOKEN_PATTERN = re.compile(r'\d+(?:\.\d+)*[a-z%]*|[a-z][a-z0-9]*')
+
+_STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'how', 'in', 'is',
+    'it', 'of', 'on', 'or', 'our', 'that', 'the', 'their', 'this', 'to', 'was', 'we',
+    'what', 'when', 'which', 'who', 'why', 'will', 'with', 'does', 'did', 'do', 'about'
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase index terms.
+    
+    Args:
+        text: Text to tokenize
+    
+    Returns:
+        List of terms (stopwords removed, duplicates kept)
+    """
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+def chunk_index_text(content: str, metadata: Dict) -> str:
+    """Text indexed for a chunk: its section number, path and link text plus the content."""
+    return ' '.join([
+        metadata.get('section_number', ''),
+        metadata.get('section_path', ''),
+        metadata.get('link_text', ''),
+        content
+    ])
+
+
+class LexicalIndex:
+    """
+    Compact BM25 inverted index.
+    
+    Postings are stored as two flat arrays (document number and term frequency)
+    addressed through per-term offsets, so a saved index can be memory-mapped
+    instead of rebuilt. Only the vocabulary and chunk IDs are held in memory.
+    """
+    
+    def __init__(self, chunk_ids: List[str], vocabulary: Dict[str, int], offsets: np.ndarray,
+                 postings_docs: np.ndarray, postings_tfs: np.ndarray, doc_lengths: np.ndarray,
+                 k1: float = BM25_K1, b: float = BM25_B):
+        """
+        Args:
+            chunk_ids: Chunk ID for each document number
+            vocabulary: Term -> term number
+            offsets: Start of each term's postings (length = terms + 1)
+            postings_docs: Document number of each posting
+            postings_tfs: Term frequency of each posting
+            doc_lengths: Token count of each document
+            k1: BM25 term-frequency saturation
+            b: BM25 length normalization
+        """
+        self.chunk_ids = chunk_ids
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.postings_docs = postings_docs
+        self.postings_tfs = postings_tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+        # BM25 length normalization per document, computed once
+        self._length_norm = k1 * (1 - b + b * np.asarray(doc_lengths, dtype=np.float32) / max(self.avg_doc_length, 1e-9))
+    
+    @classmethod
+    def build(cls, chunk_ids: List[str], texts: List[str]) -> "LexicalIndex":
+        """
+        Build an index from chunk texts.
+        
+        Args:
+            chunk_ids: Chunk IDs (same order as texts)
+            texts: Text to index for each chunk (see chunk_index_text)
+        
+        Returns:
+            LexicalIndex
+        """
+        term_postings: Dict[str, Dict[int, int]] = {}
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths[doc] = len(tokens)
+            for token in tokens:
+                postings = term_postings.setdefault(token, {})
+                postings[doc] = postings.get(doc, 0) + 1
+        
+        terms = sorted(term_postings)
+        vocabulary = {term: number for number, term in enumerate(terms)}
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        docs, tfs = [], []
+        for number, term in enumerate(terms):
+            postings = term_postings[term]
+            docs.extend(postings.keys())
+            tfs.extend(postings.values())
+            offsets[number + 1] = offsets[number] + len(postings)
+        
+        return cls(list(chunk_ids), vocabulary, offsets,
+                   np.asarray(docs, dtype=np.int32), np.asarray(tfs, dtype=np.float32), doc_lengths)
+    
+    def save(self, directory: str = LEXICAL_INDEX_DIRECTORY):
+        """
+        Persist the index (postings as .npy arrays, vocabulary and IDs as JSON).
+        
+        Args:
+            directory: Directory to write the index files to
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'offsets.npy'), self.offsets)
+        np.save(os.path.join(directory, 'postings_docs.npy'), self.postings_docs)
+        np.save(os.path.join(directory, 'postings_tfs.npy'), self.postings_tfs)
+        np.save(os.path.join(directory, 'doc_lengths.npy'), self.doc_lengths)
+        with open(os.path.join(directory, 'lexicon.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'chunk_ids': self.chunk_ids,
+                'vocabulary': self.vocabulary,
+                'k1': self.k1,
+                'b': self.b
+            }, f)
+        logger.info(f"Saved lexical index ({len(self.chunk_ids)} chunks, "
+                    f"{len(self.vocabulary)} terms) to {directory}")
+    
+    @classmethod
+    def load(cls, directory: str = LEXICAL_INDEX_DIRECTORY) -> Optional["LexicalIndex"]:
+        """
+        Load a saved index, memory-mapping the postings arrays.
+        
+        Args:
+            directory: Directory the index was saved to
+        
+        Returns:
+            LexicalIndex, or None if no index has been built
+        """
+        lexicon_path = os.path.join(directory, 'lexicon.json')
+        if not os.path.exists(lexicon_path):
+            return None
+        
+        with open(lexicon_path, 'r', encoding='utf-8') as f:
+            lexicon = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+            for name in ('offsets', 'postings_docs', 'postings_tfs', 'doc_lengths')
+        }
+        return cls(lexicon['chunk_ids'], lexicon['vocabulary'], arrays['offsets'],
+                   arrays['postings_docs'], arrays['postings_tfs'], arrays['doc_lengths'],
+                   k1=lexicon.get('k1', BM25_K1), b=lexicon.get('b', BM25_B))
+    
+    def search(self, query: str, top_k: int = 10,
+               strong_margin: float = LEXICAL_STRONG_MATCH_MARGIN) -> Dict:
+        """
+        Score chunks against a query with BM25.
+        
+        A match is "strong" when the query contains a number or section
+        reference, the best chunk contains every query term, and its score
+        beats the runner-up by ``strong_margin``. Strong matches are precise
+        enough to answer from without a dense search.
+        
+        Args:
+            query: Query text
+            top_k: Number of hits to return
+            strong_margin: Required ratio between the best and second-best score
+        
+        Returns:
+            Dictionary with:
+            - hits: List of (chunk_id, score) in descending score order
+            - strong: Whether the top hit is a strong lexical match
+        """
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        num_docs = len(self.chunk_ids)
+        if not query_terms or num_docs == 0:
+            return {'hits': [], 'strong': False}
+        
+        scores = np.zeros(num_docs, dtype=np.float32)
+        matched_terms = np.zeros(num_docs, dtype=np.int32)
+        for term in query_terms:
+            number = self.vocabulary.get(term)
+            if number is None:
+                continue
+            start, end = int(self.offsets[number]), int(self.offsets[number + 1])
+            docs = np.asarray(self.postings_docs[start:end])
+            tfs = np.asarray(self.postings_tfs[start:end])
+            idf = np.log(1 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + self._length_norm[docs])
+            matched_terms[docs] += 1
+        
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) == 0:
+            return {'hits': [], 'strong': False}
+        ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+        
+        best = ranked[0]
+        runner_up = float(scores[ranked[1]]) if len(ranked) > 1 else 0.0
+        strong = (
+            any(term[0].isdigit() for term in query_terms)
+            and matched_terms[best] == len(query_terms)
+            and float(scores[best]) >= strong_margin * runner_up
+        )
+        
+        return {
+            'hits': [(self.chunk_ids[doc], float(scores[doc])) for doc in ranked[:top_k]],
+            'strong': bool(strong)
+        }
+
+
+def build_lexical_index(collection, directory: str = LEXICAL_INDEX_DIRECTORY) -> LexicalIndex:
+    """
+    Build and save the lexical index for everything stored in a collection.
+    Reading from the collection keeps chunk IDs in sync after incremental updates.
+    
+    Args:
+        collection: Vector store collection
+        directory: Directory to save the index to
+    
+    Returns:
+        The built LexicalIndex
+    """
+    stored = collection.get(include=['documents', 'metadatas'])
+    texts = [
+        chunk_index_text(document or '', metadata or {})
+        for document, metadata in zip(stored['documents'], stored['metadatas'])
+    ]
+    index = LexicalIndex.build(stored['ids'], texts)
+    index.save(directory)
+    return index
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """
+    Merge ranked ID lists with reciprocal-rank fusion.
+    
+    Args:
+        ranked_lists: Lists of IDs, best first
+        k: RRF damping constant
+    
+    Returns:
+        List of (id, fused score) in descending score order
+    """
+    fused: Dict[str, float] = {}
+    for ranked in ranked_lists:
+        for rank, item in enumerate(ranked):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,304 @@
+"""
+Local NumPy vector store.
+Exact cosine search over a float32 matrix kept in a memory-mapped .npy file,
+with documents and metadata in a JSON sidecar. Implements the subset of the
+ChromaDB Collection API used by vector_store, so it can replace Chroma for a
+corpus this small without SQLite or an HNSW index.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "records.json"
+
+
+def numpy_collection_path(collection_name: str, persist_directory: str) -> str:
+    """Directory holding a NumPy collection's files."""
+    return os.path.join(persist_directory, "numpy", collection_name)
+
+
+def _atomic_write(path: str, write):
+    """Write a file via a temporary sibling so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+class NumpyCollection:
+    """
+    Collection backed by a normalized float32 matrix and a JSON sidecar.
+    
+    Supports add/upsert/update/delete/get/query/count with Chroma-style
+    ``where`` filters ({"key": value}, $eq, $ne, $in, $nin, $and, $or).
+    Distances are cosine distances (1 - similarity), as with a Chroma
+    collection created with hnsw:space=cosine.
+    """
+    
+    def __init__(self, name: str, directory: str, ids: List[str], documents: List[str],
+                 metadatas: List[Dict], vectors: np.ndarray, metadata: Optional[Dict] = None):
+        self.name = name
+        self.directory = directory
+        self.metadata = metadata or {"hnsw:space": "cosine"}
+        self._ids = ids
+        self._documents = documents
+        self._metadatas = metadatas
+        self._vectors = vectors
+        self._positions = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._lock = threading.RLock()
+    
+    @classmethod
+    def open(cls, name: str, persist_directory: str, create: bool = True) -> "NumpyCollection":
+        """
+        Open a collection, memory-mapping its vectors.
+        
+        Args:
+            name: Collection name
+            persist_directory: Base directory (shared with other backends)
+            create: Create an empty collection if none exists
+        
+        Returns:
+            NumpyCollection
+        
+        Raises:
+            ValueError: If the collection does not exist and create is False
+        """
+        directory = numpy_collection_path(name, persist_directory)
+        records_path = os.path.join(directory, RECORDS_FILE)
+        if not os.path.exists(records_path):
+            if not create:
+                raise ValueError(f"Collection {name} does not exist.")
+            os.makedirs(directory, exist_ok=True)
+            collection = cls(name, directory, [], [], [], np.zeros((0, 0), dtype=np.float32))
+            collection._persist()
+            logger.info(f"Created new NumPy collection: {name}")
+            return collection
+        
+        with open(records_path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode='r')
+        logger.info(f"Loaded NumPy collection: {name} ({len(records['ids'])} vectors)")
+        return cls(name, directory, records['ids'], records['documents'], records['metadatas'],
+                   vectors, records.get('metadata'))
+    
+    def _persist(self):
+        """Write vectors and sidecar records to disk. Caller holds the lock."""
+        vectors = np.ascontiguousarray(self._vectors, dtype=np.float32)
+        _atomic_write(os.path.join(self.directory, VECTORS_FILE), lambda f: np.save(f, vectors))
+        records = json.dumps({
+            'ids': self._ids,
+            'documents': self._documents,
+            'metadatas': self._metadatas,
+            'metadata': self.metadata
+        })
+        _atomic_write(os.path.join(self.directory, RECORDS_FILE), lambda f: f.write(records.encode('utf-8')))
+    
+    @staticmethod
+    def _normalize(embeddings) -> np.ndarray:
+        matrix = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+    
+    def _column(self, key: str) -> np.ndarray:
+        """Metadata values for one key as an object array (cached until the next write)."""
+        column = self._columns.get(key)
+        if column is None:
+            column = np.empty(len(self._metadatas), dtype=object)
+            column[:] = [metadata.get(key) for metadata in self._metadatas]
+            self._columns[key] = column
+        return column
+    
+    def _where_mask(self, where: Optional[Dict]) -> np.ndarray:
+        """Evaluate a Chroma-style where filter to a boolean mask over all records."""
+        mask = np.ones(len(self._ids), dtype=bool)
+        if not where:
+            return mask
+        
+        for key, condition in where.items():
+            if key == '$and':
+                for clause in condition:
+                    mask &= self._where_mask(clause)
+            elif key == '$or':
+                any_mask = np.zeros(len(self._ids), dtype=bool)
+                for clause in condition:
+                    any_mask |= self._where_mask(clause)
+                mask &= any_mask
+            else:
+                column = self._column(key)
+                if not isinstance(condition, dict):
+                    condition = {'$eq': condition}
+                for operator, value in condition.items():
+                    if operator == '$eq':
+                        mask &= column == value
+                    elif operator == '$ne':
+                        mask &= column != value
+                    elif operator in ('$in', '$nin'):
+                        in_mask = np.zeros(len(self._ids), dtype=bool)
+                        for item in value:
+                            in_mask |= column == item
+                        mask &= in_mask if operator == '$in' else ~in_mask
+                    else:
+                        raise ValueError(f"Unsupported where operator: {operator}")
+        return mask
+    
+    def count(self) -> int:
+        """Number of stored records."""
+        return len(self._ids)
+    
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]):
+        """Insert records, replacing any with the same IDs."""
+        vectors = self._normalize(embeddings)
+        with self._lock:
+            current = np.array(self._vectors, dtype=np.float32) if self._ids else \
+                np.zeros((0, vectors.shape[1]), dtype=np.float32)
+            new_rows = []
+            for chunk_id, vector, document, metadata in zip(ids, vectors, documents, metadatas):
+                position = self._positions.get(chunk_id)
+                if position is None:
+                    self._positions[chunk_id] = len(self._ids)
+                    self._ids.append(chunk_id)
+                    self._documents.append(document)
+                    self._metadatas.append(dict(metadata))
+                    new_rows.append(vector)
+                else:
+                    current[position] = vector
+                    self._documents[position] = document
+                    self._metadatas[position] = dict(metadata)
+            if new_rows:
+                current = np.vstack([current, np.asarray(new_rows, dtype=np.float32)])
+            self._vectors = current
+            self._columns.clear()
+            self._persist()
+    
+    def add(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]):
+        """Insert records; IDs that already exist are skipped (as in Chroma)."""
+        new = [i for i, chunk_id in enumerate(ids) if chunk_id not in self._positions]
+        if new:
+            vectors = np.asarray(embeddings, dtype=np.float32)
+            self.upsert([ids[i] for i in new], vectors[new],
+                        [documents[i] for i in new], [metadatas[i] for i in new])
+    
+    def update(self, ids: List[str], embeddings=None, documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Dict]] = None):
+        """Update fields of existing records; unknown IDs are ignored."""
+        with self._lock:
+            vectors = None
+            if embeddings is not None:
+                vectors = np.array(self._vectors, dtype=np.float32)
+                new_vectors = self._normalize(embeddings)
+            for i, chunk_id in enumerate(ids):
+                position = self._positions.get(chunk_id)
+                if position is None:
+                    continue
+                if vectors is not None:
+                    vectors[position] = new_vectors[i]
+                if documents is not None:
+                    self._documents[position] = documents[i]
+                if metadatas is not None:
+                    self._metadatas[position] = dict(metadatas[i])
+            if vectors is not None:
+                self._vectors = vectors
+            self._columns.clear()
+            self._persist()
+    
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None):
+        """Delete records by ID and/or where filter."""
+        with self._lock:
+            mask = self._where_mask(where) if where else np.zeros(len(self._ids), dtype=bool)
+            for chunk_id in ids or []:
+                position = self._positions.get(chunk_id)
+                if position is not None:
+                    mask[position] = True
+            if not mask.any():
+                return
+            keep = np.flatnonzero(~mask)
+            self._ids = [self._ids[i] for i in keep]
+            self._documents = [self._documents[i] for i in keep]
+            self._metadatas = [self._metadatas[i] for i in keep]
+            self._vectors = np.array(self._vectors[keep], dtype=np.float32)
+            self._positions = {chunk_id: i for i, chunk_id in enumerate(self._ids)}
+            self._columns.clear()
+            self._persist()
+    
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            include: Optional[List[str]] = None, limit: Optional[int] = None) -> Dict:
+        """
+        Fetch records by ID and/or where filter.
+        
+        Returns:
+            Dictionary with 'ids' plus the included fields ('documents',
+            'metadatas', 'embeddings'; documents and metadatas by default)
+        """
+        include = ['documents', 'metadatas'] if include is None else include
+        with self._lock:
+            if ids is not None:
+                positions = [self._positions[i] for i in ids if i in self._positions]
+                if where:
+                    mask = self._where_mask(where)
+                    positions = [p for p in positions if mask[p]]
+            else:
+                positions = np.flatnonzero(self._where_mask(where)).tolist()
+            if limit is not None:
+                positions = positions[:limit]
+            
+            result = {'ids': [self._ids[p] for p in positions]}
+            result['documents'] = [self._documents[p] for p in positions] if 'documents' in include else None
+            result['metadatas'] = [self._metadatas[p] for p in positions] if 'metadatas' in include else None
+            result['embeddings'] = np.asarray(self._vectors[positions]) if 'embeddings' in include else None
+            return result
+    
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict] = None,
+              include: Optional[List[str]] = None) -> Dict:
+        """
+        Exact cosine top-k search.
+        
+        Returns:
+            Chroma-style result dictionary with one list per query embedding for
+            'ids', 'documents', 'metadatas' and 'distances'
+        """
+        queries = self._normalize(query_embeddings)
+        with self._lock:
+            result = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+            if not self._ids:
+                for _ in range(len(queries)):
+                    for values in result.values():
+                        values.append([])
+                return result
+            
+            candidates = np.flatnonzero(self._where_mask(where)) if where else None
+            matrix = self._vectors if candidates is None else self._vectors[candidates]
+            similarities = queries @ np.asarray(matrix).T
+            k = min(n_results, similarities.shape[1])
+            
+            for row in similarities:
+                if k == 0:
+                    top = np.array([], dtype=np.int64)
+                else:
+                    top = np.argpartition(-row, k - 1)[:k]
+                    top = top[np.argsort(-row[top], kind='stable')]
+                positions = top if candidates is None else candidates[top]
+                result['ids'].append([self._ids[p] for p in positions])
+                result['documents'].append([self._documents[p] for p in positions])
+                result['metadatas'].append([self._metadatas[p] for p in positions])
+                result['distances'].append((1.0 - row[top]).tolist())
+            return result
+
+
+def delete_numpy_collection(collection_name: str, persist_directory: str):
+    """Remove a NumPy collection's files."""
+    directory = numpy_collection_path(collection_name, persist_directory)
+    if not os.path.isdir(directory):
+        raise ValueError(f"Collection {collection_name} does not exist.")
+    shutil.rmtree(directory)
@@ -2,28 +2,39 @@
 RAG handler for query processing and response generation.
 Handles role detection, prompt construction, and Gemini integration.
 """
-import google.generativeai as genai
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator, AsyncIterator, Tuple
+from types import SimpleNamespace
+import asyncio
+import concurrent.futures
 import logging
+import queue
+import re
+import time
 
 from config import (
     GEMINI_MODEL,
-    GOOGLE_API_KEY,
     SYSTEM_PROMPT,
-    get_role_section_mapping,
     normalize_role,
     CITATION_FORMAT_MAIN,
-    CITATION_FORMAT_LINK
+    CITATION_FORMAT_LINK,
+    CONTEXT_TOKEN_BUDGETS,
+    MIN_CHUNK_CONTEXT_TOKENS,
+    ROLE_GUIDANCE_MIN_CONFIDENCE,
+    RERANK_ENABLED,
+    RERANK_CANDIDATE_MULTIPLIER
 )
-from vector_store import query_collection
+from document_processor import estimate_tokens
+from vector_store import aquery_collection, aembed_query, read_index_version
+from section_tree import ahierarchical_query
+from role_guidance import role_lookup_mode
+from reranker import MMRReranker
+from async_runner import run_sync, submit
+from clients import get_generative_model
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize GenAI
-genai.configure(api_key=GOOGLE_API_KEY)
-
 
 def detect_role_from_query(query: str, selected_role: Optional[str] = None) -> Optional[str]:
     """
@@ -63,6 +74,171 @@ def is_advice_request(query: str) -> bool:
     return any(keyword in query_lower for keyword in advice_keywords)
 
 
+def chunk_citation(metadata: Dict) -> str:
+    """
+    Format the citation label shown above a chunk in the prompt.
+    
+    Args:
+        metadata: Chunk metadata from the vector store
+        
+    Returns:
+        Citation such as "[Section 7.2] (path)" or "[Link: text]"
+    """
+    section_path = metadata.get('section_path', '')
+    section_number = metadata.get('section_number', '')
+    
+    if metadata.get('content_type', 'main_doc') == 'hyperlink':
+        link_text = metadata.get('link_text', metadata.get('source_url', 'Unknown'))
+        return CITATION_FORMAT_LINK.format(link_text=link_text)
+    if section_number:
+        citation = CITATION_FORMAT_MAIN.format(section=section_number)
+        if section_path:
+            citation += f" ({section_path})"
+        return citation
+    return f"[{section_path}]" if section_path else "[Unknown]"
+
+
+_QUERY_STOPWORDS = {
+    'the', 'and', 'for', 'are', 'what', 'how', 'why', 'who', 'which', 'with', 'that',
+    'this', 'from', 'our', 'about', 'does', 'should', 'can', 'will', 'into', 'their'
+}
+
+
+def _query_terms(query: str) -> set:
+    """Lowercased content words of a query, used to score sentences."""
+    return {
+        word for word in re.findall(r'[a-z0-9]+', query.lower())
+        if len(word) > 2 and word not in _QUERY_STOPWORDS
+    }
+
+
+def extract_relevant_text(content: str, query_terms: set, max_tokens: int) -> str:
+    """
+    Shrink chunk content to a token budget by keeping the most query-relevant sentences.
+    
+    Table rows, list items and other lines are treated as units; prose lines are
+    further split into sentences. The first line (the section header) is always
+    kept, selected units stay in document order, and "..." marks omitted text.
+    
+    Args:
+        content: Chunk content
+        query_terms: Content words from the user query
+        max_tokens: Token budget for the returned text
+        
+    Returns:
+        Trimmed content
+    """
+    lines = [line for line in content.split('\n') if line.strip()]
+    if not lines:
+        return ''
+    
+    header, units = lines[0], []
+    for line_index, line in enumerate(lines[1:], 1):
+        parts = [line] if line.lstrip().startswith(('|', '-', '*')) else re.split(r'(?<=[.!?])\s+', line)
+        for part in parts:
+            if re.search(r'\w', part):
+                units.append((line_index, part))
+    
+    # Leave a little room for the "..." omission markers
+    remaining = max_tokens - estimate_tokens(header) - 4
+    ranked = sorted(
+        range(len(units)),
+        key=lambda i: (-len(query_terms & set(re.findall(r'[a-z0-9]+', units[i][1].lower()))), i)
+    )
+    selected = set()
+    for i in ranked:
+        cost = estimate_tokens(units[i][1]) + 1
+        if cost <= remaining:
+            selected.add(i)
+            remaining -= cost
+    
+    # Rebuild in document order, rejoining sentences from the same line
+    output_lines = [header]
+    line_parts: List[str] = []
+    current_line, previous = None, -1
+    for i in sorted(selected):
+        line_index, part = units[i]
+        if i != previous + 1 or line_index != current_line:
+            if line_parts:
+                output_lines.append(' '.join(line_parts))
+                line_parts = []
+            if i != previous + 1:
+                output_lines.append('...')
+        line_parts.append(part.strip())
+        current_line, previous = line_index, i
+    if line_parts:
+        output_lines.append(' '.join(line_parts))
+    if previous != len(units) - 1:
+        output_lines.append('...')
+    
+    return '\n'.join(output_lines)
+
+
+def pack_context(user_query: str, retrieved_chunks: List[Dict], token_budget: int) -> Tuple[List[Dict], Dict]:
+    """
+    Fit retrieved chunks into a prompt token budget.
+    
+    The budget (minus each chunk's citation label) is shared out water-filling
+    style: small chunks are kept whole and the remainder is split evenly among
+    larger ones, which are trimmed to their most query-relevant sentences with
+    extract_relevant_text. If even shares would fall below
+    MIN_CHUNK_CONTEXT_TOKENS, the lowest-ranked chunks are dropped instead.
+    Citations are untouched because they are built from metadata.
+    
+    Args:
+        user_query: User's question (drives sentence selection)
+        retrieved_chunks: Retrieved chunks in rank order
+        token_budget: Maximum context tokens
+        
+    Returns:
+        Tuple of (packed chunks in rank order, stats dictionary with
+        context_budget, context_tokens_before, context_tokens, chunks_trimmed,
+        chunks_dropped)
+    """
+    chunks = list(retrieved_chunks)
+    sizes = [estimate_tokens(chunk.get('content', '')) for chunk in chunks]
+    overheads = [estimate_tokens(chunk_citation(chunk.get('metadata', {}))) + 4 for chunk in chunks]
+    tokens_before = sum(sizes) + sum(overheads)
+    
+    # Drop lowest-ranked chunks until every remaining chunk gets a useful share
+    while len(chunks) > 1:
+        content_budget = token_budget - sum(overheads)
+        needed = sum(min(size, MIN_CHUNK_CONTEXT_TOKENS) for size in sizes)
+        if content_budget >= needed:
+            break
+        chunks.pop()
+        sizes.pop()
+        overheads.pop()
+    
+    # Water-filling allocation: smallest chunks first, leftovers roll over
+    remaining = max(0, token_budget - sum(overheads))
+    allocation = [0] * len(chunks)
+    order = sorted(range(len(chunks)), key=lambda i: sizes[i])
+    for position, i in enumerate(order):
+        share = remaining // (len(order) - position)
+        allocation[i] = min(sizes[i], share)
+        remaining -= allocation[i]
+    
+    terms = _query_terms(user_query)
+    packed = []
+    trimmed = 0
+    for chunk, size, allowed in zip(chunks, sizes, allocation):
+        if size <= allowed:
+            packed.append(chunk)
+            continue
+        packed.append({**chunk, 'content': extract_relevant_text(chunk.get('content', ''), terms, allowed)})
+        trimmed += 1
+    
+    stats = {
+        'context_budget': token_budget,
+        'context_tokens_before': tokens_before,
+        'context_tokens': sum(estimate_tokens(chunk.get('content', '')) for chunk in packed) + sum(overheads),
+        'chunks_trimmed': trimmed,
+        'chunks_dropped': len(retrieved_chunks) - len(packed)
+    }
+    return packed, stats
+
+
 def build_rag_prompt(user_query: str, 
                      retrieved_chunks: List[Dict], 
                      user_role: Optional[str] = None,
@@ -107,23 +283,8 @@ Provide strategic advice that helps users understand what actions to take based
         prompt_parts.append("=" * 80)
         
         for i, chunk in enumerate(retrieved_chunks, 1):
-            metadata = chunk.get('metadata', {})
             content = chunk.get('content', '')
-            section_path = metadata.get('section_path', '')
-            section_number = metadata.get('section_number', '')
-            content_type = metadata.get('content_type', 'main_doc')
-            
-            # Format citation
-            if content_type == 'hyperlink':
-                link_text = metadata.get('link_text', metadata.get('source_url', 'Unknown'))
-                citation = CITATION_FORMAT_LINK.format(link_text=link_text)
-            elif section_number:
-                citation = CITATION_FORMAT_MAIN.format(section=section_number)
-                if section_path:
-                    citation += f" ({section_path})"
-            else:
-                citation = f"[{section_path}]" if section_path else "[Unknown]"
-            
+            citation = chunk_citation(chunk.get('metadata', {}))
             prompt_parts.append(f"\n[{i}] {citation}\n{content}\n")
         
         prompt_parts.append("=" * 80)
@@ -166,18 +327,446 @@ def format_citations(response_text: str, chunks: List[Dict]) -> str:
     return text
 
 
+class StreamingCitationFormatter:
+    """
+    Apply format_citations incrementally to streamed text.
+    
+    format_citations only inserts spaces at digit/letter boundaries, so each
+    decision depends on a pair of adjacent characters. The formatter holds back
+    the last character of each chunk until the next one arrives, which makes
+    the concatenated output identical to formatting the full response at once.
+    """
+    
+    def __init__(self, chunks: Optional[List[Dict]] = None):
+        self.chunks = chunks or []
+        self._previous = ''  # Last character already emitted (left context)
+        self._pending = ''  # Held-back character awaiting its right neighbour
+    
+    def feed(self, text: str) -> str:
+        """Format a new piece of streamed text and return what can be emitted now."""
+        if not text:
+            return ''
+        segment = self._previous + self._pending + text
+        formatted = format_citations(segment[:-1], self.chunks)
+        emitted = formatted[len(self._previous):]
+        self._previous = segment[-2] if len(segment) > 1 else ''
+        self._pending = segment[-1]
+        return emitted
+    
+    def flush(self) -> str:
+        """Emit the held-back character at the end of the stream."""
+        formatted = format_citations(self._previous + self._pending, self.chunks)
+        emitted = formatted[len(self._previous):]
+        self._previous = ''
+        self._pending = ''
+        return emitted
+
+
+class FakeGenerativeModel:
+    """
+    Offline stand-in for genai.GenerativeModel.
+    
+    Returns a canned response, optionally split into chunks with a delay per
+    chunk so streaming and latency behaviour can be exercised without an API key.
+    """
+    
+    def __init__(self, response_text: str = "Kaiser Permanente's 2026 strategy rests on five pillars [Section 7.2].",
+                 chunk_size: int = 8, delay: float = 0.0):
+        self.response_text = response_text
+        self.chunk_size = chunk_size
+        self.delay = delay
+    
+    def generate_content(self, prompt, generation_config=None, stream: bool = False):
+        if not stream:
+            time.sleep(self.delay)
+            return SimpleNamespace(text=self.response_text)
+        return self._stream()
+    
+    async def generate_content_async(self, prompt, generation_config=None, stream: bool = False):
+        if not stream:
+            await asyncio.sleep(self.delay)
+            return SimpleNamespace(text=self.response_text)
+        return self._astream()
+    
+    def _stream(self):
+        for i in range(0, len(self.response_text), self.chunk_size):
+            time.sleep(self.delay)
+            yield SimpleNamespace(text=self.response_text[i:i + self.chunk_size])
+    
+    async def _astream(self):
+        for i in range(0, len(self.response_text), self.chunk_size):
+            await asyncio.sleep(self.delay)
+            yield SimpleNamespace(text=self.response_text[i:i + self.chunk_size])
+
+
+def extract_sources(retrieved_chunks: List[Dict]) -> List[Dict]:
+    """
+    Build the source citation list shown under an answer.
+    
+    Args:
+        retrieved_chunks: Chunks used to build the prompt
+        
+    Returns:
+        List of source dictionaries ('section' or 'link' type)
+    """
+    sources = []
+    for chunk in retrieved_chunks:
+        metadata = chunk.get('metadata', {})
+        if metadata.get('content_type') == 'hyperlink':
+            source = {
+                'type': 'link',
+                'text': metadata.get('link_text', ''),
+                'url': metadata.get('source_url', '')
+            }
+            page_start, page_end = metadata.get('page_start'), metadata.get('page_end')
+            if page_start:
+                source['pages'] = page_start if page_start == page_end else f"{page_start}-{page_end}"
+            # Several sub-chunks of one page can be retrieved; list the passage once
+            if source not in sources:
+                sources.append(source)
+        else:
+            sources.append({
+                'type': 'section',
+                'section': metadata.get('section_number', ''),
+                'path': metadata.get('section_path', '')
+            })
+    return sources
+
+
+async def _aget_model(model=None):
+    """Return the given model, or the shared Gemini model handle from the client registry."""
+    if model is not None:
+        return model
+    return await asyncio.to_thread(get_generative_model, GEMINI_MODEL)
+
+
+async def _aprepare_rag_query(user_query: str,
+                              collection,
+                              user_role: Optional[str],
+                              top_k: int,
+                              response_style: str,
+                              query_cache,
+                              answer_cache,
+                              model=None,
+                              lexical_index=None,
+                              section_tree=None,
+                              role_guidance=None,
+                              faq_catalogue=None,
+                              table_store=None) -> Dict:
+    """
+    Run every step of a RAG query up to (but not including) generation.
+    The query embedding and the model handle are prepared concurrently.
+    Advice queries that clearly name a role are answered from the precomputed
+    Section 8.3 guidance without an embedding call or vector search.
+    
+    Returns:
+        Dictionary with either 'result' (a finished answer: cache hit or no
+        context found) or everything needed to call the model: 'model',
+        'prompt', 'generation_config', 'retrieved_chunks' and cache bookkeeping.
+    """
+    # Detect role (not used for filtering; selects precomputed role guidance)
+    detected_role = detect_role_from_query(user_query, user_role)
+    
+    # Detect if user is asking for advice vs information
+    is_advice = is_advice_request(user_query)
+    query_type = "advice" if is_advice else "information"
+    logger.info(f"Query type: {query_type}, Role: {detected_role}")
+    
+    # Section 8.3 guidance for a confidently detected role comes from a direct lookup
+    role_mode, guidance_chunk = None, None
+    if role_guidance is not None:
+        role_mode = role_lookup_mode(user_query, detected_role, user_role, is_advice,
+                                     ROLE_GUIDANCE_MIN_CONFIDENCE)
+        guidance_chunk = role_guidance.lookup(detected_role) if role_mode else None
+        if guidance_chunk is None:
+            role_mode = None
+        else:
+            logger.info(f"Role guidance lookup ({role_mode}) for role: {detected_role}")
+    
+    token_budget = CONTEXT_TOKEN_BUDGETS.get(response_style.lower(), CONTEXT_TOKEN_BUDGETS['detailed'])
+    
+    # Value lookups answered by a single table row need no retrieval or model call
+    table_matches, table_match = [], None
+    if table_store is not None and role_mode != 'direct':
+        table_matches = table_store.lookup(user_query)
+        if not is_advice and role_mode is None:
+            table_match = table_store.direct_match(user_query, table_matches)
+    if table_match is not None:
+        metadata = table_store.metadata(table_match['table'])
+        logger.info(f"Table lookup answered from: {metadata['section_path']}")
+        citation = (CITATION_FORMAT_MAIN.format(section=metadata['section_number'])
+                    if metadata['section_number'] else f"[{metadata['section_path']}]")
+        return {'result': {
+            'response': (f"{table_store.format_row(table_match['table'], table_match['row'], table_match['columns'])} "
+                         f"{citation}"),
+            'sources': extract_sources([{'metadata': metadata}]),
+            'role_detected': detected_role,
+            'cached': False,
+            'table_lookup': 'direct',
+            'token_usage': _empty_token_usage(token_budget)
+        }}
+    
+    lexical_result = None
+    if role_mode == 'direct':
+        query_embedding, model = None, await _aget_model(model)
+    else:
+        # Exact figures and section numbers that match strongly in the lexical
+        # index are answered from it without the remote embedding call
+        lexical_result = lexical_index.search(user_query, top_k * 2) if lexical_index is not None else None
+        if lexical_result and lexical_result['strong']:
+            query_embedding, model = None, await _aget_model(model)
+        else:
+            # Embed once (the same vector drives the answer cache and retrieval),
+            # warming the model handle while the embedding request is in flight
+            query_embedding, model = await asyncio.gather(
+                aembed_query(user_query, query_cache),
+                _aget_model(model)
+            )
+    
+    index_version = read_index_version()
+    
+    # Canonical questions are answered from the precomputed FAQ catalogue
+    if faq_catalogue is not None and query_embedding is not None and role_mode is None:
+        served = faq_catalogue.match(query_embedding, response_style, is_advice, index_version)
+        if served is not None:
+            logger.info(f"FAQ catalogue hit (similarity {served['similarity']:.3f}): {served['catalogue_question']}")
+            served['cached'] = True
+            served['catalogue'] = True
+            served['token_usage'] = _empty_token_usage(token_budget)
+            return {'result': served}
+    
+    # Serve semantically equivalent questions from the answer cache (role-specific
+    # answers are not cached, since the cache key does not include the role)
+    if answer_cache is not None and query_embedding is not None and role_mode is None:
+        cached = answer_cache.get(query_embedding, response_style, is_advice, index_version)
+        if cached is not None:
+            logger.info(f"Answer cache hit (similarity {cached['similarity']:.3f})")
+            cached['cached'] = True
+            cached['token_usage'] = _empty_token_usage(token_budget)
+            return {'result': cached}
+    
+    # Query vector store (no role filtering - provide general information/advice)
+    # The guidance takes one of the top_k slots when it is added to the search
+    search_k = max(top_k - 1, 1) if role_mode == 'narrow' else top_k
+    # Over-fetch candidates and let MMR pick a diverse top_k from them
+    reranker = MMRReranker(collection, query_embedding, search_k) if RERANK_ENABLED else None
+    candidate_k = search_k * RERANK_CANDIDATE_MULTIPLIER if reranker is not None else search_k
+    if role_mode == 'direct':
+        retrieved_chunks = [guidance_chunk]
+    elif section_tree is not None:
+        retrieved_chunks = await ahierarchical_query(
+            collection, section_tree, user_query, candidate_k, token_budget,
+            query_cache=query_cache,
+            query_embedding=query_embedding,
+            lexical_result=lexical_result,
+            rerank=reranker
+        )
+    else:
+        retrieved_chunks = await aquery_collection(
+            collection=collection,
+            query_text=user_query,
+            top_k=candidate_k,
+            role_filter=None,  # No role filtering - general approach
+            query_cache=query_cache,
+            query_embedding=query_embedding,
+            lexical_index=lexical_index,
+            lexical_result=lexical_result
+        )
+        if reranker is not None:
+            retrieved_chunks = await asyncio.to_thread(reranker, retrieved_chunks)
+    rerank_stats = reranker.stats if reranker is not None and reranker.stats else None
+    if role_mode == 'narrow':
+        # The guidance already holds the role's subsection text
+        retrieved_chunks = [guidance_chunk] + [
+            chunk for chunk in retrieved_chunks
+            if chunk['metadata'].get('role_context') != detected_role
+        ]
+    
+    # Only rows the query names replace their tables; loosely matched tables stay whole
+    table_matches = table_store.strong_matches(table_matches) if table_matches else []
+    if table_matches:
+        # Send the matching rows once instead of the whole tables inside the chunks
+        matched_tables = {table_store.tables[match['table']]['id'] for match in table_matches}
+        retrieved_chunks = table_store.row_chunks(table_matches) + [
+            table_store.compact_chunk(chunk, matched_tables) for chunk in retrieved_chunks
+        ]
+    
+    if not retrieved_chunks:
+        return {'result': {
+            'response': "I couldn't find relevant information in the strategy documents to answer your question. "
+                       "Please try rephrasing your query or asking about a different topic.",
+            'sources': [],
+            'role_detected': detected_role,
+            'token_usage': _empty_token_usage(token_budget)
+        }}
+    
+    # Fit the retrieved context into the style's token budget
+    retrieved_chunks, token_usage = pack_context(user_query, retrieved_chunks, token_budget)
+    if token_usage['chunks_trimmed'] or token_usage['chunks_dropped']:
+        logger.info(f"Packed context {token_usage['context_tokens_before']} -> {token_usage['context_tokens']} tokens "
+                    f"({token_usage['chunks_trimmed']} trimmed, {token_usage['chunks_dropped']} dropped)")
+    
+    # Build prompt with advice/information mode
+    prompt = build_rag_prompt(user_query, retrieved_chunks, detected_role, is_advice=is_advice)
+
+    # Optionally constrain length for concise answers
+    if response_style.lower() == "concise":
+        prompt += (
+            "\n\nPlease keep your answer concise: no more than about 200 words and "
+            "at most 3–5 bullet points."
+        )
+    
+    # Configure generation
+    # Adjust max output tokens based on desired style
+    max_tokens = 1024 if response_style.lower() == "concise" else 4096
+
+    generation_config = {
+        'temperature': 0.3,  # Lower temperature for more factual responses
+        'top_p': 0.95,
+        'top_k': 40,
+        'max_output_tokens': max_tokens,
+    }
+    
+    return {
+        'result': None,
+        'model': model,
+        'prompt': prompt,
+        'generation_config': generation_config,
+        'retrieved_chunks': retrieved_chunks,
+        'detected_role': detected_role,
+        'is_advice': is_advice,
+        'query_embedding': query_embedding,
+        'index_version': index_version,
+        'token_usage': token_usage,
+        'role_lookup': role_mode,
+        'table_lookup': 'rows' if table_matches else None,
+        'rerank': rerank_stats
+    }
+
+
+def _empty_token_usage(token_budget: int) -> Dict:
+    """Token usage for an answer that needed no model call (cache hit or no context)."""
+    return {
+        'context_budget': token_budget,
+        'context_tokens_before': 0,
+        'context_tokens': 0,
+        'chunks_trimmed': 0,
+        'chunks_dropped': 0,
+        'prompt_tokens': 0,
+        'output_tokens': 0,
+        'estimated': False
+    }
+
+
+def _finish_rag_query(prepared: Dict, formatted_response: str, response_style: str, answer_cache,
+                      usage_metadata=None) -> Dict:
+    """Assemble the final result for a generated answer and store it in the answer cache."""
+    # Prefer Gemini's reported counts; fall back to estimates (e.g. for fake models)
+    token_usage = dict(prepared['token_usage'])
+    prompt_tokens = getattr(usage_metadata, 'prompt_token_count', None)
+    output_tokens = getattr(usage_metadata, 'candidates_token_count', None)
+    token_usage['estimated'] = not prompt_tokens
+    token_usage['prompt_tokens'] = prompt_tokens or estimate_tokens(prepared['prompt'])
+    token_usage['output_tokens'] = output_tokens or estimate_tokens(formatted_response)
+    
+    result = {
+        'response': formatted_response,
+        'sources': extract_sources(prepared['retrieved_chunks']),
+        'role_detected': prepared['detected_role'],
+        'role_lookup': prepared['role_lookup'],
+        'table_lookup': prepared['table_lookup'],
+        'rerank': prepared['rerank'],
+        'token_usage': token_usage
+    }
+    
+    if answer_cache is not None and prepared['query_embedding'] is not None and prepared['role_lookup'] is None:
+        answer_cache.put(prepared['query_embedding'], response_style, prepared['is_advice'],
+                         result, prepared['index_version'])
+    
+    result['cached'] = False
+    return result
+
+
+async def aquery_rag(user_query: str,
+                     collection,
+                     user_role: Optional[str] = None,
+                     top_k: int = 7,
+                     response_style: str = "Detailed",
+                     query_cache=None,
+                     answer_cache=None,
+                     model=None,
+                     lexical_index=None,
+                     section_tree=None,
+                     role_guidance=None,
+                     faq_catalogue=None,
+                     table_store=None) -> Dict:
+    """
+    Async RAG query function.
+    
+    Overlaps the query embedding with model warm-up, awaits Gemini without
+    holding a thread, and can be cancelled (asyncio.CancelledError propagates).
+    Arguments and return value match query_rag.
+    """
+    try:
+        prepared = await _aprepare_rag_query(user_query, collection, user_role, top_k,
+                                             response_style, query_cache, answer_cache, model, lexical_index,
+                                             section_tree, role_guidance, faq_catalogue, table_store)
+        if prepared['result'] is not None:
+            return prepared['result']
+        
+        # Call Gemini
+        logger.info(f"Calling Gemini model: {GEMINI_MODEL}")
+        model = prepared['model']
+        if hasattr(model, 'generate_content_async'):
+            response = await model.generate_content_async(
+                prepared['prompt'],
+                generation_config=prepared['generation_config']
+            )
+        else:
+            response = await asyncio.to_thread(
+                model.generate_content,
+                prepared['prompt'],
+                generation_config=prepared['generation_config']
+            )
+        
+        response_text = response.text
+        
+        # Format citations
+        formatted_response = format_citations(response_text, prepared['retrieved_chunks'])
+        
+        return _finish_rag_query(prepared, formatted_response, response_style, answer_cache,
+                                 getattr(response, 'usage_metadata', None))
+        
+    except asyncio.CancelledError:
+        logger.info("RAG query cancelled")
+        raise
+    except Exception as e:
+        logger.error(f"Error in RAG query: {e}")
+        return {
+            'response': f"I encountered an error while processing your query: {str(e)}. Please try again.",
+            'sources': [],
+            'role_detected': None
+        }
+
+
 def query_rag(user_query: str, 
               collection, 
               user_role: Optional[str] = None, 
               top_k: int = 7,
-              response_style: str = "Detailed") -> Dict:
-    """
-    Main RAG query function.
-    Note: user_role parameter is kept for API compatibility but not used for filtering.
-    Advice is now general and not role-specific.
-    """
+              response_style: str = "Detailed",
+              query_cache=None,
+              answer_cache=None,
+              model=None,
+              lexical_index=None,
+              section_tree=None,
+              role_guidance=None,
+              faq_catalogue=None,
+              table_store=None) -> Dict:
     """
     Main RAG query function.
+    Thin sync wrapper around aquery_rag.
+    Note: user_role is not used for filtering. It only lets advice requests
+    include the selected role's Section 8.3 guidance (see role_guidance).
     
     Args:
         user_query: User's question
@@ -185,101 +774,247 @@ def query_rag(user_query: str,
         user_role: Optional user role
         top_k: Number of chunks to retrieve
         response_style: Controls answer length / level of detail ("Concise" or "Detailed")
+        query_cache: Optional shared QueryEmbeddingCache for query embeddings
+        answer_cache: Optional shared SemanticAnswerCache for generated answers
+        model: Optional generative model (defaults to GEMINI_MODEL; use
+               FakeGenerativeModel to run offline)
+        lexical_index: Optional LexicalIndex for hybrid BM25 + vector retrieval
+        section_tree: Optional SectionTree; enables hierarchical retrieval (leaf
+                      sections first, expanded to parents/siblings within the budget)
+        role_guidance: Optional RoleGuidanceIndex; a confidently detected role's
+                       Section 8.3 guidance is looked up directly instead of searched
+        faq_catalogue: Optional FAQCatalogue; close matches to its canonical
+                       questions are served without retrieval or a model call
+        table_store: Optional TableStore; value lookups are answered from a
+                     single table row, other queries get matching rows
+                     instead of whole tables
         
     Returns:
         Dictionary with:
         - response: LLM response text
         - sources: List of source citations
         - role_detected: Detected or provided role
+        - cached: True if the answer was served from the answer cache or FAQ catalogue
+        - catalogue: True if the answer came from the FAQ catalogue (with
+          'catalogue_question', the matched canonical question)
+        - role_lookup: 'direct' (guidance only, no search), 'narrow' (guidance
+          plus a smaller search) or None
+        - table_lookup: 'direct' (answered from one table row, no model call),
+          'rows' (matching table rows added to the prompt) or None
+        - rerank: MMR re-ranking stats (candidates, selected, duplicates,
+          section_capped, dropped, latency_ms) or None when it did not run
+        - token_usage: Context budget and packing stats plus prompt/output token
+          counts (0 when no model call was made; 'estimated' marks approximations)
     """
-    try:
-        # Detect role (for logging only, not used for filtering)
-        detected_role = detect_role_from_query(user_query, user_role)
-        
-        # Detect if user is asking for advice vs information
-        is_advice = is_advice_request(user_query)
-        query_type = "advice" if is_advice else "information"
-        logger.info(f"Query type: {query_type}, Role: {detected_role}")
-        
-        # Query vector store (no role filtering - provide general information/advice)
-        retrieved_chunks = query_collection(
-            collection=collection,
-            query_text=user_query,
-            top_k=top_k,
-            role_filter=None  # No role filtering - general approach
-        )
-        
-        if not retrieved_chunks:
-            return {
-                'response': "I couldn't find relevant information in the strategy documents to answer your question. "
-                           "Please try rephrasing your query or asking about a different topic.",
-                'sources': [],
-                'role_detected': detected_role
-            }
-        
-        # Build prompt with advice/information mode
-        prompt = build_rag_prompt(user_query, retrieved_chunks, detected_role, is_advice=is_advice)
-
-        # Optionally constrain length for concise answers
-        if response_style.lower() == "concise":
-            prompt += (
-                "\n\nPlease keep your answer concise: no more than about 200 words and "
-                "at most 3–5 bullet points."
-            )
-        
-        # Call Gemini
-        logger.info(f"Calling Gemini model: {GEMINI_MODEL}")
-        model = genai.GenerativeModel(GEMINI_MODEL)
-        
-        # Configure generation
-        # Adjust max output tokens based on desired style
-        max_tokens = 1024 if response_style.lower() == "concise" else 4096
-
-        generation_config = {
-            'temperature': 0.3,  # Lower temperature for more factual responses
-            'top_p': 0.95,
-            'top_k': 40,
-            'max_output_tokens': max_tokens,
-        }
+    return run_sync(aquery_rag(user_query, collection, user_role, top_k,
+                               response_style, query_cache, answer_cache, model, lexical_index,
+                               section_tree, role_guidance, faq_catalogue, table_store))
+
+
+def submit_query_rag(user_query: str, collection, **kwargs) -> concurrent.futures.Future:
+    """
+    Start aquery_rag on the background event loop without blocking.
+    
+    Args:
+        user_query: User's question
+        collection: ChromaDB collection
+        **kwargs: Any other aquery_rag arguments
         
-        response = model.generate_content(
-            prompt,
-            generation_config=generation_config
-        )
+    Returns:
+        Future for the result dictionary; cancel() aborts the in-flight query
+        (e.g. when the user sends a new message)
+    """
+    return submit(aquery_rag(user_query, collection, **kwargs))
+
+
+async def _agenerate_stream(model, prompt: str, generation_config) -> Tuple[object, AsyncIterator]:
+    """
+    Start a streaming generation.
+    
+    Returns:
+        Tuple of (response, async iterator over its chunks); models without
+        generate_content_async are iterated on a worker thread
+    """
+    if hasattr(model, 'generate_content_async'):
+        response = await model.generate_content_async(prompt, generation_config=generation_config, stream=True)
+        return response, response.__aiter__()
+    
+    response = await asyncio.to_thread(model.generate_content, prompt,
+                                       generation_config=generation_config, stream=True)
+    iterator = iter(response)
+    
+    async def chunks():
+        while True:
+            chunk = await asyncio.to_thread(next, iterator, None)
+            if chunk is None:
+                return
+            yield chunk
+    
+    return response, chunks()
+
+
+async def aquery_rag_stream(user_query: str,
+                            collection,
+                            user_role: Optional[str] = None,
+                            top_k: int = 7,
+                            response_style: str = "Detailed",
+                            query_cache=None,
+                            answer_cache=None,
+                            model=None,
+                            lexical_index=None,
+                            section_tree=None,
+                            role_guidance=None,
+                            faq_catalogue=None,
+                            table_store=None) -> AsyncIterator[Dict]:
+    """
+    Async streaming variant of query_rag.
+    
+    Yields events as the answer is generated:
+    - {'type': 'text', 'text': ...}: next piece of citation-formatted response text
+    - {'type': 'final', ...}: the same dictionary query_rag returns (full response,
+      sources, role_detected, cached)
+    
+    Cache hits and "no context" answers are yielded as a single text event
+    followed by the final event. Gemini is streamed without holding a thread,
+    and cancelling the consuming task aborts the query. Arguments match query_rag.
+    """
+    try:
+        prepared = await _aprepare_rag_query(user_query, collection, user_role, top_k,
+                                             response_style, query_cache, answer_cache, model, lexical_index,
+                                             section_tree, role_guidance, faq_catalogue, table_store)
+        if prepared['result'] is not None:
+            yield {'type': 'text', 'text': prepared['result']['response']}
+            yield {'type': 'final', **prepared['result']}
+            return
         
-        response_text = response.text
+        # Call Gemini with streaming enabled
+        logger.info(f"Calling Gemini model (streaming): {GEMINI_MODEL}")
+        response, chunks = await _agenerate_stream(prepared['model'], prepared['prompt'],
+                                                   prepared['generation_config'])
         
-        # Format citations
-        formatted_response = format_citations(response_text, retrieved_chunks)
+        formatter = StreamingCitationFormatter(prepared['retrieved_chunks'])
+        response_parts = []
+        async for chunk in chunks:
+            text = formatter.feed(getattr(chunk, 'text', '') or '')
+            if text:
+                response_parts.append(text)
+                yield {'type': 'text', 'text': text}
         
-        # Extract sources
-        sources = []
-        for chunk in retrieved_chunks:
-            metadata = chunk.get('metadata', {})
-            if metadata.get('content_type') == 'hyperlink':
-                sources.append({
-                    'type': 'link',
-                    'text': metadata.get('link_text', ''),
-                    'url': metadata.get('source_url', '')
-                })
-            else:
-                sources.append({
-                    'type': 'section',
-                    'section': metadata.get('section_number', ''),
-                    'path': metadata.get('section_path', '')
-                })
+        tail = formatter.flush()
+        if tail:
+            response_parts.append(tail)
+            yield {'type': 'text', 'text': tail}
         
-        return {
-            'response': formatted_response,
-            'sources': sources,
-            'role_detected': detected_role
-        }
+        result = _finish_rag_query(prepared, ''.join(response_parts), response_style, answer_cache,
+                                   getattr(response, 'usage_metadata', None))
+        yield {'type': 'final', **result}
         
+    except asyncio.CancelledError:
+        logger.info("Streaming RAG query cancelled")
+        raise
     except Exception as e:
-        logger.error(f"Error in RAG query: {e}")
-        return {
-            'response': f"I encountered an error while processing your query: {str(e)}. Please try again.",
+        logger.error(f"Error in streaming RAG query: {e}")
+        error_message = f"I encountered an error while processing your query: {str(e)}. Please try again."
+        yield {'type': 'text', 'text': error_message}
+        yield {
+            'type': 'final',
+            'response': error_message,
             'sources': [],
             'role_detected': None
         }
 
+
+class StreamingQuery:
+    """
+    Handle on a streaming query running on the background event loop.
+    
+    Events are read from the calling thread with events(); cancel() aborts
+    the query (e.g. when the user sends a new message).
+    """
+    
+    _DONE = object()
+    
+    def __init__(self, events: AsyncIterator[Dict]):
+        """
+        Args:
+            events: Async event iterator (aquery_rag_stream)
+        """
+        self._queue: "queue.Queue" = queue.Queue()
+        self.future = submit(self._pump(events))
+    
+    async def _pump(self, events: AsyncIterator[Dict]):
+        try:
+            async for event in events:
+                self._queue.put(event)
+        finally:
+            self._queue.put(self._DONE)
+    
+    def events(self, heartbeat: Optional[float] = None) -> Iterator[Dict]:
+        """
+        Iterate over the query's events until it finishes or is cancelled.
+        
+        Args:
+            heartbeat: If set, yield {'type': 'waiting'} after this many seconds
+                       without an event (lets the caller stay responsive)
+        """
+        while True:
+            try:
+                event = self._queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield {'type': 'waiting'}
+                continue
+            if event is self._DONE:
+                return
+            yield event
+    
+    def cancel(self) -> bool:
+        """Cancel the query; returns False if it already finished."""
+        return self.future.cancel()
+    
+    def done(self) -> bool:
+        return self.future.done()
+
+
+def submit_query_rag_stream(user_query: str, collection, **kwargs) -> StreamingQuery:
+    """
+    Start aquery_rag_stream on the background event loop without blocking.
+    
+    Args:
+        user_query: User's question
+        collection: ChromaDB collection
+        **kwargs: Any other aquery_rag_stream arguments
+        
+    Returns:
+        StreamingQuery handle (events() to read, cancel() to abort)
+    """
+    return StreamingQuery(aquery_rag_stream(user_query, collection, **kwargs))
+
+
+def query_rag_stream(user_query: str,
+                     collection,
+                     user_role: Optional[str] = None,
+                     top_k: int = 7,
+                     response_style: str = "Detailed",
+                     query_cache=None,
+                     answer_cache=None,
+                     model=None,
+                     lexical_index=None,
+                     section_tree=None,
+                     role_guidance=None,
+                     faq_catalogue=None,
+                     table_store=None) -> Iterator[Dict]:
+    """
+    Streaming variant of query_rag.
+    Thin sync wrapper around aquery_rag_stream; closing the iterator early
+    cancels the query. Events and arguments match aquery_rag_stream.
+    """
+    streaming_query = submit_query_rag_stream(
+        user_query, collection, user_role=user_role, top_k=top_k, response_style=response_style,
+        query_cache=query_cache, answer_cache=answer_cache, model=model, lexical_index=lexical_index,
+        section_tree=section_tree, role_guidance=role_guidance, faq_catalogue=faq_catalogue,
+        table_store=table_store
+    )
+    try:
+        yield from streaming_query.events()
+    finally:
+        streaming_query.cancel()
@@ -0,0 +1,150 @@
+"""
+Local re-ranking of retrieved chunks.
+Applies maximal marginal relevance (MMR) over the embeddings already stored in
+the vector store, so neighbouring sections that say nearly the same thing do
+not crowd out other relevant context. Runs on CPU with NumPy; no model calls.
+"""
+import logging
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import (
+    MMR_LAMBDA,
+    RERANK_MAX_PER_SECTION,
+    RERANK_SECTION_DEPTH
+)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _dedupe_key(metadata: Dict) -> tuple:
+    """Chunks with the same key are duplicates (hyperlink windows of one page are distinct)."""
+    return (metadata.get('section_path', ''), metadata.get('chunk_index', ''))
+
+
+def section_group(metadata: Dict, depth: int = RERANK_SECTION_DEPTH) -> str:
+    """
+    Section a chunk counts against for the per-section cap.
+    
+    Args:
+        metadata: Chunk metadata
+        depth: Number of leading section_path components that identify a section
+    
+    Returns:
+        The source URL for hyperlink chunks, otherwise the truncated section path
+    """
+    if metadata.get('content_type') == 'hyperlink':
+        return metadata.get('source_url', '')
+    return ' > '.join(metadata.get('section_path', '').split(' > ')[:depth])
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class MMRReranker:
+    """
+    Re-rank retrieved chunks with MMR, deduplication and a per-section cap.
+    
+    Callable on a candidate list (best first); the stats of the last call are
+    kept in ``stats``: candidates, selected, duplicates, section_capped,
+    dropped (candidates not selected) and latency_ms.
+    """
+    
+    def __init__(self, collection, query_embedding: Optional[List[float]], top_k: int,
+                 lambda_mult: float = MMR_LAMBDA, max_per_section: int = RERANK_MAX_PER_SECTION):
+        """
+        Args:
+            collection: Vector store collection holding the candidates' embeddings
+            query_embedding: Query vector (None, e.g. after a strong lexical
+                             match, ranks candidates by their retrieval order)
+            top_k: Number of chunks to keep
+            lambda_mult: Relevance weight (1.0 = relevance only, 0.0 = diversity only)
+            max_per_section: Maximum chunks kept from one section group
+        """
+        self.collection = collection
+        self.query_embedding = query_embedding
+        self.top_k = top_k
+        self.lambda_mult = lambda_mult
+        self.max_per_section = max_per_section
+        self.stats = {}
+    
+    def _embeddings(self, chunks: List[Dict]) -> np.ndarray:
+        """Stored embeddings for the chunks (zero rows for chunks not in the collection)."""
+        ids = [chunk.get('id') for chunk in chunks]
+        stored = self.collection.get(ids=[i for i in ids if i], include=['embeddings'])
+        vectors = {chunk_id: vector for chunk_id, vector in zip(stored['ids'], stored['embeddings'])}
+        dimension = len(next(iter(vectors.values()))) if vectors else 1
+        matrix = np.zeros((len(chunks), dimension), dtype=np.float32)
+        for row, chunk_id in enumerate(ids):
+            if chunk_id in vectors:
+                matrix[row] = vectors[chunk_id]
+        return _normalize_rows(matrix)
+    
+    def __call__(self, chunks: List[Dict]) -> List[Dict]:
+        """
+        Select up to top_k chunks.
+        
+        Args:
+            chunks: Retrieved candidates in rank order (with 'id' and 'metadata')
+        
+        Returns:
+            Selected chunks in MMR order
+        """
+        start = time.perf_counter()
+        
+        # Duplicate sections keep their best-ranked chunk
+        seen = set()
+        candidates = []
+        for chunk in chunks:
+            key = _dedupe_key(chunk.get('metadata', {}))
+            if key not in seen:
+                seen.add(key)
+                candidates.append(chunk)
+        duplicates = len(chunks) - len(candidates)
+        
+        selected: List[int] = []
+        section_capped = 0
+        if candidates:
+            embeddings = self._embeddings(candidates)
+            if self.query_embedding is not None:
+                query = np.asarray(self.query_embedding, dtype=np.float32)
+                relevance = embeddings @ (query / max(float(np.linalg.norm(query)), 1e-9))
+            else:
+                relevance = 1.0 - np.arange(len(candidates), dtype=np.float32) / len(candidates)
+            
+            groups = [section_group(chunk.get('metadata', {})) for chunk in candidates]
+            group_counts: Dict[str, int] = {}
+            # Highest similarity of each candidate to anything selected so far
+            redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+            available = np.ones(len(candidates), dtype=bool)
+            while len(selected) < self.top_k and available.any():
+                scores = self.lambda_mult * relevance - (1 - self.lambda_mult) * np.maximum(redundancy, 0.0)
+                scores[~available] = -np.inf
+                best = int(np.argmax(scores))
+                available[best] = False
+                if group_counts.get(groups[best], 0) >= self.max_per_section:
+                    section_capped += 1
+                    continue
+                group_counts[groups[best]] = group_counts.get(groups[best], 0) + 1
+                selected.append(best)
+                redundancy = np.maximum(redundancy, embeddings @ embeddings[best])
+        
+        self.stats = {
+            'candidates': len(chunks),
+            'selected': len(selected),
+            'duplicates': duplicates,
+            'section_capped': section_capped,
+            'dropped': len(chunks) - len(selected),
+            'latency_ms': (time.perf_counter() - start) * 1000
+        }
+        logger.info(f"Re-ranked {len(chunks)} candidates -> {len(selected)} "
+                    f"({duplicates} duplicates, {section_capped} over the section cap) "
+                    f"in {self.stats['latency_ms']:.1f}ms")
+        return [candidates[i] for i in selected]
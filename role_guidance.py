@@ -0,0 +1,339 @@
+"""
+Precomputed role guidance from Section 8.3.
+Ingestion extracts each role's call-to-action subsection straight from the
+source markdown and saves it as JSON. Several 8.3 subsection headers are blank
+in output.md, so the header chunks do not line up with the roles; reading the
+subsection titles from ROLE_MAPPINGS avoids depending on them. Queries whose
+role is detected with high confidence get this text by direct lookup instead
+of a role-filtered vector search.
+"""
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Optional
+
+from config import ROLE_MAPPINGS, ROLE_GUIDANCE_SECTION, ROLE_GUIDANCE_PATH
+from document_processor import SectionIndex
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _keyword_pattern(keyword: str) -> re.Pattern:
+    return re.compile(r'\b' + re.escape(keyword) + r'(?:s|es)?\b')
+
+
+# Whole-word keyword patterns with their subsection, longest keyword first so
+# "board of directors" is not also read as "director" (substring matches such
+# as "staff" in "staffing" are what normalize_role accepts, but not confident)
+_ROLE_KEYWORD_PATTERNS = [
+    (_keyword_pattern(keyword), subsection)
+    for keyword, subsection in sorted(
+        {(keyword, info['subsection']) for info in ROLE_MAPPINGS.values() for keyword in info['keywords']},
+        key=lambda item: (-len(item[0]), item[0])
+    )
+]
+
+# A role is only named explicitly when its keywords sit in a role phrase:
+# after "as", "for", a modal ("should the board ...") or "role of", or before
+# "perspective". Keywords used as modifiers ("executive summary", "clinical
+# quality", "leadership changes") do not count.
+_ROLE_WORD = '|'.join(sorted(
+    {re.escape(keyword) + '(?:s|es)?' for info in ROLE_MAPPINGS.values() for keyword in info['keywords']},
+    key=len, reverse=True
+))
+_ROLE_NOUN = r'members?|staff|teams?|leaders?|leadership|level|officers?|employees?|workers?|managers?|directors?|of directors'
+_ROLE_MENTION = rf'(?:{_ROLE_WORD})(?:[\s/&-]+(?:{_ROLE_WORD}|{_ROLE_NOUN})\b){{0,3}}'
+_ROLE_TRIGGER = (r"\b(?:as|for|to|from|and|or|should|would|could|can|do|does|must|will|"
+                 r"i am|i'm|we are|we're|(?:role|roles|responsibilities|duties) of)\s+(?:(?:a|an|the|our|my)\s+)?")
+_ROLE_PERSPECTIVE = r"(?:'s)?\s+(?:perspective|point of view|viewpoint|standpoint|lens|role|responsibilities|duties)\b"
+# What may follow a role named without a head noun ("for the board?", "as executive leadership, ...")
+_ROLE_BOUNDARY = (r'\s*(?:$|[?,.!;:)]|(?:to|do|does|should|need|needs|must|can|could|would|will|'
+                  r'in|on|about|regarding|and|or|with|at|during|now|today)\b)')
+_ROLE_PHRASE_PATTERN = re.compile(
+    rf'(?:{_ROLE_TRIGGER}(?P<object>{_ROLE_MENTION})(?P<perspective>{_ROLE_PERSPECTIVE})?)'
+    rf'|(?:\b(?P<subject>{_ROLE_MENTION}){_ROLE_PERSPECTIVE})'
+)
+_ROLE_BOUNDARY_PATTERN = re.compile(_ROLE_BOUNDARY)
+# Mentions ending in one of these name people, so any word may follow ("should a director support ...")
+_ROLE_HEAD_NOUNS = {
+    'ceo', 'ceos', 'c-suite', 'board', 'boards', 'director', 'directors', 'vp', 'vps', 'president', 'presidents',
+    'manager', 'managers', 'nurse', 'nurses', 'staff', 'employee', 'employees', 'executives',
+    'member', 'members', 'team', 'teams', 'leader', 'leaders', 'officer', 'officers', 'worker', 'workers'
+}
+
+
+def role_mentions(text: str) -> List[str]:
+    """
+    Find the phrases in which a piece of text names a role explicitly.
+    
+    Args:
+        text: Query text
+    
+    Returns:
+        Role phrases (e.g. 'board member', 'frontline staff'), in order
+    """
+    text_lower = text.lower()
+    mentions = []
+    for match in _ROLE_PHRASE_PATTERN.finditer(text_lower):
+        if match.group('subject'):
+            mentions.append(match.group('subject'))
+            continue
+        mention = match.group('object')
+        head = re.split(r'[\s/&]+', mention)[-1]
+        if (match.group('perspective') or head in _ROLE_HEAD_NOUNS
+                or _ROLE_BOUNDARY_PATTERN.match(text_lower, match.end('object'))):
+            mentions.append(mention)
+    return mentions
+
+
+def role_confidence(text: str, role: Optional[str]) -> float:
+    """
+    How clearly a piece of text refers to one role's Section 8.3 subsection.
+    
+    Only explicit role phrases count (see role_mentions). Roles that share a
+    subsection (e.g. 'ceo' and 'executive') count as one.
+    
+    Args:
+        text: Query text
+        role: Role key detected for the text
+    
+    Returns:
+        Share of role phrases that point at the role's subsection (0.0 when
+        the text names no role explicitly)
+    """
+    if not role or role not in ROLE_MAPPINGS:
+        return 0.0
+    
+    matches: Dict[str, int] = {}
+    for mention in role_mentions(text):
+        named = set()
+        for pattern, subsection in _ROLE_KEYWORD_PATTERNS:
+            mention, found = pattern.subn(' ', mention)
+            if found:
+                named.add(subsection)
+        for subsection in named:
+            matches[subsection] = matches.get(subsection, 0) + 1
+    
+    total = sum(matches.values())
+    if total == 0:
+        return 0.0
+    return matches.get(ROLE_MAPPINGS[role]['subsection'], 0) / total
+
+
+def role_lookup_mode(user_query: str,
+                     detected_role: Optional[str],
+                     selected_role: Optional[str],
+                     is_advice: bool,
+                     min_confidence: float) -> Optional[str]:
+    """
+    Decide how precomputed role guidance is used for a query.
+    
+    Args:
+        user_query: User query text
+        detected_role: Role from detect_role_from_query
+        selected_role: Role selected in the UI ('General' or None if unset)
+        is_advice: Whether the query asks for advice
+        min_confidence: Minimum role_confidence for the role named in the query
+    
+    Returns:
+        'direct' when an advice query names the role confidently (the guidance
+        alone is the context), 'narrow' when the guidance should be added to a
+        smaller vector search (an information query naming the role, or an
+        advice query from a role selected in the UI), or None
+    """
+    if detected_role is None:
+        return None
+    
+    if role_confidence(user_query, detected_role) >= min_confidence:
+        return 'direct' if is_advice else 'narrow'
+    # A role picked in the UI makes advice role-specific, but the question may
+    # be about anything, so the search still runs
+    if is_advice and selected_role and selected_role.lower() != 'general':
+        return 'narrow'
+    return None
+
+
+def extract_role_guidance(markdown_text: str, section_index: Optional[SectionIndex] = None) -> Dict[str, Dict]:
+    """
+    Extract each role's subsection of the role-guidance section.
+    
+    Args:
+        markdown_text: Full markdown content
+        section_index: SectionIndex of the text (built if not given)
+    
+    Returns:
+        Subsection title -> dictionary with content, section_path, line_start
+        and line_end (1-based, inclusive)
+    """
+    index = section_index or SectionIndex(markdown_text)
+    lines = index.lines
+    subsections = {info['subsection'].lower(): info['subsection'] for info in ROLE_MAPPINGS.values()}
+    
+    # The section runs to the next header at the same or a higher level
+    header = index.section(ROLE_GUIDANCE_SECTION)
+    if header is None:
+        logger.warning(f"Section {ROLE_GUIDANCE_SECTION} not found; no role guidance extracted")
+        return {}
+    section_start, section_end = header['line_start'] - 1, header['line_end']
+    section_title = header['title'].strip(' .-\\')
+    
+    # Subsection titles may sit on a header line or, under a blank header, on their own line
+    starts = []
+    for line_index in range(section_start + 1, section_end):
+        text = lines[line_index].strip().lstrip('#').strip().strip('*').strip()
+        if text.lower() in subsections:
+            starts.append((line_index, subsections[text.lower()]))
+    
+    guidance = {}
+    for position, (start, subsection) in enumerate(starts):
+        end = starts[position + 1][0] if position + 1 < len(starts) else section_end
+        body = [line for line in lines[start + 1:end] if line.strip() not in ('#', '##', '###')]
+        content = '\n'.join(body).strip()
+        last = end - 1
+        while last > start and not lines[last].strip().strip('#').strip():
+            last -= 1
+        guidance[subsection] = {
+            'content': f"### {subsection}\n\n{content}",
+            'section_path': f"{section_title} > {subsection}",
+            'line_start': start + 1,
+            'line_end': last + 1
+        }
+    return guidance
+
+
+class RoleGuidanceIndex:
+    """
+    Role key -> that role's Section 8.3 guidance, ready to use as a retrieved chunk.
+    """
+    
+    def __init__(self, subsections: Dict[str, Dict]):
+        """
+        Args:
+            subsections: Subsection title -> entry from extract_role_guidance
+        """
+        self.subsections = subsections
+        self._chunks = {}
+        for role, info in ROLE_MAPPINGS.items():
+            entry = subsections.get(info['subsection'])
+            if entry is None:
+                continue
+            self._chunks[role] = {
+                'id': f"role_guidance:{role}",
+                'content': entry['content'],
+                'metadata': {
+                    'content_type': 'main_doc',
+                    'section_number': ROLE_GUIDANCE_SECTION,
+                    'section_path': entry['section_path'],
+                    'header_text': info['subsection'],
+                    'line_start': str(entry['line_start']),
+                    'line_end': str(entry['line_end']),
+                    'role_context': role
+                },
+                'distance': None,
+                'role_guidance': True
+            }
+    
+    @classmethod
+    def build(cls, markdown_text: str, section_index: Optional[SectionIndex] = None) -> "RoleGuidanceIndex":
+        """Build the index from the source document (and its SectionIndex, if already built)."""
+        return cls(extract_role_guidance(markdown_text, section_index))
+    
+    def save(self, path: str = ROLE_GUIDANCE_PATH):
+        """Persist the extracted subsections as JSON."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'subsections': self.subsections}, f)
+        logger.info(f"Saved role guidance ({len(self.subsections)} subsections) to {path}")
+    
+    @classmethod
+    def load(cls, path: str = ROLE_GUIDANCE_PATH) -> Optional["RoleGuidanceIndex"]:
+        """
+        Load saved role guidance.
+        
+        Returns:
+            RoleGuidanceIndex, or None if it has not been built
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f)['subsections'])
+    
+    def split_chunks(self, chunks: List[Dict]) -> List[Dict]:
+        """
+        Split main-document chunks at the role subsections they contain.
+        
+        The blank 8.3 subsection headers in output.md do not end chunks, so one
+        chunk can hold several roles' guidance. Each subsection becomes its own
+        chunk (from the extracted text and line range) tagged with role_context;
+        text ahead of the first subsection stays in the original chunk.
+        
+        Args:
+            chunks: Chunks from chunk_by_headers, in document order
+        
+        Returns:
+            Chunks with the role subsections split out
+        """
+        # Roles sharing a subsection ('ceo', 'executive') tag it with the first key
+        roles = {}
+        for role, info in ROLE_MAPPINGS.items():
+            roles.setdefault(info['subsection'], role)
+        
+        result = []
+        for chunk in chunks:
+            line_start, line_end = chunk.get('line_start', 0), chunk.get('line_end', 0)
+            inside = sorted(
+                (entry['line_start'], subsection) for subsection, entry in self.subsections.items()
+                if line_start <= entry['line_start'] <= line_end
+            )
+            if not inside or chunk.get('content_type', 'main_doc') != 'main_doc':
+                result.append(chunk)
+                continue
+            
+            # Subsections are siblings of a chunk headed by one, children of any other
+            headed = chunk.get('header_text') in self.subsections
+            base_path = chunk['section_path'].rsplit(' > ', 1)[0] if headed else chunk['section_path']
+            level = chunk.get('level', 0) if headed else chunk.get('level', 0) + 1
+            
+            first_line = inside[0][0]
+            head = '\n'.join(chunk['content'].split('\n')[:first_line - line_start]).strip()
+            if head and head.strip('#').strip():
+                result.append({**chunk, 'content': head, 'line_end': first_line - 1})
+            for _, subsection in inside:
+                entry = self.subsections[subsection]
+                result.append({
+                    **chunk,
+                    'content': entry['content'],
+                    'section_path': f"{base_path} > {subsection}",
+                    'level': level,
+                    'header_text': subsection,
+                    'line_start': entry['line_start'],
+                    'line_end': entry['line_end'],
+                    'role_context': roles[subsection]
+                })
+        return result
+    
+    @property
+    def roles(self) -> List[str]:
+        """Roles with guidance available."""
+        return list(self._chunks)
+    
+    def lookup(self, role: Optional[str]) -> Optional[Dict]:
+        """
+        Get a role's guidance as a retrieved chunk.
+        
+        Args:
+            role: Normalized role key
+        
+        Returns:
+            Chunk dictionary (id, content, metadata, distance, role_guidance),
+            or None if there is no guidance for the role
+        """
+        chunk = self._chunks.get(role)
+        if chunk is None:
+            return None
+        return {**chunk, 'metadata': dict(chunk['metadata'])}
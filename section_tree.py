@@ -0,0 +1,249 @@
+"""
+Section tree for hierarchical retrieval.
+Built at ingestion time from the header levels recorded by chunk_by_headers.
+Retrieval searches the leaf sections first and then expands to parent and
+sibling sections while the context token budget allows.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+
+from config import SECTION_TREE_PATH
+from document_processor import estimate_tokens
+from vector_store import aquery_collection, build_chunk_ids
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LEAF_FILTER = {"is_leaf": "true"}
+
+
+class SectionTree:
+    """
+    Parent/child/sibling index over main-document chunks, keyed by chunk ID.
+    
+    Each node records its parent, children (in document order), level,
+    section number/path, line range and estimated token count.
+    """
+    
+    def __init__(self, nodes: Dict[str, Dict]):
+        """
+        Args:
+            nodes: Chunk ID -> node dictionary
+        """
+        self.nodes = nodes
+    
+    @classmethod
+    def build(cls, chunks: List[Dict], chunk_ids: Optional[List[str]] = None) -> "SectionTree":
+        """
+        Build the tree from chunks in document order.
+        
+        Args:
+            chunks: Main-document chunks from chunk_by_headers
+            chunk_ids: Their IDs (computed with build_chunk_ids if omitted)
+        
+        Returns:
+            SectionTree
+        """
+        if chunk_ids is None:
+            chunk_ids = build_chunk_ids(chunks)
+        
+        nodes: Dict[str, Dict] = {}
+        stack: List[str] = []
+        for chunk_id, chunk in zip(chunk_ids, chunks):
+            level = chunk.get('level', 0)
+            # The parent is the closest preceding chunk with a shallower header
+            while stack and nodes[stack[-1]]['level'] >= level:
+                stack.pop()
+            parent = stack[-1] if stack else None
+            
+            nodes[chunk_id] = {
+                'parent': parent,
+                'children': [],
+                'level': level,
+                'section_number': chunk.get('section_number'),
+                'section_path': chunk.get('section_path', ''),
+                'line_start': chunk.get('line_start', 0),
+                'line_end': chunk.get('line_end', 0),
+                'tokens': estimate_tokens(chunk.get('content', ''))
+            }
+            if parent is not None:
+                nodes[parent]['children'].append(chunk_id)
+            stack.append(chunk_id)
+        return cls(nodes)
+    
+    def save(self, path: str = SECTION_TREE_PATH):
+        """Persist the tree as JSON."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'nodes': self.nodes}, f)
+        logger.info(f"Saved section tree ({len(self.nodes)} sections) to {path}")
+    
+    @classmethod
+    def load(cls, path: str = SECTION_TREE_PATH) -> Optional["SectionTree"]:
+        """
+        Load a saved tree.
+        
+        Returns:
+            SectionTree, or None if no tree has been built
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f)['nodes'])
+    
+    def is_leaf(self, chunk_id: str) -> bool:
+        """Whether a chunk has no subsections (chunks outside the tree, e.g. hyperlinks, count as leaves)."""
+        node = self.nodes.get(chunk_id)
+        return node is None or not node['children']
+    
+    def siblings(self, chunk_id: str) -> List[str]:
+        """Previous and next sibling sections of a chunk (closest first)."""
+        node = self.nodes.get(chunk_id)
+        if node is None or node['parent'] is None:
+            return []
+        children = self.nodes[node['parent']]['children']
+        position = children.index(chunk_id)
+        return [children[i] for i in (position - 1, position + 1) if 0 <= i < len(children)]
+    
+    def expand(self, collection, hits: List[Dict], token_budget: int) -> List[Dict]:
+        """
+        Add parent and sibling sections around leaf hits within a token budget.
+        
+        Hits are kept in rank order while they fit (the best hit always is).
+        Then parents shared by the most hits are added. Each parent chunk holds
+        only its own introduction, since child sections are separate chunks.
+        Finally the neighbouring siblings of the best hits are added.
+        Expansions follow the hit that triggered them.
+        
+        Args:
+            collection: Vector store collection (expansion text is fetched by ID)
+            hits: Retrieved leaf chunks in rank order (with 'id')
+            token_budget: Maximum estimated context tokens
+        
+        Returns:
+            List of chunks; expansions carry 'expansion' ('parent' or
+            'sibling') and 'expanded_from' (the hit's ID)
+        """
+        selected: List[Dict] = []
+        used = 0
+        for hit in hits:
+            tokens = estimate_tokens(hit.get('content', ''))
+            if selected and used + tokens > token_budget:
+                continue
+            selected.append(hit)
+            used += tokens
+        
+        taken = {hit.get('id') for hit in selected}
+        
+        # Parents first (shared by more hits = more useful), then siblings of the best hits
+        parent_hits: Dict[str, List[str]] = {}
+        for hit in selected:
+            node = self.nodes.get(hit.get('id'))
+            if node is not None and node['parent'] is not None:
+                parent_hits.setdefault(node['parent'], []).append(hit['id'])
+        candidates = [
+            (parent_id, 'parent', hit_ids[0])
+            for parent_id, hit_ids in sorted(parent_hits.items(), key=lambda item: -len(item[1]))
+        ]
+        for hit in selected:
+            candidates.extend((sibling_id, 'sibling', hit['id']) for sibling_id in self.siblings(hit.get('id')))
+        
+        expansions: Dict[str, List[tuple]] = {}
+        for node_id, kind, hit_id in candidates:
+            if node_id in taken:
+                continue
+            tokens = self.nodes[node_id]['tokens']
+            if used + tokens > token_budget:
+                continue
+            taken.add(node_id)
+            used += tokens
+            expansions.setdefault(hit_id, []).append((node_id, kind))
+        
+        expansion_ids = [node_id for items in expansions.values() for node_id, _ in items]
+        fetched = {}
+        if expansion_ids:
+            stored = collection.get(ids=expansion_ids, include=['documents', 'metadatas'])
+            fetched = {
+                chunk_id: (document, metadata)
+                for chunk_id, document, metadata in zip(stored['ids'], stored['documents'], stored['metadatas'])
+            }
+        
+        results = []
+        for hit in selected:
+            results.append(hit)
+            for node_id, kind in expansions.get(hit.get('id'), []):
+                if node_id in fetched:
+                    document, metadata = fetched[node_id]
+                    results.append({
+                        'id': node_id,
+                        'content': document,
+                        'metadata': metadata,
+                        'distance': None,
+                        'expansion': kind,
+                        'expanded_from': hit['id']
+                    })
+        return results
+
+
+def annotate_leaves(chunks: List[Dict], tree: SectionTree, chunk_ids: List[str]):
+    """Set 'is_leaf' on main-document chunks so the leaf filter can be applied at search time."""
+    for chunk_id, chunk in zip(chunk_ids, chunks):
+        chunk['is_leaf'] = tree.is_leaf(chunk_id)
+
+
+async def ahierarchical_query(collection,
+                              tree: SectionTree,
+                              query_text: str,
+                              top_k: int,
+                              token_budget: int,
+                              query_cache=None,
+                              query_embedding: Optional[List[float]] = None,
+                              lexical_index=None,
+                              lexical_result: Optional[Dict] = None,
+                              rerank: Optional[Callable[[List[Dict]], List[Dict]]] = None) -> List[Dict]:
+    """
+    Hierarchical retrieval: search leaf sections, then expand within the budget.
+    
+    Falls back to an unfiltered search when nothing matches the leaf filter
+    (e.g. an index built before leaves were tagged).
+    
+    Args:
+        collection: Vector store collection
+        tree: SectionTree for the indexed document
+        query_text: Query text
+        top_k: Number of leaf hits to retrieve
+        token_budget: Maximum estimated context tokens after expansion
+        query_cache: Optional shared cache for query embeddings
+        query_embedding: Precomputed query embedding
+        lexical_index: Optional LexicalIndex for hybrid retrieval
+        lexical_result: Precomputed LexicalIndex.search result
+        rerank: Optional function applied to the leaf hits before expansion
+                (e.g. an MMRReranker; top_k is then the candidate count)
+    
+    Returns:
+        List of retrieved chunks (hits plus expansions)
+    """
+    if lexical_index is not None and lexical_result is None:
+        lexical_result = lexical_index.search(query_text, top_k * 2)
+    if lexical_result is not None:
+        leaf_hits = [hit for hit in lexical_result['hits'] if tree.is_leaf(hit[0])]
+        # A strong match only counts if the matched chunk itself survives the leaf filter
+        strong = lexical_result['strong'] and bool(leaf_hits) and leaf_hits[0] == lexical_result['hits'][0]
+        lexical_result = {'hits': leaf_hits, 'strong': strong}
+    
+    hits = await aquery_collection(collection, query_text, top_k, None, query_cache, query_embedding,
+                                   lexical_result=lexical_result, where=LEAF_FILTER)
+    if not hits:
+        hits = await aquery_collection(collection, query_text, top_k, None, query_cache, query_embedding,
+                                       lexical_result=lexical_result)
+    
+    def rerank_and_expand():
+        return tree.expand(collection, rerank(hits) if rerank is not None else hits, token_budget)
+    
+    return await asyncio.to_thread(rerank_and_expand)
@@ -0,0 +1,313 @@
+/*
+ * Strategy graph renderer (no external dependencies).
+ *
+ * Draws a graph payload built by interactive_graph.py as SVG, with pan/zoom,
+ * expandable nodes and a details panel. Loaded inline by the app, so the
+ * graph tab needs no CDN.
+ *
+ * Payload:
+ *   layout  "tree" (left-to-right by node level) or "fixed" (node x/y)
+ *   theme   background, panel, border, text, muted, heading, edge colours
+ *   node    defaults for every node: width, color {background, border}, font {color, size}
+ *   styles  optional per-level color/font, shared by every node of the level
+ *   levels  optional names of node levels, shown in the details panel
+ *   nodes   [{id, label, level, icon?, caption?, x?, y?, color?, font?,
+ *             toggle? (click shows/hides its children), hidden?, details? {title, content, source}}]
+ *           or compact [id, label, level] records
+ *   edges   [[from, to], ...]
+ *
+ * render() returns a graph whose apply(diff) updates it in place, where diff is
+ * {nodes: {upsert: [[index, record]], remove: [ids]}, edges: {add: [[from, to]], remove: [[from, to]]}}.
+ * Children are laid out in the order of the nodes list.
+ */
+(function () {
+  'use strict';
+
+  var SVG_NS = 'http://www.w3.org/2000/svg';
+  var LEVEL_GAP = 80;
+  var ROW_GAP = 18;
+  var LINE_HEIGHT = 1.3;
+  var PADDING = 12;
+
+  function el(name, attrs, parent) {
+    var node = document.createElementNS(SVG_NS, name);
+    for (var key in attrs) node.setAttribute(key, attrs[key]);
+    if (parent) parent.appendChild(node);
+    return node;
+  }
+
+  function escapeHtml(text) {
+    return String(text).replace(/[&<>"']/g, function (c) {
+      return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+    });
+  }
+
+  function formatContent(text) {
+    return escapeHtml(text || '').replace(/\*\*(.+?)\*\*/g, '<strong>$1</strong>').replace(/\n/g, '<br/>');
+  }
+
+  // Greedy word wrap to a character budget derived from the node width
+  function wrap(text, maxChars) {
+    var lines = [];
+    var line = '';
+    String(text).split(/\s+/).forEach(function (word) {
+      if (line && (line + ' ' + word).length > maxChars) {
+        lines.push(line);
+        line = word;
+      } else {
+        line = line ? line + ' ' + word : word;
+      }
+    });
+    if (line) lines.push(line);
+    return lines;
+  }
+
+  function record(node) {
+    return Array.isArray(node) ? {id: node[0], label: node[1], level: node[2]} : node;
+  }
+
+  function edgeKey(edge) {
+    return edge[0] + '\u0000' + edge[1];
+  }
+
+  function render(root, payload) {
+    var theme = payload.theme || {};
+    var defaults = payload.node || {};
+    var styles = payload.styles || {};
+    var nodes = (payload.nodes || []).map(record);
+    var edges = (payload.edges || []).slice();
+    var byId, children, parentOf;
+
+    function index() {
+      byId = {};
+      children = {};
+      parentOf = {};
+      edges.forEach(function (edge) { parentOf[edge[1]] = edge[0]; });
+      nodes.forEach(function (node) {
+        byId[node.id] = node;
+        var parent = parentOf[node.id];
+        if (parent !== undefined) (children[parent] = children[parent] || []).push(node.id);
+      });
+    }
+
+    function style(node, key) {
+      return Object.assign({}, defaults[key], (styles[node.level] || {})[key], node[key]);
+    }
+
+    root.innerHTML = '';
+    root.style.cssText = 'display:flex; gap:16px; height:100%; font-family:"Segoe UI", system-ui, sans-serif;';
+    var canvas = document.createElement('div');
+    canvas.style.cssText = 'flex:2; position:relative; overflow:hidden; border-radius:12px; border:1px solid ' +
+      (theme.border || '#1f2937') + '; background:' + (theme.background || '#020617') + ';';
+    var panel = document.createElement('div');
+    panel.style.cssText = 'flex:1; overflow-y:auto; padding:16px; border-radius:12px; font-size:14px; line-height:1.6; border:1px solid ' +
+      (theme.border || '#1f2937') + '; background:' + (theme.panel || '#020617') + '; color:' + (theme.text || '#e5e7eb') + ';';
+    root.appendChild(canvas);
+    root.appendChild(panel);
+
+    function showDetails(title, content, source) {
+      panel.innerHTML = '<h3 style="margin-top:0; font-size:16px; color:' + (theme.heading || '#93c5fd') + ';">' +
+        escapeHtml(title) + '</h3><div>' + formatContent(content) + '</div>' +
+        (source ? '<div style="margin-top:20px; font-size:11px; color:' + (theme.muted || '#94a3b8') +
+          '; border-top:1px solid ' + (theme.border || '#1f2937') + '; padding-top:10px;">Source: ' + escapeHtml(source) + '</div>' : '');
+    }
+    showDetails('Details', 'Click any node to see more details here.');
+
+    var svg = el('svg', {width: '100%', height: '100%'}, canvas);
+    svg.style.display = 'block';
+    var edgeLayer = el('g', {}, svg);
+    var nodeLayer = el('g', {}, svg);
+
+    function visible(node) {
+      if (node.hidden && !(parentOf[node.id] && byId[parentOf[node.id]].expanded)) return false;
+      return !parentOf[node.id] || visible(byId[parentOf[node.id]]);
+    }
+
+    function size(node) {
+      var width = node.width || defaults.width || 200;
+      var font = style(node, 'font');
+      var fontSize = font.size || 14;
+      var lines = wrap((node.icon ? node.icon + ' ' : '') + node.label, Math.max(8, Math.floor((width - 2 * PADDING) / (fontSize * 0.55))));
+      var height = 2 * PADDING + lines.length * fontSize * LINE_HEIGHT + (node.caption ? fontSize : 0) + (node.toggle ? fontSize : 0);
+      return {width: width, height: height, lines: lines, font: font};
+    }
+
+    // Left-to-right tree: x from the node level, y from the order of the leaves below it
+    function treeLayout(shown, boxes) {
+      var columns = {};
+      shown.forEach(function (node) {
+        var level = node.level || 0;
+        columns[level] = Math.max(columns[level] || 0, boxes[node.id].width);
+      });
+      var x = {};
+      var offset = 0;
+      Object.keys(columns).map(Number).sort(function (a, b) { return a - b; }).forEach(function (level) {
+        x[level] = offset;
+        offset += columns[level] + LEVEL_GAP;
+      });
+      var cursor = 0;
+      function place(node) {
+        var kids = (children[node.id] || []).map(function (id) { return byId[id]; }).filter(function (kid) {
+          return kid && shown.indexOf(kid) >= 0;
+        });
+        var box = boxes[node.id];
+        box.x = x[node.level || 0];
+        if (!kids.length) {
+          box.y = cursor;
+          cursor += box.height + ROW_GAP;
+        } else {
+          kids.forEach(place);
+          var first = boxes[kids[0].id];
+          var last = boxes[kids[kids.length - 1].id];
+          box.y = (first.y + last.y + last.height) / 2 - box.height / 2;
+        }
+      }
+      shown.filter(function (node) { return !parentOf[node.id]; }).forEach(place);
+    }
+
+    var view = null;
+
+    function draw() {
+      index();
+      var shown = nodes.filter(visible);
+      var boxes = {};
+      shown.forEach(function (node) { boxes[node.id] = size(node); });
+      if (payload.layout === 'tree') {
+        treeLayout(shown, boxes);
+      } else {
+        shown.forEach(function (node) {
+          boxes[node.id].x = node.x || 0;
+          boxes[node.id].y = node.y || 0;
+        });
+      }
+
+      edgeLayer.innerHTML = '';
+      nodeLayer.innerHTML = '';
+      edges.forEach(function (edge) {
+        var from = boxes[edge[0]];
+        var to = boxes[edge[1]];
+        if (!from || !to) return;
+        var d;
+        if (payload.layout === 'tree') {
+          var x1 = from.x + from.width, y1 = from.y + from.height / 2, x2 = to.x, y2 = to.y + to.height / 2;
+          var mid = (x1 + x2) / 2;
+          d = 'M' + x1 + ',' + y1 + ' C' + mid + ',' + y1 + ' ' + mid + ',' + y2 + ' ' + x2 + ',' + y2;
+        } else {
+          d = 'M' + (from.x + from.width / 2) + ',' + (from.y + from.height / 2) + ' L' + (to.x + to.width / 2) + ',' + (to.y + to.height / 2);
+        }
+        el('path', {d: d, fill: 'none', stroke: theme.edge || '#4b5563', 'stroke-width': 1.5}, edgeLayer);
+      });
+
+      shown.forEach(function (node) {
+        var box = boxes[node.id];
+        var color = style(node, 'color');
+        var group = el('g', {transform: 'translate(' + box.x + ',' + box.y + ')'}, nodeLayer);
+        group.style.cursor = 'pointer';
+        el('rect', {width: box.width, height: box.height, rx: 10, fill: color.background || '#111827',
+                    stroke: color.border || '#60a5fa', 'stroke-width': 1.5}, group);
+        var fontSize = box.font.size || 14;
+        var y = PADDING + fontSize;
+        box.lines.forEach(function (line) {
+          var text = el('text', {x: PADDING, y: y, fill: box.font.color || '#e5e7eb', 'font-size': fontSize,
+                                 'font-weight': node.toggle || node.level === 0 ? 700 : 400}, group);
+          text.textContent = line;
+          y += fontSize * LINE_HEIGHT;
+        });
+        [[node.caption, node.caption], [node.toggle, node.expanded ? '▼ Expanded' : '▶ Click to expand']].forEach(function (extra) {
+          if (!extra[0]) return;
+          var text = el('text', {x: PADDING, y: y, fill: theme.muted || '#94a3b8', 'font-size': fontSize * 0.75}, group);
+          text.textContent = extra[1];
+          y += fontSize;
+        });
+        group.addEventListener('click', function (event) {
+          event.stopPropagation();
+          if (node.toggle) {
+            node.expanded = !node.expanded;
+            draw();
+          } else if (node.details) {
+            showDetails(node.details.title, node.details.content, node.details.source);
+          } else {
+            showDetails((payload.levels || [])[node.level] || 'Element', node.label);
+          }
+        });
+      });
+
+      if (!view) fit(boxes);
+      applyView();
+    }
+
+    function fit(boxes) {
+      var ids = Object.keys(boxes);
+      if (!ids.length) {
+        view = {x: 0, y: 0, width: 100, height: 100};
+        return;
+      }
+      var minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
+      ids.forEach(function (id) {
+        var box = boxes[id];
+        minX = Math.min(minX, box.x);
+        minY = Math.min(minY, box.y);
+        maxX = Math.max(maxX, box.x + box.width);
+        maxY = Math.max(maxY, box.y + box.height);
+      });
+      var pad = 0.1 * Math.max(maxX - minX, maxY - minY);
+      view = {x: minX - pad, y: minY - pad, width: maxX - minX + 2 * pad, height: maxY - minY + 2 * pad};
+    }
+
+    function applyView() {
+      svg.setAttribute('viewBox', [view.x, view.y, view.width, view.height].join(' '));
+    }
+
+    // Drag to pan, wheel to zoom around the pointer
+    var drag = null;
+    svg.addEventListener('mousedown', function (event) {
+      drag = {x: event.clientX, y: event.clientY, view: Object.assign({}, view)};
+    });
+    window.addEventListener('mousemove', function (event) {
+      if (!drag) return;
+      var scale = view.width / svg.clientWidth;
+      view.x = drag.view.x - (event.clientX - drag.x) * scale;
+      view.y = drag.view.y - (event.clientY - drag.y) * scale;
+      applyView();
+    });
+    window.addEventListener('mouseup', function () { drag = null; });
+    svg.addEventListener('wheel', function (event) {
+      event.preventDefault();
+      var factor = event.deltaY > 0 ? 1.1 : 1 / 1.1;
+      var rect = svg.getBoundingClientRect();
+      var px = view.x + (event.clientX - rect.left) / rect.width * view.width;
+      var py = view.y + (event.clientY - rect.top) / rect.height * view.height;
+      view = {x: px - (px - view.x) * factor, y: py - (py - view.y) * factor, width: view.width * factor, height: view.height * factor};
+      applyView();
+    }, {passive: false});
+
+    // Replace, add and remove only the nodes and edges named in the diff
+    function apply(diff) {
+      var nodeDiff = diff.nodes || {};
+      var edgeDiff = diff.edges || {};
+      var removed = {};
+      (nodeDiff.remove || []).forEach(function (id) { removed[id] = true; });
+      var upserts = (nodeDiff.upsert || []).map(function (entry) { return [entry[0], record(entry[1])]; });
+      var upserted = {};
+      upserts.forEach(function (entry) { upserted[entry[1].id] = entry[1]; });
+      nodes = nodes.filter(function (node) {
+        if (upserted[node.id]) upserted[node.id].expanded = node.expanded;
+        return !removed[node.id] && !upserted[node.id];
+      });
+      // Upserts come in index order, so each lands at its final position
+      upserts.forEach(function (entry) { nodes.splice(entry[0], 0, entry[1]); });
+
+      var dropped = {};
+      (edgeDiff.remove || []).forEach(function (edge) { dropped[edgeKey(edge)] = true; });
+      edges = edges.filter(function (edge) {
+        return !dropped[edgeKey(edge)] && !removed[edge[0]] && !removed[edge[1]];
+      }).concat(edgeDiff.add || []);
+      draw();
+    }
+
+    draw();
+    return {apply: apply};
+  }
+
+  window.StrategyGraph = {render: render};
+})();
@@ -0,0 +1,347 @@
+"""
+Columnar store of the pipe tables in the strategy document.
+Ingestion parses every table (document_processor.extract_tables) and saves it
+column by column with its section. At query time an inverted index over the
+cells finds the rows a question is about, so lookup questions ("What is the
+employee engagement target?") can be answered from a single row and prompts
+that name a row get the matching rows instead of whole tables.
+"""
+import json
+import logging
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    TABLE_STORE_PATH,
+    TABLE_LOOKUP_MAX_ROWS,
+    TABLE_DIRECT_MIN_MARGIN,
+    TABLE_DIRECT_MIN_QUERY_COVERAGE,
+    TABLE_ROWS_MIN_LABEL_COVERAGE,
+    TABLE_ROWS_MIN_SCORE_RATIO
+)
+from document_processor import parse_markdown_tables
+from lexical_index import tokenize
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Questions that ask for a value rather than an explanation
+_LOOKUP_PREFIXES = ('what is', "what's", 'what are', 'what was', 'what were', 'where is',
+                    'when is', 'when was', 'which', 'how many', 'how much', 'who is')
+
+# Question words that say how to ask, not what is asked about (ignored by query coverage)
+_QUESTION_TERMS = {'s', 'wher', 'many', 'much', 'ther', 'tell', 'me'}
+
+# Row label and caption terms count double; caption and column-header terms score every row of the table
+_LABEL_WEIGHT = 2.0
+_CAPTION_WEIGHT = 2.0
+_COLUMN_WEIGHT = 0.5
+
+
+def _stem(term: str) -> str:
+    """Light suffix stripping so "headquartered" matches "Headquarters" and "serve" matches "Served"."""
+    if term[0].isdigit():
+        return term
+    for suffix in ('ing', 'ed', 'es', 's'):
+        if term.endswith(suffix) and len(term) > len(suffix) + 3:
+            term = term[:-len(suffix)]
+            break
+    return term[:-1] if term.endswith('e') and len(term) > 4 else term
+
+
+def _terms(text: str) -> List[str]:
+    return [_stem(token) for token in tokenize(text)]
+
+
+def table_id(section_path: str, table_index: int) -> str:
+    """ID of a table: its section path and position within the section's chunk."""
+    return f"{section_path}#{table_index}"
+
+
+class TableStore:
+    """
+    Tables stored column by column, with a row-level inverted index.
+    
+    Each table keeps its caption, section number/path and line range, its
+    column names and one list of cell values per column.
+    """
+    
+    def __init__(self, tables: List[Dict]):
+        """
+        Args:
+            tables: Stored tables (see build)
+        """
+        self.tables = tables
+        # Term -> {(table, row): weight}
+        self._postings: Dict[str, Dict[Tuple[int, int], float]] = {}
+        for table_no, table in enumerate(tables):
+            table_weights = {term: _COLUMN_WEIGHT for term in _terms(' '.join(table['columns']))}
+            table_weights.update({term: _CAPTION_WEIGHT for term in _terms(table['caption'])})
+            labels = table['values'][0] if table['values'] else []
+            for row_no in range(len(labels)):
+                weights = dict(table_weights)
+                for column in table['values'][1:]:
+                    for term in _terms(column[row_no]):
+                        weights[term] = max(weights.get(term, 0.0), 1.0)
+                for term in _terms(labels[row_no]):
+                    weights[term] = _LABEL_WEIGHT
+                for term, weight in weights.items():
+                    self._postings.setdefault(term, {})[(table_no, row_no)] = weight
+        self._num_rows = sum(len(table['values'][0]) for table in tables if table['values'])
+    
+    @classmethod
+    def build(cls, tables: List[Dict]) -> "TableStore":
+        """
+        Build the store from parsed tables.
+        
+        Args:
+            tables: Tables from document_processor.extract_tables
+        
+        Returns:
+            TableStore
+        """
+        stored = []
+        for table in tables:
+            columns = table['columns']
+            stored.append({
+                'id': table_id(table['section_path'], table['table_index']),
+                'caption': table['caption'],
+                'section_number': table.get('section_number') or '',
+                'section_path': table['section_path'],
+                'line_start': table['line_start'],
+                'line_end': table['line_end'],
+                'columns': columns,
+                'values': [[row[i] for row in table['rows']] for i in range(len(columns))]
+            })
+        return cls(stored)
+    
+    def save(self, path: str = TABLE_STORE_PATH):
+        """Persist the tables as JSON."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'tables': self.tables}, f)
+        logger.info(f"Saved table store ({len(self.tables)} tables, {self._num_rows} rows) to {path}")
+    
+    @classmethod
+    def load(cls, path: str = TABLE_STORE_PATH) -> Optional["TableStore"]:
+        """
+        Load the saved tables and index them.
+        
+        Returns:
+            TableStore, or None if no store has been built
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f)['tables'])
+    
+    @property
+    def num_rows(self) -> int:
+        """Total number of data rows."""
+        return self._num_rows
+    
+    def lookup(self, query: str, max_rows: int = TABLE_LOOKUP_MAX_ROWS) -> List[Dict]:
+        """
+        Find the table rows a query refers to.
+        
+        Args:
+            query: Query text
+            max_rows: Maximum rows to return
+        
+        Returns:
+            List of matches in descending score order, each with table and
+            row (positions), score, label_coverage (share of the row label's
+            terms found in the query), query_coverage (share of the query's
+            content terms found in the row label, column headers or caption)
+            and columns (positions of non-label columns named in the query)
+        """
+        query_terms = set(_terms(query))
+        content_terms = query_terms - _QUESTION_TERMS
+        scores: Dict[Tuple[int, int], float] = {}
+        for term in query_terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + self._num_rows / len(postings))
+            for key, weight in postings.items():
+                scores[key] = scores.get(key, 0.0) + idf * weight
+        if not scores:
+            return []
+        
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        best_score = ranked[0][1]
+        matches = []
+        for (table_no, row_no), score in ranked[:max_rows]:
+            # Rows far below the best one are incidental term overlaps
+            if score < 0.5 * best_score:
+                break
+            table = self.tables[table_no]
+            label_terms = set(_terms(table['values'][0][row_no]))
+            described = label_terms | set(_terms(' '.join(table['columns']))) | set(_terms(table['caption']))
+            matches.append({
+                'table': table_no,
+                'row': row_no,
+                'score': score,
+                'label_coverage': len(label_terms & query_terms) / len(label_terms) if label_terms else 0.0,
+                'query_coverage': len(described & content_terms) / len(content_terms) if content_terms else 0.0,
+                'columns': self._named_columns(table, query_terms)
+            })
+        return matches
+    
+    @staticmethod
+    def _named_columns(table: Dict, query_terms: set) -> List[int]:
+        """
+        Non-label columns a query names: every term of the header ("Q2 2025"),
+        or failing that every word of it ("Target" in "2026 Target").
+        """
+        headers = [(i, set(_terms(column))) for i, column in enumerate(table['columns'][1:], start=1)]
+        named = [i for i, terms in headers if terms and terms <= query_terms]
+        if not named:
+            named = [
+                i for i, terms in headers
+                if {t for t in terms if not t[0].isdigit()} and {t for t in terms if not t[0].isdigit()} <= query_terms
+            ]
+        return named
+    
+    def direct_match(self, query: str, matches: Optional[List[Dict]] = None) -> Optional[Dict]:
+        """
+        Return the single row that answers a lookup question, if there is one.
+        
+        The query must start like a value question ("What is", "How many", ...)
+        and name every term of the row's label; the label, column headers and
+        caption must cover TABLE_DIRECT_MIN_QUERY_COVERAGE of the query's terms
+        (so "What is the impact of automation on employee engagement?" is not
+        answered with the Employee Engagement row), and the row must outscore
+        the runner-up by TABLE_DIRECT_MIN_MARGIN.
+        
+        Args:
+            query: Query text
+            matches: Precomputed lookup(query) result
+        
+        Returns:
+            The winning match from lookup, or None
+        """
+        if not query.lower().strip().startswith(_LOOKUP_PREFIXES):
+            return None
+        matches = self.lookup(query) if matches is None else matches
+        if not matches or matches[0]['label_coverage'] < 1.0:
+            return None
+        if matches[0]['query_coverage'] < TABLE_DIRECT_MIN_QUERY_COVERAGE:
+            return None
+        if len(matches) > 1 and matches[0]['score'] < TABLE_DIRECT_MIN_MARGIN * matches[1]['score']:
+            return None
+        return matches[0]
+    
+    @staticmethod
+    def strong_matches(matches: List[Dict], min_coverage: float = TABLE_ROWS_MIN_LABEL_COVERAGE,
+                       min_score_ratio: float = TABLE_ROWS_MIN_SCORE_RATIO) -> List[Dict]:
+        """
+        Keep the matches whose row label the query names and that are among the best rows.
+        
+        Rows matched only through a shared word (a caption or column term, or
+        part of a longer label), or named in passing while other rows match the
+        query better, are too loose to stand in for their table.
+        
+        Args:
+            matches: Result of lookup
+            min_coverage: Minimum label_coverage
+            min_score_ratio: Minimum score relative to the best match
+        
+        Returns:
+            The matches to send as rows (their tables are compacted)
+        """
+        if not matches:
+            return []
+        min_score = min_score_ratio * matches[0]['score']
+        return [match for match in matches
+                if match['label_coverage'] >= min_coverage and match['score'] >= min_score]
+    
+    def metadata(self, table_no: int) -> Dict:
+        """Chunk-style metadata for a table (used for citations and sources)."""
+        table = self.tables[table_no]
+        return {
+            'content_type': 'main_doc',
+            'section_number': table['section_number'],
+            'section_path': table['section_path'],
+            'line_start': str(table['line_start']),
+            'line_end': str(table['line_end'])
+        }
+    
+    def format_row(self, table_no: int, row_no: int, columns: Optional[List[int]] = None) -> str:
+        """
+        Format one row as "Label (caption): Column: value; ...".
+        
+        Args:
+            table_no: Table position
+            row_no: Row position
+            columns: Non-label column positions to include (all if empty/None)
+        """
+        table = self.tables[table_no]
+        columns = columns or range(1, len(table['columns']))
+        values = '; '.join(
+            f"{table['columns'][i]}: {table['values'][i][row_no]}"
+            for i in columns if table['values'][i][row_no]
+        )
+        caption = f" ({table['caption']})" if table['caption'] else ''
+        return f"**{table['values'][0][row_no]}**{caption}: {values}"
+    
+    def row_chunks(self, matches: List[Dict]) -> List[Dict]:
+        """
+        Group matched rows into one compact chunk per table.
+        
+        Args:
+            matches: Result of lookup
+        
+        Returns:
+            Chunks (id, content, metadata, distance, table_rows) holding the
+            table's header and matched rows only, in table order
+        """
+        rows_by_table: Dict[int, List[int]] = {}
+        for match in matches:
+            rows_by_table.setdefault(match['table'], []).append(match['row'])
+        
+        chunks = []
+        for table_no, rows in rows_by_table.items():
+            table = self.tables[table_no]
+            lines = [f"Table: {table['caption']}"] if table['caption'] else []
+            lines.append('| ' + ' | '.join(table['columns']) + ' |')
+            for row_no in sorted(rows):
+                lines.append('| ' + ' | '.join(column[row_no] for column in table['values']) + ' |')
+            chunks.append({
+                'id': f"table:{table['id']}",
+                'content': '\n'.join(lines),
+                'metadata': self.metadata(table_no),
+                'distance': None,
+                'table_rows': True
+            })
+        return chunks
+    
+    def compact_chunk(self, chunk: Dict, table_ids: set) -> Dict:
+        """
+        Replace the given tables inside a retrieved chunk with a short reference.
+        
+        Args:
+            chunk: Retrieved chunk
+            table_ids: IDs of tables whose matching rows are sent separately
+        
+        Returns:
+            The chunk, or a copy with those tables' lines replaced
+        """
+        content = chunk.get('content', '')
+        section_path = chunk.get('metadata', {}).get('section_path', '')
+        tables = [
+            table for table_index, table in enumerate(parse_markdown_tables(content))
+            if table_id(section_path, table_index) in table_ids
+        ]
+        if not tables:
+            return chunk
+        
+        lines = content.split('\n')
+        for table in reversed(tables):
+            label = table['caption'] or ', '.join(column for column in table['columns'] if column)
+            lines[table['line_start'] - 1:table['line_end']] = [f"[Table: {label} - matching rows listed separately]"]
+        return {**chunk, 'content': '\n'.join(lines)}
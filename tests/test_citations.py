@@ -0,0 +1,45 @@
+"""Streaming citation formatting matches formatting the whole response."""
+import random
+
+import pytest
+
+from rag_handler import StreamingCitationFormatter, format_citations
+
+RESPONSES = [
+    "Operating margin rose to 3.3billioninQ2 2025 [Section 4.1].",
+    "Q1 2026: launch 5 pilots, reach 8-10million members by Q4.",
+    "1",
+    "",
+    "a1b2c3d4",
+]
+
+
+def stream(text, sizes):
+    """Feed text through the formatter in pieces of the given sizes."""
+    formatter = StreamingCitationFormatter()
+    output, position = [], 0
+    for size in sizes:
+        output.append(formatter.feed(text[position:position + size]))
+        position += size
+    output.append(formatter.feed(text[position:]))
+    output.append(formatter.flush())
+    return ''.join(output)
+
+
+@pytest.mark.parametrize("text", RESPONSES)
+def test_character_stream_matches_full_format(text):
+    assert stream(text, [1] * len(text)) == format_citations(text, [])
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_chunks_match_full_format(seed):
+    rng = random.Random(seed)
+    text = ''.join(rng.choice("ab12. Q") for _ in range(rng.randint(0, 60)))
+    sizes = [rng.randint(0, 7) for _ in range(rng.randint(0, 15))]
+    assert stream(text, sizes) == format_citations(text, [])
+
+
+def test_empty_pieces_emit_nothing():
+    formatter = StreamingCitationFormatter()
+    assert formatter.feed('') == ''
+    assert formatter.flush() == ''
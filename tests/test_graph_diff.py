@@ -0,0 +1,79 @@
+"""GraphModel.diff turns the previous mind-map into the new one."""
+import copy
+
+from interactive_graph import GraphModel
+
+STRUCTURE = {
+    "root": "2026 Strategy",
+    "pillars": [
+        {"id": 1, "name": "Efficiency", "initiatives": ["Automation", "Shared services"], "kpis": ["Operating margin"]},
+        {"id": 2, "name": "Risant Health", "initiatives": ["Partnerships"], "kpis": ["Members"]},
+        {"id": 3, "name": "Workforce", "initiatives": ["Career pathways"], "kpis": ["Engagement", "Turnover"]},
+    ],
+}
+
+
+def apply(previous, diff):
+    """Apply a diff the way static/strategy_graph.js does."""
+    upserted = {record[0] for _, record in diff["nodes"]["upsert"]}
+    removed = set(diff["nodes"]["remove"])
+    nodes = [node for node in previous.nodes if node[0] not in removed and node[0] not in upserted]
+    for index, record in diff["nodes"]["upsert"]:
+        nodes.insert(index, record)
+    removed_edges = {tuple(edge) for edge in diff["edges"]["remove"]}
+    edges = [edge for edge in previous.edges if tuple(edge) not in removed_edges] + diff["edges"]["add"]
+    return nodes, edges
+
+
+def check(old_structure, new_structure):
+    previous = GraphModel.from_structure(old_structure)
+    current = GraphModel.from_structure(new_structure)
+    diff = current.diff(previous)
+    nodes, edges = apply(previous, diff)
+    assert nodes == current.nodes
+    assert sorted(map(tuple, edges)) == sorted(map(tuple, current.edges))
+    return diff
+
+
+def test_unchanged_structure_has_empty_diff():
+    diff = check(STRUCTURE, copy.deepcopy(STRUCTURE))
+    assert diff == {"nodes": {"upsert": [], "remove": []}, "edges": {"add": [], "remove": []}}
+
+
+def test_renamed_pillar_only_upserts_that_node():
+    changed = copy.deepcopy(STRUCTURE)
+    changed["pillars"][1]["name"] = "Risant Health Expansion"
+    diff = check(STRUCTURE, changed)
+    assert [record[0] for _, record in diff["nodes"]["upsert"]] == ["p2"]
+    assert diff["nodes"]["remove"] == [] and diff["edges"] == {"add": [], "remove": []}
+
+
+def test_added_and_removed_items():
+    changed = copy.deepcopy(STRUCTURE)
+    changed["pillars"][0]["initiatives"].append("Process improvement")
+    changed["pillars"][2]["kpis"].remove("Turnover")
+    diff = check(STRUCTURE, changed)
+    assert len(diff["nodes"]["upsert"]) == 1
+    assert len(diff["nodes"]["remove"]) == 1
+    assert len(diff["edges"]["add"]) == 1 and len(diff["edges"]["remove"]) == 1
+
+
+def test_reordered_items_move_the_fewest_nodes():
+    changed = copy.deepcopy(STRUCTURE)
+    changed["pillars"][0]["initiatives"].reverse()
+    diff = check(STRUCTURE, changed)
+    assert len(diff["nodes"]["upsert"]) == 1
+    assert diff["edges"] == {"add": [], "remove": []}
+
+
+def test_reordered_pillars():
+    changed = copy.deepcopy(STRUCTURE)
+    changed["pillars"].reverse()
+    check(STRUCTURE, changed)
+
+
+def test_item_ids_survive_reordering():
+    changed = copy.deepcopy(STRUCTURE)
+    changed["pillars"][2]["kpis"].reverse()
+    ids = {node[0] for node in GraphModel.from_structure(STRUCTURE).nodes}
+    assert ids == {node[0] for node in GraphModel.from_structure(changed).nodes}
@@ -0,0 +1,83 @@
+"""Table and role lookups on the strategy document (output.md)."""
+import os
+
+import pytest
+
+from config import ROLE_GUIDANCE_MIN_CONFIDENCE
+from document_processor import chunk_by_headers, extract_tables
+from rag_handler import detect_role_from_query, is_advice_request
+from role_guidance import RoleGuidanceIndex, role_lookup_mode
+from table_store import TableStore
+from vector_store import build_chunk_metadata
+
+DOCUMENT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "output.md")
+
+
+@pytest.fixture(scope="module")
+def markdown_text():
+    with open(DOCUMENT, encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="module")
+def table_store(markdown_text):
+    return TableStore.build(extract_tables(chunk_by_headers(markdown_text)))
+
+
+def test_direct_match_answers_named_row(table_store):
+    match = table_store.direct_match("What is the employee engagement target?")
+    assert match is not None
+    table = table_store.tables[match['table']]
+    assert table['values'][0][match['row']] == "Employee Engagement"
+
+
+@pytest.mark.parametrize("query", [
+    "Which organization prepared this?",
+    "What is the topic of Section 5?",
+    "What is the impact of automation on employee engagement?",
+    "Summarize the financial KPIs",
+])
+def test_direct_match_skips_incidental_labels(table_store, query):
+    assert table_store.direct_match(query) is None
+
+
+@pytest.mark.parametrize("query", [
+    "What are the five strategic pillars?",
+    "What are the key risks?",
+])
+def test_loose_matches_keep_tables_whole(table_store, query):
+    assert table_store.strong_matches(table_store.lookup(query)) == []
+
+
+def lookup_mode(query):
+    role = detect_role_from_query(query)
+    return role, role_lookup_mode(query, role, None, is_advice_request(query), ROLE_GUIDANCE_MIN_CONFIDENCE)
+
+
+@pytest.mark.parametrize("query", [
+    "What is the executive summary?",
+    "What are the clinical quality KPIs?",
+    "What leadership changes happened in 2025?",
+    "What is the governance model?",
+    "What should frontline staff and the board do together?",
+])
+def test_incidental_role_keywords_do_not_select_a_role(query):
+    assert lookup_mode(query)[1] is None
+
+
+@pytest.mark.parametrize("query, role, mode", [
+    ("As a board member, what should I focus on?", "board", "direct"),
+    ("What should frontline staff know about automation?", "frontline", "direct"),
+    ("From a CEO perspective, what matters most?", "ceo", "narrow"),
+    ("How should a director support workforce engagement?", "operational", "direct"),
+    ("What should the board of directors prioritize in 2026?", "board", "direct"),
+])
+def test_explicit_roles_select_guidance(query, role, mode):
+    assert lookup_mode(query) == (role, mode)
+
+
+def test_every_role_subsection_is_tagged(markdown_text):
+    index = RoleGuidanceIndex.build(markdown_text)
+    chunks = index.split_chunks(chunk_by_headers(markdown_text))
+    tagged = {build_chunk_metadata(chunk).get('role_context') for chunk in chunks} - {None}
+    assert tagged == {"board", "ceo", "operational", "frontline"}
@@ -3,20 +3,33 @@ Vector store operations using ChromaDB and Google embeddings.
 Handles embedding generation, chunk storage, and semantic search.
 """
 import chromadb
-from chromadb.config import Settings
 import google.generativeai as genai
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+import hashlib
+import json
 import logging
 import os
+import time
 
 from config import (
     CHROMA_COLLECTION_NAME,
     CHROMA_PERSIST_DIRECTORY,
     EMBEDDING_MODEL,
     EMBEDDING_BATCH_SIZE,
-    GOOGLE_API_KEY,
-    ROLE_GUIDANCE_SECTION
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_RETRY_BACKOFF,
+    INDEX_VERSION_FILE,
+    ROLE_GUIDANCE_SECTION,
+    ROLE_MAPPINGS,
+    VECTOR_STORE_BACKEND
 )
+from embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from async_runner import run_sync
+from clients import configure_genai, get_chroma_client, get_collection
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -24,99 +37,328 @@ logger = logging.getLogger(__name__)
 
 
 def initialize_genai():
-    """Initialize Google GenAI client."""
-    if not GOOGLE_API_KEY:
-        raise ValueError("GOOGLE_API_KEY not set in config")
-    genai.configure(api_key=GOOGLE_API_KEY)
+    """Initialize Google GenAI client (configured once per process by the client registry)."""
+    configure_genai()
 
 
 def initialize_chroma_db(collection_name: str = CHROMA_COLLECTION_NAME, 
-                         persist_directory: str = CHROMA_PERSIST_DIRECTORY) -> Tuple[chromadb.Client, chromadb.Collection]:
+                         persist_directory: str = CHROMA_PERSIST_DIRECTORY,
+                         backend: str = VECTOR_STORE_BACKEND) -> Tuple[chromadb.Client, chromadb.Collection]:
     """
     Create or connect to ChromaDB collection.
+    Handles come from the shared client registry, so repeated calls are cheap.
     
     Args:
         collection_name: Name of the collection
         persist_directory: Directory to persist ChromaDB data
+        backend: "chroma" or "numpy" (local memory-mapped store, see numpy_store.py)
         
     Returns:
-        Tuple of (ChromaDB client, Collection)
+        Tuple of (ChromaDB client, Collection); the client is None for the numpy backend
     """
-    # Create persist directory if it doesn't exist
-    os.makedirs(persist_directory, exist_ok=True)
+    client = get_chroma_client(persist_directory) if backend == "chroma" else None
+    collection = get_collection(collection_name, persist_directory, create=True, backend=backend)
+    return client, collection
+
+
+def _extract_embedding_vectors(result, expected: int) -> List[List[float]]:
+    """
+    Normalize a genai.embed_content response into a list of vectors.
+    
+    Args:
+        result: Raw response from genai.embed_content
+        expected: Number of vectors the caller asked for
+        
+    Returns:
+        List of embedding vectors (one per input text)
+    """
+    if isinstance(result, dict):
+        if 'embedding' in result:
+            vectors = result['embedding']
+        elif 'embeddings' in result:
+            vectors = result['embeddings']
+        else:
+            logger.error(f"Unexpected result structure. Keys: {list(result.keys())}")
+            raise ValueError(f"No embedding key found in result: {list(result.keys())}")
+    else:
+        # If result is directly the embedding vector(s)
+        vectors = result
     
-    # Initialize ChromaDB client with persistence
-    client = chromadb.PersistentClient(path=persist_directory)
+    vectors = list(vectors)
+    # A single text yields a flat vector rather than a list of vectors
+    if vectors and isinstance(vectors[0], (int, float)):
+        vectors = [vectors]
     
-    # Get or create collection
-    try:
-        collection = client.get_collection(name=collection_name)
-        logger.info(f"Loaded existing collection: {collection_name}")
-    except Exception:
-        collection = client.create_collection(
-            name=collection_name,
-            metadata={"hnsw:space": "cosine"}
-        )
-        logger.info(f"Created new collection: {collection_name}")
+    if len(vectors) != expected:
+        raise ValueError(f"Expected {expected} embeddings but got {len(vectors)}")
     
-    return client, collection
+    return [list(vector) for vector in vectors]
+
+
+def gemini_embed_batch(texts: List[str], model: str = EMBEDDING_MODEL,
+                       task_type: str = "RETRIEVAL_DOCUMENT") -> List[List[float]]:
+    """
+    Embed a batch of texts with a single Google GenAI request.
+    
+    Args:
+        texts: Texts to embed in one request
+        model: Embedding model name
+        task_type: GenAI task type (RETRIEVAL_DOCUMENT or RETRIEVAL_QUERY)
+        
+    Returns:
+        List of embedding vectors in input order
+    """
+    result = genai.embed_content(
+        model=model,
+        content=texts if len(texts) > 1 else texts[0],
+        task_type=task_type
+    )
+    return _extract_embedding_vectors(result, len(texts))
+
+
+def make_fake_embedder(dimension: int = 768, latency: float = 0.0) -> Callable:
+    """
+    Build a deterministic, offline stand-in for gemini_embed_batch.
+    
+    Vectors are derived from a SHA-256 hash of each text, so identical texts
+    always map to identical vectors. An optional per-request latency simulates
+    the network round trip for throughput benchmarks.
+    
+    Args:
+        dimension: Length of the generated vectors
+        latency: Seconds to sleep per request
+        
+    Returns:
+        Callable with the same signature as gemini_embed_batch
+    """
+    def fake_embed_batch(texts: List[str], model: str = EMBEDDING_MODEL,
+                         task_type: str = "RETRIEVAL_DOCUMENT") -> List[List[float]]:
+        if latency:
+            time.sleep(latency)
+        vectors = []
+        for text in texts:
+            seed = hashlib.sha256(f"{model}|{task_type}|{text}".encode('utf-8')).digest()
+            vector = [((seed[i % len(seed)] ^ (i * 31)) % 255) / 127.0 - 1.0 for i in range(dimension)]
+            vectors.append(vector)
+        return vectors
+    
+    return fake_embed_batch
+
+
+def _embed_batch_with_retry(batch: List[str], model: str, task_type: str,
+                            embed_fn: Callable, max_retries: int,
+                            backoff: float) -> List[List[float]]:
+    """
+    Embed one batch, retrying with exponential backoff.
+    Falls back to single-item calls if every batch attempt fails.
+    """
+    last_error = None
+    for attempt in range(max_retries):
+        try:
+            return embed_fn(batch, model=model, task_type=task_type)
+        except Exception as e:
+            last_error = e
+            if attempt < max_retries - 1:
+                delay = backoff * (2 ** attempt)
+                logger.warning(f"Embedding batch of {len(batch)} failed (attempt {attempt + 1}/{max_retries}): {e}. "
+                               f"Retrying in {delay:.1f}s")
+                time.sleep(delay)
+    
+    if len(batch) == 1:
+        raise ValueError(f"Failed to generate embedding after {max_retries} attempts. Error: {last_error}")
+    
+    logger.warning(f"Embedding batch of {len(batch)} failed, falling back to single-item requests")
+    return [
+        _embed_batch_with_retry([text], model, task_type, embed_fn, max_retries, backoff)[0]
+        for text in batch
+    ]
 
 
-def generate_embeddings(texts: List[str], model: str = EMBEDDING_MODEL) -> List[List[float]]:
+def generate_embeddings(texts: List[str],
+                        model: str = EMBEDDING_MODEL,
+                        task_type: str = "RETRIEVAL_DOCUMENT",
+                        batch_size: int = EMBEDDING_BATCH_SIZE,
+                        max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+                        embed_fn: Optional[Callable] = None,
+                        cache: Optional[EmbeddingCache] = None) -> List[List[float]]:
     """
     Generate embeddings using Google GenAI.
     
+    Texts are sent in batches of ``batch_size`` with up to ``max_concurrency``
+    batches in flight. Each batch is retried with backoff and falls back to
+    single-item calls if it keeps failing. Output order matches input order.
+    
     Args:
         texts: List of text strings to embed
         model: Embedding model name
+        task_type: GenAI task type
+        batch_size: Texts per embedding request
+        max_concurrency: Maximum number of concurrent batch requests
+        embed_fn: Optional batch embedder (defaults to gemini_embed_batch);
+                  use make_fake_embedder() to run offline
+        cache: Optional EmbeddingCache consulted before calling the API
         
     Returns:
         List of embedding vectors
     """
-    initialize_genai()
+    if not texts:
+        return []
     
-    embeddings = []
+    embeddings: List[Optional[List[float]]] = [None] * len(texts)
     
-    # Process embeddings one at a time for reliability
-    # (Google GenAI API batch behavior can be unpredictable)
+    # Serve what we can from the cache; only misses go to the API
+    keys = []
+    if cache is not None:
+        keys = [cache.make_key(text, model, task_type) for text in texts]
+        cached = cache.get_many(keys)
+        for i, key in enumerate(keys):
+            if key in cached:
+                embeddings[i] = cached[key]
+    
+    # Deduplicate identical texts so each is embedded once
+    pending: Dict[str, List[int]] = {}
     for i, text in enumerate(texts):
-        try:
-            result = genai.embed_content(
-                model=model,
-                content=text,
-                task_type="RETRIEVAL_DOCUMENT"
-            )
-            
-            # Handle response structure
-            if isinstance(result, dict):
-                if 'embedding' in result:
-                    embedding = result['embedding']
-                elif 'embeddings' in result:
-                    # Shouldn't happen for single text, but handle it
-                    emb = result['embeddings']
-                    embedding = emb[0] if isinstance(emb, list) and len(emb) > 0 else emb
-                else:
-                    logger.error(f"Unexpected result structure. Keys: {list(result.keys())}")
-                    raise ValueError(f"No embedding key found in result: {list(result.keys())}")
-            elif isinstance(result, list):
-                embedding = result[0] if len(result) > 0 else result
-            else:
-                # If result is directly the embedding vector
-                embedding = result
+        if embeddings[i] is None:
+            pending.setdefault(text, []).append(i)
+    
+    if cache is not None:
+        misses = sum(len(positions) for positions in pending.values())
+        logger.info(f"Embedding cache: {len(texts) - misses} hits, {misses} misses")
+    
+    if not pending:
+        return embeddings
+    
+    if embed_fn is None:
+        initialize_genai()
+        embed_fn = gemini_embed_batch
+    
+    pending_texts = list(pending.keys())
+    batch_size = max(1, batch_size)
+    batches = [pending_texts[i:i + batch_size] for i in range(0, len(pending_texts), batch_size)]
+    completed = 0
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(batches)))) as executor:
+        futures = {
+            executor.submit(_embed_batch_with_retry, batch, model, task_type, embed_fn,
+                            EMBEDDING_MAX_RETRIES, EMBEDDING_RETRY_BACKOFF): index
+            for index, batch in enumerate(batches)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                batch_vectors = future.result()
+            except Exception as e:
+                logger.error(f"Error generating embeddings for batch {index + 1}: {e}", exc_info=True)
+                for other in futures:
+                    other.cancel()
+                raise ValueError(f"Failed to generate embeddings for batch {index + 1}. Error: {e}")
             
-            embeddings.append(embedding)
+            new_entries = {}
+            for text, vector in zip(batches[index], batch_vectors):
+                for position in pending[text]:
+                    embeddings[position] = vector
+                if cache is not None:
+                    new_entries[cache.make_key(text, model, task_type)] = vector
             
-            # Log progress every 10 embeddings
-            if (i + 1) % 10 == 0:
-                logger.info(f"Generated {i + 1}/{len(texts)} embeddings")
+            # Persist each batch as it lands so an interrupted run keeps its progress
+            if cache is not None:
+                cache.put_many(new_entries)
             
-        except Exception as e:
-            logger.error(f"Error generating embedding for text {i+1}: {e}", exc_info=True)
-            raise ValueError(f"Failed to generate embedding for chunk {i+1}. Error: {e}")
+            completed += len(batches[index])
+            logger.info(f"Generated {completed}/{len(pending_texts)} embeddings")
     
     return embeddings
 
 
+def make_chunk_id(chunk: Dict) -> str:
+    """
+    Build a deterministic chunk ID from its section path and content.
+    
+    Unlike Python's per-process salted hash() or a positional index, the ID
+    is stable across runs and unaffected by sections being added or removed
+    elsewhere in the document.
+    
+    Args:
+        chunk: Chunk dictionary
+        
+    Returns:
+        Chunk ID string
+    """
+    digest = hashlib.sha256(
+        f"{chunk.get('content_type', 'main_doc')}\x00{chunk.get('section_path', '')}\x00{chunk['content']}".encode('utf-8')
+    ).hexdigest()
+    return f"chunk_{digest[:24]}"
+
+
+def build_chunk_metadata(chunk: Dict) -> Dict:
+    """
+    Build the ChromaDB metadata dictionary for a chunk.
+    
+    Args:
+        chunk: Chunk dictionary
+        
+    Returns:
+        Metadata dictionary (ChromaDB-safe: no None values)
+    """
+    # Metadata - ChromaDB doesn't accept None values, convert to empty strings
+    metadata = {
+        'section_path': chunk.get('section_path') or '',
+        'section_number': str(chunk.get('section_number')) if chunk.get('section_number') is not None else '',
+        'content_type': chunk.get('content_type', 'main_doc'),
+        'level': str(chunk.get('level', 0)),
+        'header_text': chunk.get('header_text') or '',
+        'line_start': str(chunk.get('line_start', 0)),
+        'line_end': str(chunk.get('line_end', 0)),
+        # Set by section_tree.annotate_leaves; chunks outside the tree count as leaves
+        'is_leaf': 'true' if chunk.get('is_leaf', True) else 'false'
+    }
+    
+    # Add hyperlink-specific metadata
+    if chunk.get('content_type') == 'hyperlink':
+        metadata['parent_section'] = chunk.get('parent_section') or ''
+        metadata['source_url'] = chunk.get('source_url') or ''
+        metadata['link_text'] = chunk.get('link_text') or ''
+        # Position of a sub-chunk within the fetched page (see build_hyperlink_sub_chunks)
+        for key in ('chunk_index', 'chunk_count', 'char_start', 'char_end', 'page_start', 'page_end'):
+            if chunk.get(key) is not None:
+                metadata[key] = str(chunk[key])
+    
+    # Add role context to the Section 8.3 subsection written for each role:
+    # set by RoleGuidanceIndex.split_chunks at ingestion (several 8.3 headers
+    # are blank, so their subsections only exist after that split), otherwise
+    # matched on a subsection title header
+    role_context = chunk.get('role_context')
+    if not role_context:
+        header_lower = (chunk.get('header_text') or '').lower()
+        role_context = next((role for role, info in ROLE_MAPPINGS.items()
+                             if header_lower == info['subsection'].lower()), None)
+    if role_context:
+        metadata['role_context'] = role_context
+    
+    return metadata
+
+
+def build_chunk_ids(chunks: List[Dict]) -> List[str]:
+    """
+    Build deterministic IDs for a list of chunks.
+    Identical chunks (same type, path, and content) get an occurrence suffix.
+    
+    Args:
+        chunks: List of chunk dictionaries
+        
+    Returns:
+        List of chunk IDs in input order
+    """
+    ids = []
+    seen: Dict[str, int] = {}
+    for chunk in chunks:
+        chunk_id = make_chunk_id(chunk)
+        occurrence = seen.get(chunk_id, 0)
+        seen[chunk_id] = occurrence + 1
+        ids.append(chunk_id if occurrence == 0 else f"{chunk_id}_{occurrence}")
+    return ids
+
+
 def store_chunks(collection: chromadb.Collection, chunks: List[Dict], embeddings: List[List[float]]):
     """
     Store chunks with metadata in ChromaDB.
@@ -129,59 +371,17 @@ def store_chunks(collection: chromadb.Collection, chunks: List[Dict], embeddings
     if len(chunks) != len(embeddings):
         raise ValueError(f"Mismatch: {len(chunks)} chunks but {len(embeddings)} embeddings")
     
-    ids = []
-    documents = []
-    metadatas = []
-    embedding_list = []
-    
-    for i, chunk in enumerate(chunks):
-        # Generate ID
-        chunk_id = f"chunk_{i}_{hash(chunk.get('section_path', ''))}"
-        ids.append(chunk_id)
-        
-        # Document content
-        documents.append(chunk['content'])
-        
-        # Metadata - ChromaDB doesn't accept None values, convert to empty strings
-        metadata = {
-            'section_path': chunk.get('section_path') or '',
-            'section_number': str(chunk.get('section_number')) if chunk.get('section_number') is not None else '',
-            'content_type': chunk.get('content_type', 'main_doc'),
-            'level': str(chunk.get('level', 0)),
-            'header_text': chunk.get('header_text') or '',
-            'line_start': str(chunk.get('line_start', 0)),
-            'line_end': str(chunk.get('line_end', 0))
-        }
-        
-        # Add hyperlink-specific metadata
-        if chunk.get('content_type') == 'hyperlink':
-            metadata['parent_section'] = chunk.get('parent_section') or ''
-            metadata['source_url'] = chunk.get('source_url') or ''
-            metadata['link_text'] = chunk.get('link_text') or ''
-        
-        # Add role context if from Section 8.3
-        section_num = chunk.get('section_number')
-        if section_num and str(section_num) == ROLE_GUIDANCE_SECTION:
-            header_lower = chunk.get('header_text', '').lower()
-            if 'board' in header_lower:
-                metadata['role_context'] = 'board'
-            elif 'ceo' in header_lower or 'executive' in header_lower:
-                metadata['role_context'] = 'ceo'
-            elif 'operational' in header_lower:
-                metadata['role_context'] = 'operational'
-            elif 'frontline' in header_lower:
-                metadata['role_context'] = 'frontline'
-        
-        metadatas.append(metadata)
-        embedding_list.append(embeddings[i])
+    ids = build_chunk_ids(chunks)
+    documents = [chunk['content'] for chunk in chunks]
+    metadatas = [build_chunk_metadata(chunk) for chunk in chunks]
     
-    # Add to collection
+    # Upsert so re-running over an existing collection is idempotent
     try:
-        collection.add(
+        collection.upsert(
             ids=ids,
             documents=documents,
             metadatas=metadatas,
-            embeddings=embedding_list
+            embeddings=list(embeddings)
         )
         logger.info(f"Stored {len(chunks)} chunks in collection")
     except Exception as e:
@@ -189,32 +389,93 @@ def store_chunks(collection: chromadb.Collection, chunks: List[Dict], embeddings
         raise
 
 
-def query_collection(collection: chromadb.Collection, 
-                     query_text: str, 
-                     top_k: int = 5,
-                     role_filter: Optional[str] = None) -> List[Dict]:
+def sync_chunks(collection: chromadb.Collection,
+                chunks: List[Dict],
+                content_types: Optional[List[str]] = None,
+                embed_fn: Optional[Callable] = None,
+                cache: Optional[EmbeddingCache] = None) -> Dict:
     """
-    Perform semantic search in ChromaDB collection.
+    Incrementally bring the collection in line with a new chunk set.
+    
+    Chunks are matched by their deterministic ID: new IDs are embedded and
+    upserted, IDs no longer present are deleted, and unchanged chunks whose
+    metadata moved (e.g. shifted line numbers) get a metadata-only update.
     
     Args:
         collection: ChromaDB collection
-        query_text: Query text
-        top_k: Number of results to return
-        role_filter: Optional role to filter/prioritize (e.g., 'frontline', 'board')
+        chunks: The complete new chunk set for the given content types
+        content_types: Only existing chunks of these types are considered for
+                       deletion (e.g. ['main_doc'] when hyperlinks were skipped).
+                       Defaults to every type present in ``chunks``.
+        embed_fn: Optional batch embedder passed to generate_embeddings
+        cache: Optional EmbeddingCache passed to generate_embeddings
         
     Returns:
-        List of retrieved chunks with metadata
+        Dictionary with counts: added, deleted, updated, unchanged
     """
-    initialize_genai()
+    if content_types is None:
+        content_types = sorted({chunk.get('content_type', 'main_doc') for chunk in chunks})
     
-    # Generate query embedding
-    try:
-        result = genai.embed_content(
-            model=EMBEDDING_MODEL,
-            content=query_text,
-            task_type="RETRIEVAL_QUERY"
+    ids = build_chunk_ids(chunks)
+    new_records = {chunk_id: chunk for chunk_id, chunk in zip(ids, chunks)}
+    
+    existing = collection.get(
+        where={"content_type": {"$in": content_types}} if content_types else None,
+        include=['metadatas']
+    )
+    existing_metadata = dict(zip(existing['ids'], existing['metadatas']))
+    
+    to_add = [chunk_id for chunk_id in ids if chunk_id not in existing_metadata]
+    to_delete = [chunk_id for chunk_id in existing_metadata if chunk_id not in new_records]
+    to_update = [
+        chunk_id for chunk_id in ids
+        if chunk_id in existing_metadata
+        and existing_metadata[chunk_id] != build_chunk_metadata(new_records[chunk_id])
+    ]
+    
+    if to_delete:
+        collection.delete(ids=to_delete)
+        logger.info(f"Deleted {len(to_delete)} stale chunks")
+    
+    if to_add:
+        add_chunks = [new_records[chunk_id] for chunk_id in to_add]
+        embeddings = generate_embeddings(
+            [chunk['content'] for chunk in add_chunks], embed_fn=embed_fn, cache=cache
         )
+        collection.upsert(
+            ids=to_add,
+            documents=[chunk['content'] for chunk in add_chunks],
+            metadatas=[build_chunk_metadata(chunk) for chunk in add_chunks],
+            embeddings=embeddings
+        )
+        logger.info(f"Upserted {len(to_add)} new or changed chunks")
+    
+    if to_update:
+        collection.update(
+            ids=to_update,
+            metadatas=[build_chunk_metadata(new_records[chunk_id]) for chunk_id in to_update]
+        )
+        logger.info(f"Updated metadata for {len(to_update)} chunks")
+    
+    return {
+        'added': len(to_add),
+        'deleted': len(to_delete),
+        'updated': len(to_update),
+        'unchanged': len(ids) - len(to_add) - len(to_update)
+    }
+
+
+def _parse_query_embedding(result) -> Optional[List[float]]:
+    """
+    Extract the query vector from a genai.embed_content response.
+    
+    Args:
+        result: Raw response from genai.embed_content
         
+    Returns:
+        Query embedding vector, or None if the response has an unexpected shape
+    """
+    try:
         # Handle different response structures from Google GenAI API
         # The API can return: dict with 'embedding' or 'embeddings' key, or direct list
         if isinstance(result, dict):
@@ -227,13 +488,13 @@ def query_collection(collection: chromadb.Collection,
             else:
                 # Debug: log available keys
                 logger.error(f"Unexpected result structure. Keys: {list(result.keys())}")
-                return []
+                return None
         elif isinstance(result, list):
             # If result is directly a list, take first element
             query_embedding = result[0] if len(result) > 0 else result
         else:
             logger.error(f"Unexpected result type: {type(result)}")
-            return []
+            return None
             
         # Ensure query_embedding is a list/array
         if not isinstance(query_embedding, list):
@@ -243,11 +504,106 @@ def query_collection(collection: chromadb.Collection,
         logger.error(f"Error accessing embedding from result. Result type: {type(result)}. Error: {e}")
         if isinstance(result, dict):
             logger.error(f"Available keys: {list(result.keys())}")
-        return []
+        return None
+    
+    return query_embedding
+
+
+def embed_query(query_text: str, query_cache: Optional[QueryEmbeddingCache] = None) -> Optional[List[float]]:
+    """
+    Generate the retrieval embedding for a user query.
+    
+    Args:
+        query_text: Query text
+        query_cache: Optional in-process cache checked before calling the API
+        
+    Returns:
+        Query embedding vector, or None if it could not be generated
+    """
+    if query_cache is not None:
+        cached = query_cache.get(query_text, EMBEDDING_MODEL)
+        if cached is not None:
+            return cached
+    
+    initialize_genai()
+    
+    # Generate query embedding
+    try:
+        result = genai.embed_content(
+            model=EMBEDDING_MODEL,
+            content=query_text,
+            task_type="RETRIEVAL_QUERY"
+        )
     except Exception as e:
         logger.error(f"Error generating query embedding: {e}", exc_info=True)
-        return []
+        return None
+    
+    query_embedding = _parse_query_embedding(result)
+    if query_embedding is not None and query_cache is not None:
+        query_cache.put(query_text, EMBEDDING_MODEL, query_embedding)
+    
+    return query_embedding
+
+
+async def aembed_query(query_text: str, query_cache: Optional[QueryEmbeddingCache] = None) -> Optional[List[float]]:
+    """
+    Async variant of embed_query.
+    Uses genai.embed_content_async when available so no thread is held during the request.
+    
+    Args:
+        query_text: Query text
+        query_cache: Optional in-process cache checked before calling the API
+        
+    Returns:
+        Query embedding vector, or None if it could not be generated
+    """
+    if query_cache is not None:
+        cached = query_cache.get(query_text, EMBEDDING_MODEL)
+        if cached is not None:
+            return cached
+    
+    embed_content_async = getattr(genai, 'embed_content_async', None)
+    if embed_content_async is None:
+        return await asyncio.to_thread(embed_query, query_text, query_cache)
+    
+    initialize_genai()
     
+    # Generate query embedding
+    try:
+        result = await embed_content_async(
+            model=EMBEDDING_MODEL,
+            content=query_text,
+            task_type="RETRIEVAL_QUERY"
+        )
+    except Exception as e:
+        logger.error(f"Error generating query embedding: {e}", exc_info=True)
+        return None
+    
+    query_embedding = _parse_query_embedding(result)
+    if query_embedding is not None and query_cache is not None:
+        query_cache.put(query_text, EMBEDDING_MODEL, query_embedding)
+    
+    return query_embedding
+
+
+def _search_collection(collection: chromadb.Collection,
+                       query_embedding: List[float],
+                       top_k: int,
+                       role_filter: Optional[str],
+                       where: Optional[Dict] = None) -> List[Dict]:
+    """
+    Run the nearest-neighbour search for a precomputed query embedding.
+    
+    Args:
+        collection: ChromaDB collection
+        query_embedding: Query embedding vector
+        top_k: Number of results to return
+        role_filter: Optional role to filter/prioritize
+        where: Optional extra metadata filter (combined with the role filter)
+        
+    Returns:
+        List of retrieved chunks with metadata
+    """
     # Build where clause if role filter provided
     where_clause = None
     if role_filter:
@@ -258,6 +614,8 @@ def query_collection(collection: chromadb.Collection,
                 {"section_number": ROLE_GUIDANCE_SECTION}
             ]
         }
+    if where:
+        where_clause = {"$and": [where_clause, where]} if where_clause else where
     
     try:
         # Query collection
@@ -274,6 +632,7 @@ def query_collection(collection: chromadb.Collection,
         if results['ids'] and len(results['ids'][0]) > 0:
             for i in range(len(results['ids'][0])):
                 chunk_dict = {
+                    'id': results['ids'][0][i],
                     'content': results['documents'][0][i],
                     'metadata': results['metadatas'][0][i],
                     'distance': results['distances'][0][i] if 'distances' in results else None
@@ -295,23 +654,219 @@ def query_collection(collection: chromadb.Collection,
         return []
 
 
+def _matches_role_filter(metadata: Dict, role_filter: str) -> bool:
+    """Python equivalent of the role_context / section_number $or clause in _search_collection."""
+    return (metadata.get('role_context') == role_filter
+            or metadata.get('section_number') == ROLE_GUIDANCE_SECTION)
+
+
+def _fuse_results(collection: chromadb.Collection,
+                  dense_chunks: List[Dict],
+                  lexical_hits: List[Tuple[str, float]],
+                  top_k: int,
+                  role_filter: Optional[str]) -> List[Dict]:
+    """
+    Merge dense and lexical results with reciprocal-rank fusion.
+    Chunks found only lexically are fetched from the collection by ID.
+    
+    Args:
+        collection: ChromaDB collection
+        dense_chunks: Chunks from _search_collection (best first)
+        lexical_hits: (chunk_id, BM25 score) pairs (best first)
+        top_k: Number of results to return
+        role_filter: Optional role to filter/prioritize
+        
+    Returns:
+        List of retrieved chunks with metadata, 'rrf_score' and (when matched) 'lexical_score'
+    """
+    chunks_by_id = {chunk['id']: chunk for chunk in dense_chunks}
+    lexical_scores = dict(lexical_hits)
+    
+    missing = [chunk_id for chunk_id in lexical_scores if chunk_id not in chunks_by_id]
+    if missing:
+        try:
+            stored = collection.get(ids=missing, include=['documents', 'metadatas'])
+            for chunk_id, document, metadata in zip(stored['ids'], stored['documents'], stored['metadatas']):
+                chunks_by_id[chunk_id] = {'id': chunk_id, 'content': document, 'metadata': metadata, 'distance': None}
+        except Exception as e:
+            logger.warning(f"Could not fetch lexical hits from collection: {e}")
+    
+    lexical_ids = [chunk_id for chunk_id, _ in lexical_hits if chunk_id in chunks_by_id]
+    if role_filter:
+        lexical_ids = [i for i in lexical_ids if _matches_role_filter(chunks_by_id[i]['metadata'], role_filter)]
+    
+    fused = []
+    for chunk_id, score in reciprocal_rank_fusion([[chunk['id'] for chunk in dense_chunks], lexical_ids]):
+        chunk = dict(chunks_by_id[chunk_id])
+        chunk['rrf_score'] = score
+        if chunk_id in lexical_scores:
+            chunk['lexical_score'] = lexical_scores[chunk_id]
+        fused.append(chunk)
+    
+    # Keep the existing role prioritization on top of the fused order
+    if role_filter:
+        role_chunks = [c for c in fused if c['metadata'].get('role_context') == role_filter]
+        other_chunks = [c for c in fused if c['metadata'].get('role_context') != role_filter]
+        fused = role_chunks + other_chunks
+    return fused[:top_k]
+
+
+async def aquery_collection(collection: chromadb.Collection,
+                            query_text: str,
+                            top_k: int = 5,
+                            role_filter: Optional[str] = None,
+                            query_cache: Optional[QueryEmbeddingCache] = None,
+                            query_embedding: Optional[List[float]] = None,
+                            lexical_index: Optional[LexicalIndex] = None,
+                            lexical_result: Optional[Dict] = None,
+                            where: Optional[Dict] = None) -> List[Dict]:
+    """
+    Async semantic (or hybrid) search in ChromaDB collection.
+    
+    The query embedding is awaited without blocking a thread; the local
+    ChromaDB search runs in a worker thread. Arguments match query_collection.
+    
+    Returns:
+        List of retrieved chunks with metadata
+    """
+    if lexical_index is not None and lexical_result is None:
+        lexical_result = lexical_index.search(query_text, top_k * 2)
+    lexical_hits = lexical_result['hits'] if lexical_result else []
+    
+    # A strong lexical match is precise enough on its own: skip the embedding call
+    if lexical_hits and lexical_result['strong'] and query_embedding is None:
+        logger.info("Strong lexical match, skipping query embedding")
+        return await asyncio.to_thread(_fuse_results, collection, [], lexical_hits, top_k, role_filter)
+    
+    if query_embedding is None:
+        query_embedding = await aembed_query(query_text, query_cache)
+    if query_embedding is None:
+        if lexical_hits:
+            logger.warning("Query embedding unavailable, using lexical results only")
+            return await asyncio.to_thread(_fuse_results, collection, [], lexical_hits, top_k, role_filter)
+        return []
+    
+    if not lexical_hits:
+        return await asyncio.to_thread(_search_collection, collection, query_embedding, top_k, role_filter, where)
+    
+    # Hybrid: over-fetch dense candidates, then fuse with the lexical ranking
+    dense_chunks = await asyncio.to_thread(_search_collection, collection, query_embedding, top_k * 2,
+                                           role_filter, where)
+    return await asyncio.to_thread(_fuse_results, collection, dense_chunks, lexical_hits, top_k, role_filter)
+
+
+def query_collection(collection: chromadb.Collection, 
+                     query_text: str, 
+                     top_k: int = 5,
+                     role_filter: Optional[str] = None,
+                     query_cache: Optional[QueryEmbeddingCache] = None,
+                     query_embedding: Optional[List[float]] = None,
+                     lexical_index: Optional[LexicalIndex] = None,
+                     lexical_result: Optional[Dict] = None,
+                     where: Optional[Dict] = None) -> List[Dict]:
+    """
+    Perform semantic search in ChromaDB collection.
+    Thin sync wrapper around aquery_collection.
+    With a lexical index, dense and BM25 results are merged with reciprocal-rank
+    fusion, and a strong lexical match skips the query embedding entirely.
+    
+    Args:
+        collection: ChromaDB collection
+        query_text: Query text
+        top_k: Number of results to return
+        role_filter: Optional role to filter/prioritize (e.g., 'frontline', 'board')
+        query_cache: Optional shared cache for query embeddings
+        query_embedding: Precomputed query embedding (skips embedding the query)
+        lexical_index: Optional LexicalIndex for hybrid retrieval
+        lexical_result: Precomputed LexicalIndex.search result for this query
+        where: Optional metadata filter for the dense search (lexical hits are
+               not filtered; pass a pre-filtered lexical_result instead)
+        
+    Returns:
+        List of retrieved chunks with metadata
+    """
+    return run_sync(aquery_collection(collection, query_text, top_k, role_filter,
+                                      query_cache, query_embedding, lexical_index, lexical_result, where))
+
+
 def collection_exists(collection_name: str = CHROMA_COLLECTION_NAME,
-                      persist_directory: str = CHROMA_PERSIST_DIRECTORY) -> bool:
+                      persist_directory: str = CHROMA_PERSIST_DIRECTORY,
+                      backend: str = VECTOR_STORE_BACKEND) -> bool:
     """
     Check if ChromaDB collection already exists.
     
     Args:
         collection_name: Name of the collection
         persist_directory: Directory to persist ChromaDB data
+        backend: "chroma" or "numpy"
         
     Returns:
         True if collection exists, False otherwise
     """
     try:
-        os.makedirs(persist_directory, exist_ok=True)
-        client = chromadb.PersistentClient(path=persist_directory)
-        client.get_collection(name=collection_name)
+        get_collection(collection_name, persist_directory, create=False, backend=backend)
         return True
     except Exception:
         return False
 
+
+_index_version_cache: Dict[str, Tuple[float, str]] = {}
+
+
+def write_index_version(collection: chromadb.Collection, path: str = INDEX_VERSION_FILE) -> str:
+    """
+    Record a content fingerprint of the collection after ingestion.
+    
+    Chunk IDs are content-addressed, so hashing the sorted ID set changes
+    exactly when the indexed content changes. Caches built on top of the
+    index (answers, FAQ entries) compare against this to invalidate themselves.
+    
+    Args:
+        collection: ChromaDB collection that was just written
+        path: Version file path
+        
+    Returns:
+        The new index version string
+    """
+    ids = sorted(collection.get(include=[])['ids'])
+    version = hashlib.sha256('\n'.join(ids).encode('utf-8')).hexdigest()[:16]
+    
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': version, 'chunk_count': len(ids), 'updated_at': time.time()}, f)
+    
+    logger.info(f"Index version: {version} ({len(ids)} chunks)")
+    return version
+
+
+def read_index_version(path: str = INDEX_VERSION_FILE) -> str:
+    """
+    Read the current index version written by ingest.py.
+    The file is only re-read when its modification time changes.
+    
+    Args:
+        path: Version file path
+        
+    Returns:
+        Version string, or an empty string if no version has been recorded
+    """
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return ''
+    
+    cached = _index_version_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            version = json.load(f).get('version', '')
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read index version from {path}: {e}")
+        return ''
+    
+    _index_version_cache[path] = (mtime, version)
+    return version